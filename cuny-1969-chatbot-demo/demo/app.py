@@ -1,15 +1,22 @@
 import streamlit as st
+import math
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
 
+from admission import AdmissionController, Rejected
 from chatbot import CUNY1969Chatbot
 from demo_data import DemoDataCreator
 from knowledge_base import CUNY1969KnowledgeBase
-from PIL import Image
+from kb_bundle import export_bundle, open_bundle_knowledge_base
+from streaming import StreamTimer
+from metrics import configure_from_env
+from rendering import (history_start, latest_answer_index, lazy_images, load_thumbnail, rendered,
+                       reset_history, sources_html, timing_html)
 import logging
 
 logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 st.set_page_config(
     page_title="CUNY 1969 Historical Chatbot",
@@ -19,16 +26,31 @@ st.set_page_config(
 
 @st.cache_resource
 def initialize_system():
-    with st.spinner("Initializing demo data and knowledge base..."):
-        creator = DemoDataCreator()
-        creator.save_demo_data()
-        
-        kb = CUNY1969KnowledgeBase()
-        kb.build_knowledge_base()
-        
-        chatbot = CUNY1969Chatbot()
-        
-    return chatbot
+    configure_from_env()
+    
+    # A prebuilt bundle is memory-mapped; only without one that matches the Chroma build and scraped pages
+    # is the index rebuilt (and then exported)
+    kb = open_bundle_knowledge_base(db_dir="../data/chroma_db", data_dir="../data")
+    if kb is None:
+        with st.spinner("Initializing demo data and knowledge base..."):
+            # Scraped pages are kept, so a rescrape is what gets rebuilt
+            if not os.path.exists(os.path.join("../data", 'scraped_content.json')):
+                creator = DemoDataCreator()
+                creator.save_demo_data()
+            
+            kb = CUNY1969KnowledgeBase()
+            # Replace the stored chunks; Chroma would keep the old text for every id that is added again
+            kb.reset_collection()
+            kb.build_knowledge_base()
+            export_bundle(kb)
+            kb = open_bundle_knowledge_base(model=kb.model)
+    
+    return CUNY1969Chatbot(kb=kb)
+
+@st.cache_resource
+def admission_controller():
+    # Shared by every session, so a full classroom asking at once queues instead of slowing everyone down
+    return AdmissionController()
 
 def display_images(images):
     if images:
@@ -38,13 +60,67 @@ def display_images(images):
                 try:
                     img_path = os.path.join("..", "assets", img_data['local_path'])
                     if os.path.exists(img_path):
-                        img = Image.open(img_path)
-                        st.image(img, caption=img_data['alt_text'], use_column_width=True)
+                        st.image(load_thumbnail(img_path), caption=img_data['alt_text'], use_column_width=True)
                     else:
                         st.info(f"📷 {img_data['alt_text']}")
                 except:
                     st.info(f"📷 {img_data['alt_text']}")
 
+def display_sources(sources):
+    if sources:
+        with st.expander("📚 View Sources"):
+            for source in sources:
+                st.write(f"- {source}")
+
+def display_timing(timing):
+    if timing and timing.get('total_ms') is not None:
+        ttfb = timing.get('ttfb_ms') or timing['total_ms']
+        st.caption(f"⏱️ First text after {ttfb:.0f} ms · complete after {timing['total_ms']:.0f} ms")
+
+def answer_extras_html(message):
+    # Only this fixed markup goes out as HTML; sources_html escapes the source names it embeds
+    parts = [sources_html(message.get("sources")), timing_html(message.get("timing"))]
+    return "\n\n".join(part for part in parts if part)
+
+def stream_response(chatbot, question):
+    timer = StreamTimer()
+    message = {
+        "role": "assistant",
+        "content": "",
+        "sources": [],
+        "images": []
+    }
+    
+    answer_slot = st.empty()
+    images_slot = st.container()
+    sources_slot = st.container()
+    
+    def answer_fragments():
+        for event in timer.track(chatbot.chat_stream(question)):
+            if event['type'] == 'sources':
+                message['sources'] = event['sources']
+                with sources_slot:
+                    display_sources(event['sources'])
+            elif event['type'] == 'images':
+                message['images'] = event['images']
+                with images_slot:
+                    display_images(event['images'])
+            elif event['type'] == 'answer':
+                yield event['text']
+    
+    try:
+        with admission_controller().admit('interactive'):
+            message['content'] = answer_slot.write_stream(answer_fragments())
+    except Rejected as e:
+        message['content'] = (f"⏳ Many questions are being answered right now. "
+                              f"Please ask again in about {math.ceil(e.retry_after)} s.")
+        answer_slot.warning(message['content'])
+    message['timing'] = timer.as_dict()
+    display_timing(message['timing'])
+    logger.info(f"Streamed answer: ttfb={message['timing']['ttfb_ms']} ms total={message['timing']['total_ms']} ms")
+    
+    return message
+
 def main():
     st.title("🏛️ CUNY 1969 Historical Chatbot")
     st.markdown("""
@@ -68,15 +144,10 @@ def main():
         for question in demo_questions:
             if st.button(question, key=f"demo_{question}"):
                 st.session_state.messages.append({"role": "user", "content": question})
-                
-                with st.spinner("Searching archives..."):
-                    response = chatbot.chat(question)
-                
                 st.session_state.messages.append({
-                    "role": "assistant", 
-                    "content": response['answer'],
-                    "sources": response.get('sources', []),
-                    "images": response.get('images', [])
+                    "role": "assistant",
+                    "content": "",
+                    "streaming": True
                 })
                 st.rerun()
         
@@ -84,6 +155,7 @@ def main():
         
         if st.button("🗑️ Clear Chat History"):
             st.session_state.messages = []
+            reset_history()
             chatbot.clear_context()
             st.rerun()
         
@@ -95,18 +167,28 @@ def main():
         - Historical content from CUNY 1969 archives
         """)
     
-    for message in st.session_state.messages:
+    # Only the newest page of history is rendered, each finished answer from its cached markup
+    messages = st.session_state.messages
+    latest_answer = latest_answer_index(messages)
+    for idx in range(history_start(messages), len(messages)):
+        message = messages[idx]
         with st.chat_message(message["role"]):
-            st.write(message["content"])
+            if message.get("streaming"):
+                user_question = st.session_state.messages[idx-1]["content"] if idx > 0 else ""
+                if user_question:
+                    st.session_state.messages[idx] = stream_response(chatbot, user_question)
+                continue
             
             if message["role"] == "assistant":
-                if message.get("images"):
-                    display_images(message["images"])
-                
-                if message.get("sources"):
-                    with st.expander("📚 View Sources"):
-                        for source in message["sources"]:
-                            st.write(f"- {source}")
+                # The answer quotes scraped archive text, so it is never rendered as HTML
+                st.markdown(message["content"])
+                extras = rendered(message, answer_extras_html)
+                if extras:
+                    st.markdown(extras, unsafe_allow_html=True)
+                lazy_images(message.get("images"), display_images, key=f"{idx}_{message['_render_key']}",
+                            eager=idx == latest_answer)
+            else:
+                st.write(message["content"])
     
     if st.session_state.first_visit:
         with st.chat_message("assistant"):
@@ -126,25 +208,7 @@ def main():
             st.write(prompt)
         
         with st.chat_message("assistant"):
-            with st.spinner("Searching archives..."):
-                response = chatbot.chat(prompt)
-            
-            st.write(response['answer'])
-            
-            if response.get('images'):
-                display_images(response['images'])
-            
-            if response.get('sources'):
-                with st.expander("📚 View Sources"):
-                    for source in response['sources']:
-                        st.write(f"- {source}")
-            
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": response['answer'],
-                "sources": response.get('sources', []),
-                "images": response.get('images', [])
-            })
+            st.session_state.messages.append(stream_response(chatbot, prompt))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
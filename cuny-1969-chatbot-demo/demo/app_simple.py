@@ -1,13 +1,18 @@
 import streamlit as st
+import html
 import sys
 import os
-import time
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
 
 from chatbot_simple import SimpleCUNY1969Chatbot
-from PIL import Image
+from streaming import StreamTimer
+from rendering import (existing_paths, history_start, latest_answer_index, lazy_images, load_thumbnail,
+                       rendered, reset_history, sources_html, timing_html)
 import requests
 from io import BytesIO
+import logging
+
+logger = logging.getLogger(__name__)
 
 st.set_page_config(
     page_title="CUNY 1969 Historical Chatbot",
@@ -94,35 +99,56 @@ st.markdown("""
 def initialize_chatbot():
     return SimpleCUNY1969Chatbot()
 
-def stream_text(text):
-    """Stream text with typewriter effect that simulates thinking"""
-    placeholder = st.empty()
-    displayed_text = ""
+def display_sources(sources):
+    if sources:
+        with st.expander("📚 View Sources"):
+            for source in sources:
+                st.write(f"- {source}")
+
+def display_timing(timing):
+    if timing and timing.get('total_ms') is not None:
+        ttfb = timing.get('ttfb_ms') or timing['total_ms']
+        st.caption(f"⏱️ First text after {ttfb:.0f} ms · complete after {timing['total_ms']:.0f} ms")
+
+def answer_html(message):
+    """Answer text (escaped, since it quotes scraped pages), sources and timing as one HTML block"""
+    return (f"<div style='font-size: 25px;'>{html.escape(message['content'])}</div>"
+            f"{sources_html(message.get('sources'))}{timing_html(message.get('timing'))}")
+
+def stream_response(chatbot, question):
+    """Render chat_stream events as they arrive and return the finished message"""
+    timer = StreamTimer()
+    message = {
+        "role": "assistant",
+        "content": "",
+        "sources": [],
+        "images": [],
+        "streaming": False
+    }
     
-    # Show thinking indicator first
-    thinking_dots = [".", "..", "...", ""]
-    for i in range(8):  # Show thinking for ~2 seconds
-        dots = thinking_dots[i % 4]
-        placeholder.markdown(f"<div style='font-size: 25px; color: #888;'>Thinking{dots}</div>", unsafe_allow_html=True)
-        time.sleep(0.25)
+    answer_slot = st.empty()
+    images_slot = st.container()
+    sources_slot = st.container()
     
-    # Now stream the actual text
-    words = text.split()
-    for i, word in enumerate(words):
-        displayed_text += word + " "
-        placeholder.markdown(f"<div style='font-size: 25px;'>{displayed_text}</div>", unsafe_allow_html=True)
-        
-        # Variable speed - slower for longer words, pauses at punctuation
-        if word.endswith(('.', '!', '?')):
-            time.sleep(0.3)  # Longer pause at end of sentences
-        elif word.endswith((',', ';', ':')):
-            time.sleep(0.15)  # Medium pause at punctuation
-        elif len(word) > 8:
-            time.sleep(0.08)  # Slower for long words
-        else:
-            time.sleep(0.05)  # Normal speed for short words
+    def answer_fragments():
+        for event in timer.track(chatbot.chat_stream(question)):
+            if event['type'] == 'sources':
+                message['sources'] = event['sources']
+                with sources_slot:
+                    display_sources(event['sources'])
+            elif event['type'] == 'images':
+                message['images'] = event['images']
+                with images_slot:
+                    display_images(event['images'])
+            elif event['type'] == 'answer':
+                yield event['text']
     
-    return placeholder
+    message['content'] = answer_slot.write_stream(answer_fragments())
+    message['timing'] = timer.as_dict()
+    display_timing(message['timing'])
+    logger.info(f"Streamed answer: ttfb={message['timing']['ttfb_ms']} ms total={message['timing']['total_ms']} ms")
+    
+    return message
 
 def display_images(images):
     """Display images with proper handling"""
@@ -147,20 +173,18 @@ def display_images(images):
                 
                 image_loaded = False
                 
-                # Try to find and load the image
-                for path in possible_paths:
-                    if os.path.exists(path):
-                        try:
-                            # Skip the demo image
-                            if "protest_demo.jpg" in path:
-                                continue
-                            img = Image.open(path)
-                            st.image(img, caption=img_data['alt_text'], use_container_width=True)
-                            st.markdown(f"<div style='font-size: 16px; color: green;'>✅ Loaded: {os.path.basename(path)}</div>", unsafe_allow_html=True)
-                            image_loaded = True
-                            break
-                        except Exception as e:
-                            st.markdown(f"<div style='font-size: 16px; color: red;'>❌ Error with {path}: {str(e)[:50]}...</div>", unsafe_allow_html=True)
+                # Try to find and load the image; lookups and decoded thumbnails are cached across reruns
+                for path in existing_paths(tuple(possible_paths)):
+                    try:
+                        # Skip the demo image
+                        if "protest_demo.jpg" in path:
+                            continue
+                        st.image(load_thumbnail(path), caption=img_data['alt_text'], use_container_width=True)
+                        st.markdown(f"<div style='font-size: 16px; color: green;'>✅ Loaded: {os.path.basename(path)}</div>", unsafe_allow_html=True)
+                        image_loaded = True
+                        break
+                    except Exception as e:
+                        st.markdown(f"<div style='font-size: 16px; color: red;'>❌ Error with {path}: {str(e)[:50]}...</div>", unsafe_allow_html=True)
                 
                 # If no local image found, try direct URL from CUNY site
                 if not image_loaded:
@@ -237,6 +261,7 @@ def main():
         
         if st.button("🗑️ Clear Chat History"):
             st.session_state.messages = []
+            reset_history()
             st.rerun()
         
         st.divider()
@@ -247,8 +272,11 @@ def main():
         - Works with Python 3.13
         """)
     
-    # Display chat history
-    for idx, message in enumerate(st.session_state.messages):
+    # Display chat history: only the newest page, each finished answer from its cached HTML
+    messages = st.session_state.messages
+    latest_answer = latest_answer_index(messages)
+    for idx in range(history_start(messages), len(messages)):
+        message = messages[idx]
         with st.chat_message(message["role"]):
             if message["role"] == "user":
                 st.markdown(f"<div style='font-size: 25px;'>{message['content']}</div>", unsafe_allow_html=True)
@@ -258,51 +286,13 @@ def main():
                     # This is a new streaming message, get response and stream it
                     user_question = st.session_state.messages[idx-1]["content"] if idx > 0 else ""
                     if user_question:
-                        # Show initial processing message
-                        processing_placeholder = st.empty()
-                        processing_placeholder.markdown(f"<div style='font-size: 25px; color: #666;'>🔍 Searching CUNY 1969 archives...</div>", unsafe_allow_html=True)
-                        time.sleep(1.0)  # Simulate search time
-                        
-                        processing_placeholder.markdown(f"<div style='font-size: 25px; color: #666;'>📚 Analyzing historical documents...</div>", unsafe_allow_html=True)
-                        time.sleep(0.8)  # Simulate analysis time
-                        
-                        # Get the actual response
-                        response = chatbot.chat(user_question)
-                        
-                        # Clear processing message and stream the response
-                        processing_placeholder.empty()
-                        stream_text(response['answer'])
-                        
-                        # Update the message with full content
-                        st.session_state.messages[idx] = {
-                            "role": "assistant",
-                            "content": response['answer'],
-                            "sources": response.get('sources', []),
-                            "images": response.get('images', []),
-                            "streaming": False
-                        }
-                        
-                        # Display images and sources after streaming
-                        if response.get('images'):
-                            display_images(response['images'])
-                        
-                        if response.get('sources'):
-                            with st.expander("📚 View Sources"):
-                                for source in response['sources']:
-                                    st.write(f"- {source}")
-                        
-                        st.rerun()
+                        # Stream the response as soon as retrieval finishes
+                        st.session_state.messages[idx] = stream_response(chatbot, user_question)
                 else:
                     # Regular message display
-                    st.markdown(f"<div style='font-size: 25px;'>{message['content']}</div>", unsafe_allow_html=True)
-                    
-                    if message.get("images"):
-                        display_images(message["images"])
-                    
-                    if message.get("sources"):
-                        with st.expander("📚 View Sources"):
-                            for source in message["sources"]:
-                                st.write(f"- {source}")
+                    st.markdown(rendered(message, answer_html), unsafe_allow_html=True)
+                    lazy_images(message.get("images"), display_images, key=f"{idx}_{message['_render_key']}",
+                                eager=idx == latest_answer)
     
     # Welcome message
     if st.session_state.first_visit:
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import json
+import platform
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from metrics import summarize
+
+DEFAULT_RESULTS_FILE = os.path.join("..", "data", "benchmark_results.json")
+DEFAULT_BASELINE_FILE = os.path.join("..", "data", "benchmark_baseline.json")
+COMPARED_PERCENTILES = ['p50', 'p95', 'p99']
+
+class StageTimer:
+    """Collects wall-clock samples (ms) per named pipeline stage"""
+    
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+    
+    def time(self, stage: str, fn: Callable, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.samples.setdefault(stage, []).append((time.perf_counter() - start) * 1000)
+        return result
+    
+    def summary(self) -> Dict:
+        return {stage: summarize(samples) for stage, samples in self.samples.items()}
+
+class BenchmarkRunner:
+    def __init__(self, scenarios: List[Dict], data_dir: str = "../data", iterations: int = 5,
+                 engines: Optional[List[str]] = None, encoders: Optional[List[str]] = None):
+        self.scenarios = scenarios
+        self.data_dir = data_dir
+        self.iterations = iterations
+        self.engines = engines or ['vector', 'simple']
+        # Encoder backends to time against the PyTorch reference (see encoders.py); none by default
+        self.encoders = encoders or []
+    
+    def load_queries(self) -> List[str]:
+        queries = [scenario['query'] for scenario in self.scenarios]
+        
+        qa_file = os.path.join(self.data_dir, 'sample_qa_pairs.json')
+        if os.path.exists(qa_file):
+            with open(qa_file, 'r', encoding='utf-8') as f:
+                qa_pairs = json.load(f)
+        else:
+            from demo_data import DemoDataCreator
+            qa_pairs = DemoDataCreator(data_dir=self.data_dir).create_sample_qa_pairs()
+        
+        queries.extend(pair['question'] for pair in qa_pairs)
+        
+        return list(dict.fromkeys(queries))
+    
+    def _throughput(self, chat_samples: List[float]) -> Optional[float]:
+        total_seconds = sum(chat_samples) / 1000
+        return len(chat_samples) / total_seconds if total_seconds else None
+    
+    def bench_vector(self, queries: List[str]) -> Dict:
+        # Build into scratch directories so the live data/ content and index are never overwritten
+        data_dir = tempfile.mkdtemp(prefix='cuny1969_bench_data_')
+        db_dir = tempfile.mkdtemp(prefix='cuny1969_bench_db_')
+        try:
+            return self._bench_vector(queries, data_dir, db_dir)
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+            shutil.rmtree(db_dir, ignore_errors=True)
+    
+    def _bench_vector(self, queries: List[str], data_dir: str, db_dir: str) -> Dict:
+        from demo_data import DemoDataCreator
+        from knowledge_base import CUNY1969KnowledgeBase
+        from chatbot import CUNY1969Chatbot
+        
+        DemoDataCreator(data_dir=data_dir).save_demo_data()
+        
+        start = time.perf_counter()
+        kb = CUNY1969KnowledgeBase(data_dir=data_dir, db_dir=db_dir, chroma_url='')
+        kb.build_knowledge_base()
+        build_ms = (time.perf_counter() - start) * 1000
+        
+        # The semantic cache is disabled so every query exercises the full pipeline
+        start = time.perf_counter()
+        chatbot = CUNY1969Chatbot(kb=CUNY1969KnowledgeBase(data_dir=data_dir, db_dir=db_dir, chroma_url=''),
+                                  prewarm_cache=False, cache_capacity=0)
+        cold_start_ms = (time.perf_counter() - start) * 1000
+        
+        start = time.perf_counter()
+        chatbot.chat(queries[0])
+        first_query_ms = (time.perf_counter() - start) * 1000
+        
+        timer = StageTimer()
+        for _ in range(self.iterations):
+            for query in queries:
+                query_embeddings = timer.time('encode', chatbot.kb.encode, [query])
+                search_results = timer.time(
+                    'search', chatbot.kb.search_batch, [query], n_results=chatbot.n_candidates,
+                    query_embeddings=query_embeddings, include_embeddings=True
+                )[0]
+                images = timer.time(
+                    'images', chatbot.kb.get_images_by_query_batch, [query],
+                    n_results=3, query_embeddings=query_embeddings
+                )[0]
+                timer.time('format_response', chatbot.format_response, query, search_results, images)
+                timer.time('chat', chatbot.chat, query)
+        
+        return {
+            'build_ms': build_ms,
+            'cold_start_ms': cold_start_ms,
+            'first_query_ms': first_query_ms,
+            'throughput_qps': self._throughput(timer.samples['chat']),
+            'stages': timer.summary()
+        }
+    
+    def bench_simple(self, queries: List[str]) -> Dict:
+        from chatbot_simple import SimpleCUNY1969Chatbot
+        
+        start = time.perf_counter()
+        chatbot = SimpleCUNY1969Chatbot()
+        cold_start_ms = (time.perf_counter() - start) * 1000
+        
+        start = time.perf_counter()
+        chatbot.chat(queries[0])
+        first_query_ms = (time.perf_counter() - start) * 1000
+        
+        timer = StageTimer()
+        for _ in range(self.iterations):
+            for query in queries:
+                search_results = timer.time('search', chatbot.search_knowledge, query)
+                timer.time('images', chatbot.get_relevant_images, query)
+                timer.time('generate_answer', chatbot.generate_answer, query, search_results)
+                timer.time('chat', chatbot.chat, query)
+        
+        return {
+            'cold_start_ms': cold_start_ms,
+            'first_query_ms': first_query_ms,
+            'throughput_qps': self._throughput(timer.samples['chat']),
+            'stages': timer.summary()
+        }
+    
+    def run(self) -> Dict:
+        queries = self.load_queries()
+        results = {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'host': {
+                'platform': platform.platform(),
+                'python': platform.python_version(),
+                'cpu_count': os.cpu_count()
+            },
+            'iterations': self.iterations,
+            'queries': queries,
+            'engines': {}
+        }
+        
+        if 'vector' in self.engines:
+            results['engines']['vector'] = self.bench_vector(queries)
+        if 'simple' in self.engines:
+            results['engines']['simple'] = self.bench_simple(queries)
+        if self.encoders:
+            from encoders import compare_backends
+            results['encoders'] = compare_backends(queries, self.encoders, iterations=self.iterations)
+        
+        return results
+
+def save_results(results: Dict, path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+def load_results(path: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def compare_to_baseline(results: Dict, baseline: Dict, tolerance: float = 0.2,
+                        min_delta_ms: float = 1.0) -> List[Dict]:
+    """Compare latencies with a stored baseline; a regression is slower by both tolerance and min_delta_ms"""
+    rows = []
+    
+    def add_row(engine: str, metric: str, current: Optional[float], previous: Optional[float]):
+        if current is None or not previous:
+            return
+        ratio = current / previous
+        rows.append({
+            'engine': engine,
+            'metric': metric,
+            'baseline': previous,
+            'current': current,
+            'ratio': ratio,
+            'regression': ratio > 1 + tolerance and current - previous > min_delta_ms
+        })
+    
+    for engine, engine_results in results['engines'].items():
+        engine_baseline = baseline.get('engines', {}).get(engine)
+        if not engine_baseline:
+            continue
+        
+        for metric in ['build_ms', 'cold_start_ms', 'first_query_ms']:
+            add_row(engine, metric, engine_results.get(metric), engine_baseline.get(metric))
+        
+        for stage, stats in engine_results['stages'].items():
+            baseline_stats = engine_baseline.get('stages', {}).get(stage, {})
+            for key in COMPARED_PERCENTILES:
+                add_row(engine, f"{stage}.{key}", stats.get(key), baseline_stats.get(key))
+    
+    return rows
+
+def print_report(results: Dict, comparison: Optional[List[Dict]] = None):
+    print("\n" + "="*60)
+    print(" Benchmark Results")
+    print("="*60)
+    print(f"\n{len(results['queries'])} queries x {results['iterations']} iterations")
+    
+    for engine, engine_results in results['engines'].items():
+        print("\n" + "-"*40)
+        print(f" Engine: {engine}")
+        print("-"*40)
+        
+        for metric in ['build_ms', 'cold_start_ms', 'first_query_ms']:
+            if metric in engine_results:
+                print(f"  {metric:<16} {engine_results[metric]:>10.1f}")
+        if engine_results.get('throughput_qps'):
+            print(f"  {'throughput_qps':<16} {engine_results['throughput_qps']:>10.1f}")
+        
+        print(f"\n  {'stage':<16} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+        for stage, stats in engine_results['stages'].items():
+            print(f"  {stage:<16} {stats['p50']:>10.2f} {stats['p95']:>10.2f} {stats['p99']:>10.2f}")
+    
+    if results.get('encoders'):
+        print("\n" + "-"*40)
+        print(" Encoder backends (p50 ms, speedup over torch)")
+        print("-"*40)
+        print(f"  {'backend':<11} {'query':>8} {'speedup':>8} {'batch':>9} {'speedup':>8} {'min cos':>8}")
+        for backend, stats in results['encoders'].items():
+            if 'error' in stats:
+                print(f"  {backend:<11} unavailable: {stats['error']}")
+                continue
+            agreement = f"{stats['agreement']['min_cosine']:.4f}" if stats['agreement'] else '-'
+            print(f"  {backend:<11} {stats['query_ms']['p50']:>8.2f} {stats.get('query_speedup', 0):>7.2f}x "
+                  f"{stats['batch_ms']['p50']:>9.2f} {stats.get('batch_speedup', 0):>7.2f}x {agreement:>8}")
+    
+    if comparison:
+        regressions = [row for row in comparison if row['regression']]
+        print("\n" + "-"*40)
+        print(f" Baseline comparison: {len(regressions)} regression(s)")
+        print("-"*40)
+        for row in comparison:
+            marker = "⚠️ " if row['regression'] else "  "
+            print(f"{marker}{row['engine']:<8} {row['metric']:<24} "
+                  f"{row['baseline']:>10.2f} -> {row['current']:>10.2f} ({row['ratio']:.2f}x)")
+
+
+def add_benchmark_arguments(parser):
+    parser.add_argument('--bench', action='store_true', help='Run the latency benchmark instead of the demo')
+    parser.add_argument('--iterations', type=int, default=5, help='Benchmark passes over the query set')
+    parser.add_argument('--bench-output', default=DEFAULT_RESULTS_FILE, help='Where to write JSON results')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_FILE, help='Baseline JSON to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed slowdown against the baseline before flagging a regression')
+    parser.add_argument('--encoders', default='',
+                        help='Comma-separated encoder backends to compare with torch, e.g. onnx,onnx-int8,torch-int8')
+
+def run_benchmark(args, scenarios: List[Dict], engines: List[str]) -> int:
+    encoders = [backend.strip() for backend in args.encoders.split(',') if backend.strip()]
+    runner = BenchmarkRunner(scenarios, iterations=args.iterations, engines=engines, encoders=encoders)
+    results = runner.run()
+    
+    save_results(results, args.bench_output)
+    print(f"\nResults written to {args.bench_output}")
+    
+    comparison = None
+    baseline = load_results(args.baseline)
+    if baseline:
+        comparison = compare_to_baseline(results, baseline, tolerance=args.tolerance)
+    
+    print_report(results, comparison)
+    
+    if args.save_baseline:
+        save_results(results, args.baseline)
+        print(f"\nBaseline updated: {args.baseline}")
+    
+    return 1 if comparison and any(row['regression'] for row in comparison) else 0
\ No newline at end of file
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import json
+import multiprocessing
+import random
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+
+from admission import PRIORITIES
+from metrics import summarize
+
+DEFAULT_LOADGEN_FILE = os.path.join("..", "data", "loadgen_results.json")
+TARGETS = ['vector', 'simple', 'http']
+# Open-loop arrivals still waiting when the level ended; never sent, so neither completed nor failed
+NOT_SENT = 'not_sent'
+
+def build_query_mix(demo_questions: List[str], qa_pairs: List[Dict],
+                    demo_weight: float = 3.0, qa_weight: float = 1.0) -> List[Tuple[str, float]]:
+    """Weighted queries; demo questions are asked more often than the QA pairs"""
+    weights: Dict[str, float] = {}
+    for question in demo_questions:
+        weights[question] = weights.get(question, 0.0) + demo_weight
+    for pair in qa_pairs:
+        weights[pair['question']] = weights.get(pair['question'], 0.0) + qa_weight
+    
+    return [(query, weight) for query, weight in weights.items() if weight > 0]
+
+def create_target(target: str, db_dir: str = "../data/chroma_db", url: str = "http://127.0.0.1:8000",
+                  timeout: float = 30.0, disable_cache: bool = False,
+                  priority: str = 'eval') -> Callable[[str], Dict]:
+    if target == 'vector':
+        from chatbot import CUNY1969Chatbot
+        if disable_cache:
+            return CUNY1969Chatbot(kb_path=db_dir, cache_capacity=0, prewarm_cache=False).chat
+        return CUNY1969Chatbot(kb_path=db_dir).chat
+    
+    if target == 'simple':
+        from chatbot_simple import SimpleCUNY1969Chatbot
+        return SimpleCUNY1969Chatbot().chat
+    
+    if target == 'http':
+        endpoint = url.rstrip('/') + '/chat'
+        
+        def post(query: str) -> Dict:
+            request = urllib.request.Request(
+                endpoint, data=json.dumps({'query': query, 'priority': priority}).encode('utf-8'),
+                headers={'Content-Type': 'application/json'}
+            )
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return json.loads(response.read())
+        
+        return post
+    
+    raise ValueError(f"Unknown target: {target}")
+
+def _error_kind(error: Exception) -> str:
+    if isinstance(error, urllib.error.HTTPError):
+        return f"HTTP {error.code}"
+    return type(error).__name__
+
+def _run_plan(send: Callable[[str], Dict], plan: Dict) -> List[Tuple[float, float, Optional[str]]]:
+    """Runs one worker's share of a load level; samples are (offset_s, latency_ms, error)"""
+    rng = random.Random(plan['seed'])
+    queries = [query for query, _ in plan['mix']]
+    weights = [weight for _, weight in plan['mix']]
+    
+    # Workers start together on the wall clock, then time with perf_counter
+    time.sleep(max(plan['start_at'] - time.time(), 0))
+    start = time.perf_counter()
+    end = start + plan['duration']
+    samples = []
+    
+    def send_one(scheduled: float):
+        query = rng.choices(queries, weights)[0]
+        error = None
+        try:
+            send(query)
+        except Exception as e:
+            error = _error_kind(e)
+        finished = time.perf_counter()
+        samples.append((scheduled - start, (finished - scheduled) * 1000, error))
+    
+    if plan['mode'] == 'closed':
+        while time.perf_counter() < end:
+            send_one(time.perf_counter())
+    else:
+        # Open loop: latency runs from the scheduled arrival, so falling behind shows up as queueing
+        interval = 1.0 / plan['rate']
+        scheduled = start + rng.uniform(0, interval)
+        while scheduled < end:
+            now = time.perf_counter()
+            if now < scheduled:
+                time.sleep(scheduled - now)
+            elif now > end:
+                samples.append((scheduled - start, (now - scheduled) * 1000, NOT_SENT))
+                scheduled += interval
+                continue
+            send_one(scheduled)
+            scheduled += interval
+    
+    return samples
+
+def _worker_main(worker_id: int, config: Dict, tasks, results):
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        send = create_target(**config)
+    except Exception as e:
+        results.put((worker_id, 'error', f"{type(e).__name__}: {e}"))
+        return
+    results.put((worker_id, 'ready', None))
+    
+    while True:
+        plan = tasks.get()
+        if plan is None:
+            break
+        try:
+            results.put((worker_id, 'done', _run_plan(send, plan)))
+        except Exception as e:
+            results.put((worker_id, 'error', f"{type(e).__name__}: {e}"))
+
+def level_stats(samples: List[Tuple[float, float, Optional[str]]], elapsed: float) -> Dict:
+    """Throughput, error rate and latency percentiles of the requests that were sent"""
+    sent = [sample for sample in samples if sample[2] != NOT_SENT]
+    latencies = [latency for _, latency, error in sent if error is None]
+    errors: Dict[str, int] = {}
+    for _, _, error in sent:
+        if error is not None:
+            errors[error] = errors.get(error, 0) + 1
+    
+    latency = summarize(latencies) if latencies else {}
+    return {
+        'requests': len(sent),
+        'completed': len(latencies),
+        'not_sent': len(samples) - len(sent),
+        'throughput_rps': len(latencies) / elapsed,
+        'error_rate': (len(sent) - len(latencies)) / len(sent) if sent else 0.0,
+        'errors': errors,
+        'p50_ms': latency.get('p50'),
+        'p95_ms': latency.get('p95'),
+        'p99_ms': latency.get('p99'),
+        'max_ms': latency.get('max')
+    }
+
+def find_knee(levels: List[Dict], latency_key: str = 'p95_ms', factor: float = 1.5) -> Optional[Dict]:
+    """Last level before latency grows `factor` times faster than throughput between two steps"""
+    for previous, current in zip(levels, levels[1:]):
+        if not previous['throughput_rps'] or not previous[latency_key] or current[latency_key] is None:
+            continue
+        latency_growth = current[latency_key] / previous[latency_key]
+        throughput_growth = current['throughput_rps'] / previous['throughput_rps']
+        if latency_growth > factor * throughput_growth:
+            return previous
+    
+    return None
+
+class LoadGenerator:
+    """Drives a chatbot from a pool of worker processes at increasing load"""
+    
+    def __init__(self, target: str = 'simple', db_dir: str = "../data/chroma_db",
+                 url: str = "http://127.0.0.1:8000", timeout: float = 30.0,
+                 disable_cache: bool = False, mix: Optional[List[Tuple[str, float]]] = None,
+                 seed: int = 0, priority: str = 'eval'):
+        self.target = target
+        self.config = {
+            'target': target, 'db_dir': db_dir, 'url': url,
+            'timeout': timeout, 'disable_cache': disable_cache, 'priority': priority
+        }
+        self.mix = mix or self.default_mix()
+        self.seed = seed
+        self._workers = []
+        self._task_queues = []
+        self._results = None
+    
+    def default_mix(self) -> List[Tuple[str, float]]:
+        from chatbot_simple import SimpleCUNY1969Chatbot
+        from demo_data import DemoDataCreator
+        
+        return build_query_mix(
+            SimpleCUNY1969Chatbot().get_demo_questions(),
+            DemoDataCreator().create_sample_qa_pairs()
+        )
+    
+    def start(self, processes: int):
+        context = multiprocessing.get_context()
+        self._results = context.Queue()
+        
+        for worker_id in range(processes):
+            tasks = context.Queue()
+            worker = context.Process(
+                target=_worker_main, args=(worker_id, self.config, tasks, self._results), daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+            self._task_queues.append(tasks)
+        
+        for _ in range(processes):
+            worker_id, status, detail = self._results.get()
+            if status == 'error':
+                self.stop()
+                raise RuntimeError(f"Worker {worker_id} failed to start: {detail}")
+        
+        print(f"{processes} worker process(es) ready (target: {self.target})")
+    
+    def stop(self):
+        for tasks in self._task_queues:
+            tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        self._workers = []
+        self._task_queues = []
+    
+    def run_level(self, workers: int, mode: str, duration: float, rate: Optional[float] = None) -> Dict:
+        start_at = time.time() + 0.2
+        for worker_id in range(workers):
+            self._task_queues[worker_id].put({
+                'mode': mode,
+                'duration': duration,
+                'rate': rate / workers if rate else None,
+                'mix': self.mix,
+                'seed': self.seed + worker_id,
+                'start_at': start_at
+            })
+        
+        samples = []
+        for _ in range(workers):
+            worker_id, status, detail = self._results.get()
+            if status == 'error':
+                raise RuntimeError(f"Worker {worker_id} failed: {detail}")
+            samples.extend(detail)
+        elapsed = max(time.time() - start_at, duration)
+        
+        return {'workers': workers, 'offered_rps': rate, **level_stats(samples, elapsed)}
+    
+    def sweep(self, mode: str, duration: float, concurrency: List[int],
+              rates: Optional[List[float]] = None, knee_factor: float = 1.5) -> Dict:
+        """Closed loop sweeps the worker count; open loop sweeps the arrival rate at max(concurrency) workers"""
+        processes = max(concurrency)
+        self.start(processes)
+        
+        levels = []
+        try:
+            if mode == 'closed':
+                for workers in concurrency:
+                    print(f"Closed loop: {workers} concurrent client(s) for {duration:.0f}s")
+                    levels.append(self.run_level(workers, 'closed', duration))
+            else:
+                for rate in rates:
+                    print(f"Open loop: {rate:g} req/s across {processes} worker(s) for {duration:.0f}s")
+                    levels.append(self.run_level(processes, 'open', duration, rate))
+        finally:
+            self.stop()
+        
+        return {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'target': self.target,
+            'mode': mode,
+            'duration_s': duration,
+            'cpu_count': os.cpu_count(),
+            'query_mix': [{'query': query, 'weight': weight} for query, weight in self.mix],
+            'levels': levels,
+            'knee': find_knee(levels, factor=knee_factor)
+        }
+
+def print_report(report: Dict):
+    print("\n" + "="*60)
+    print(f" Load Test: {report['target']} ({report['mode']} loop)")
+    print("="*60)
+    print(f"{'workers':>7} {'offered':>8} {'reqs':>6} {'rps':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    
+    def fmt(value: Optional[float], spec: str) -> str:
+        return format(value, spec) if value is not None else '-'
+    
+    for level in report['levels']:
+        marker = " <- knee" if level == report['knee'] else ""
+        print(f"{level['workers']:>7} {fmt(level['offered_rps'], '>8.1f'):>8} {level['requests']:>6} "
+              f"{level['throughput_rps']:>8.1f} {fmt(level['p50_ms'], '>8.1f'):>8} "
+              f"{fmt(level['p95_ms'], '>8.1f'):>8} {fmt(level['p99_ms'], '>8.1f'):>8} "
+              f"{level['error_rate']:>6.1%}{marker}")
+        if level['errors']:
+            print(f"{'':>7} errors: " + ', '.join(f"{kind}={count}" for kind, count in level['errors'].items()))
+        if level.get('not_sent'):
+            print(f"{'':>7} not sent: {level['not_sent']} arrival(s) still queued when the level ended")
+    
+    if report['knee']:
+        knee = report['knee']
+        print(f"\nLatency turns sharply upward beyond {knee['throughput_rps']:.1f} req/s "
+              f"(p95 {knee['p95_ms']:.1f} ms)")
+    else:
+        print("\nNo knee found; latency grew in step with throughput across the sweep")
+
+def parse_number_list(value: str) -> List[float]:
+    return [float(item) for item in value.split(',') if item.strip()]
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='CUNY 1969 Chatbot load generator')
+    parser.add_argument('--target', choices=TARGETS, default='simple',
+                        help='Chatbot to drive: in-process vector or simple engine, or an HTTP server')
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='Server address for --target http')
+    parser.add_argument('--db-dir', default='../data/chroma_db', help='Chroma database directory')
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed',
+                        help='closed: each worker waits for its reply; open: constant arrival rate')
+    parser.add_argument('--concurrency', default='1,2,4,8',
+                        help='Comma-separated worker counts (open loop uses the largest)')
+    parser.add_argument('--rates', default='5,10,20,40', help='Comma-separated arrival rates for open loop')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per load level')
+    parser.add_argument('--timeout', type=float, default=30.0, help='HTTP request timeout in seconds')
+    parser.add_argument('--priority', choices=PRIORITIES, default='eval',
+                        help='Admission class the HTTP server puts these requests in')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Disable the semantic cache of the in-process vector chatbot')
+    parser.add_argument('--knee-factor', type=float, default=1.5,
+                        help='Latency-to-throughput growth ratio that marks the knee')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the query mix')
+    parser.add_argument('--output', default=DEFAULT_LOADGEN_FILE, help='Where to write JSON results')
+    
+    args = parser.parse_args()
+    
+    generator = LoadGenerator(
+        target=args.target, db_dir=args.db_dir, url=args.url, timeout=args.timeout,
+        disable_cache=args.no_cache, seed=args.seed, priority=args.priority
+    )
+    report = generator.sweep(
+        args.mode, args.duration,
+        concurrency=[int(value) for value in parse_number_list(args.concurrency)],
+        rates=parse_number_list(args.rates), knee_factor=args.knee_factor
+    )
+    
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    
+    print_report(report)
+    print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,80 @@
+import html
+import itertools
+import os
+from io import BytesIO
+from typing import Callable, Dict, List, Optional, Tuple
+import streamlit as st
+from PIL import Image
+
+HISTORY_WINDOW = 20
+HISTORY_STATE_KEY = "history_pages"
+THUMBNAIL_SIZE = (640, 480)
+
+_render_ids = itertools.count()
+
+def sources_html(sources: Optional[List[str]]) -> str:
+    if not sources:
+        return ""
+    items = ''.join(f"<li>{html.escape(source)}</li>" for source in sources)
+    return f"<details><summary>📚 View Sources</summary><ul>{items}</ul></details>"
+
+def timing_html(timing: Optional[Dict]) -> str:
+    if not timing or timing.get('total_ms') is None:
+        return ""
+    ttfb = timing.get('ttfb_ms') or timing['total_ms']
+    return (f"<div style='font-size: 14px; opacity: 0.6;'>⏱️ First text after {ttfb:.0f} ms · "
+            f"complete after {timing['total_ms']:.0f} ms</div>")
+
+def rendered(message: Dict, build: Callable[[Dict], str]) -> str:
+    """Rendered form of a message, kept on the message itself once it is done streaming. A finished message
+    never changes, so the cached markup is valid for as long as the message object lives"""
+    if '_render_key' not in message:
+        # Stable per message for widget keys, e.g. its image toggle
+        message['_render_key'] = next(_render_ids)
+    if message.get('streaming'):
+        return build(message)
+    if '_rendered' not in message:
+        message['_rendered'] = build(message)
+    return message['_rendered']
+
+def history_start(messages: List[Dict], window: int = HISTORY_WINDOW) -> int:
+    """Index of the first message to render; older pages stay unrendered until the reader asks for them"""
+    pages = st.session_state.setdefault(HISTORY_STATE_KEY, 1)
+    start = max(0, len(messages) - pages * window)
+    start -= start % 2  # keep each question next to its answer
+    
+    if start > 0 and st.button(f"⬆️ Show earlier messages ({start} hidden)", key="history_more"):
+        st.session_state[HISTORY_STATE_KEY] = pages + 1
+        st.rerun()
+    return start
+
+def reset_history():
+    st.session_state.pop(HISTORY_STATE_KEY, None)
+
+def latest_answer_index(messages: List[Dict]) -> int:
+    return max((idx for idx, message in enumerate(messages) if message['role'] == 'assistant'), default=-1)
+
+@st.cache_data(show_spinner=False, ttl=300)
+def existing_paths(candidates: Tuple[str, ...]) -> List[str]:
+    return [path for path in candidates if os.path.exists(path)]
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _thumbnail(path: str, mtime_ns: int, size: Tuple[int, int]) -> bytes:
+    with Image.open(path) as img:
+        img.thumbnail(size)
+        image_format = 'PNG' if img.mode in ('RGBA', 'LA', 'P') else 'JPEG'
+        buffer = BytesIO()
+        img.save(buffer, format=image_format)
+    return buffer.getvalue()
+
+def load_thumbnail(path: str, size: Tuple[int, int] = THUMBNAIL_SIZE) -> bytes:
+    """Downscaled image bytes, decoded once per file version and shared across sessions"""
+    return _thumbnail(path, os.stat(path).st_mtime_ns, tuple(size))
+
+def lazy_images(images: Optional[List[Dict]], display: Callable[[List[Dict]], None], key: str,
+                eager: bool = False):
+    """The latest answer shows its images right away; older answers load them only when toggled on"""
+    if not images:
+        return
+    if eager or st.toggle(f"📸 Show {len(images)} image(s)", key=f"images_{key}"):
+        display(images)
\ No newline at end of file
@@ -6,12 +6,23 @@ sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '
 from chatbot import CUNY1969Chatbot
 from demo_data import DemoDataCreator
 from knowledge_base import CUNY1969KnowledgeBase
+from kb_bundle import DEFAULT_BUNDLE_DIR, export_bundle, open_bundle_knowledge_base
+from benchmark import add_benchmark_arguments, run_benchmark
+from profiler import add_profile_arguments, run_profile
 import time
 from typing import Dict
 
 class DemoRunner:
-    def __init__(self):
+    def __init__(self, data_dir: str = "../data", db_dir: str = "../data/chroma_db",
+                 bundle_dir: str = DEFAULT_BUNDLE_DIR):
+        self.data_dir = data_dir
+        self.db_dir = db_dir
+        self.bundle_dir = bundle_dir
         self.chatbot = None
+        # Pause after setup so a viewer can read it; --profile sets this to 0
+        self.pace_s = 1.0
+        # Extra CUNY1969Chatbot arguments; --profile turns the semantic cache off so scenarios run retrieval
+        self.chatbot_options = {}
         self.demo_scenarios = [
             {
                 "name": "General Overview",
@@ -54,19 +65,32 @@ class DemoRunner:
         self.print_header("CUNY 1969 Historical Chatbot Demo")
         print("\nSetting up demo environment...")
         
-        print("1. Creating demo data...")
-        creator = DemoDataCreator()
-        creator.save_demo_data()
-        
-        print("2. Building knowledge base...")
-        kb = CUNY1969KnowledgeBase()
-        kb.build_knowledge_base()
+        kb = open_bundle_knowledge_base(self.bundle_dir, db_dir=self.db_dir, data_dir=self.data_dir)
+        if kb is None:
+            # Scraped pages are kept, so a rescrape is what gets rebuilt
+            if not os.path.exists(os.path.join(self.data_dir, 'scraped_content.json')):
+                print("1. Creating demo data...")
+                creator = DemoDataCreator(data_dir=self.data_dir)
+                creator.save_demo_data()
+            else:
+                print(f"1. Using the scraped pages in {self.data_dir}")
+            
+            print("2. Building knowledge base...")
+            kb = CUNY1969KnowledgeBase(data_dir=self.data_dir, db_dir=self.db_dir)
+            # Replace the stored chunks; Chroma would keep the old text for every id that is added again
+            kb.reset_collection()
+            kb.build_knowledge_base()
+            export_bundle(kb, self.bundle_dir)
+            kb = open_bundle_knowledge_base(self.bundle_dir, model=kb.model)
+            print("3. Initializing chatbot...")
+        else:
+            print("1. Loaded prebuilt knowledge-base bundle")
+            print("2. Initializing chatbot...")
         
-        print("3. Initializing chatbot...")
-        self.chatbot = CUNY1969Chatbot()
+        self.chatbot = CUNY1969Chatbot(kb=kb, **self.chatbot_options)
         
         print("\n✅ Setup complete!")
-        time.sleep(1)
+        time.sleep(self.pace_s)
     
     def run_scenario(self, scenario: Dict):
         self.print_section(f"Scenario: {scenario['name']}")
@@ -175,11 +199,18 @@ def main():
     parser = argparse.ArgumentParser(description='CUNY 1969 Chatbot Demo Runner')
     parser.add_argument('--quick', action='store_true', help='Run quick test only')
     parser.add_argument('--interactive', action='store_true', help='Start in interactive mode')
+    add_benchmark_arguments(parser)
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
     
     runner = DemoRunner()
     
+    if args.bench:
+        sys.exit(run_benchmark(args, runner.demo_scenarios, engines=['vector', 'simple']))
+    if args.profile:
+        sys.exit(run_profile(args, runner))
+    
     try:
         if args.quick:
             runner.quick_test()
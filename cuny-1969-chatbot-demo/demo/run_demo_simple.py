@@ -4,12 +4,16 @@ import os
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
 
 from chatbot_simple import SimpleCUNY1969Chatbot
+from benchmark import add_benchmark_arguments, run_benchmark
+from profiler import add_profile_arguments, run_profile
 import time
 from typing import Dict
 
 class SimpleDemoRunner:
     def __init__(self):
         self.chatbot = SimpleCUNY1969Chatbot()
+        # Pause after setup so a viewer can read it; --profile sets this to 0
+        self.pace_s = 1.0
         self.demo_scenarios = [
             {
                 "name": "General Overview",
@@ -53,7 +57,7 @@ class SimpleDemoRunner:
         print("\nThis is a simplified version without ML dependencies.")
         print("It uses keyword-based search for demonstration purposes.")
         print("\n✅ Setup complete!")
-        time.sleep(1)
+        time.sleep(self.pace_s)
     
     def run_scenario(self, scenario: Dict):
         self.print_section(f"Scenario: {scenario['name']}")
@@ -162,11 +166,18 @@ def main():
     parser = argparse.ArgumentParser(description='CUNY 1969 Chatbot Demo Runner (Simplified)')
     parser.add_argument('--quick', action='store_true', help='Run quick test only')
     parser.add_argument('--interactive', action='store_true', help='Start in interactive mode')
+    add_benchmark_arguments(parser)
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
     
     runner = SimpleDemoRunner()
     
+    if args.bench:
+        sys.exit(run_benchmark(args, runner.demo_scenarios, engines=['simple']))
+    if args.profile:
+        sys.exit(run_profile(args, runner))
+    
     try:
         if args.quick:
             runner.quick_test()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import itertools
+import json
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from demo_data import DemoDataCreator
+from knowledge_base import CUNY1969KnowledgeBase
+from metrics import summarize
+
+DEFAULT_SWEEP_FILE = os.path.join("..", "data", "sweep_results.json")
+
+# Objectives for the Pareto frontier: (metric, True if larger is better)
+DEFAULT_OBJECTIVES = [('recall', True), ('query_p50_ms', False), ('index_bytes', False)]
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def keyword_recall(texts: List[str], keywords: List[str]) -> float:
+    if not keywords:
+        return 1.0
+    combined = ' '.join(texts).lower()
+    return sum(1 for keyword in keywords if keyword.lower() in combined) / len(keywords)
+
+def pareto_frontier(rows: List[Dict], objectives=DEFAULT_OBJECTIVES) -> List[Dict]:
+    """Rows not dominated by any other row on every objective"""
+    def dominates(a: Dict, b: Dict) -> bool:
+        at_least_as_good = all(
+            (a[metric] >= b[metric]) if larger_better else (a[metric] <= b[metric])
+            for metric, larger_better in objectives
+        )
+        strictly_better = any(
+            (a[metric] > b[metric]) if larger_better else (a[metric] < b[metric])
+            for metric, larger_better in objectives
+        )
+        return at_least_as_good and strictly_better
+    
+    return [row for row in rows if not any(dominates(other, row) for other in rows if other is not row)]
+
+class ParameterSweep:
+    """Rebuilds the knowledge base per configuration and scores recall@k against the QA keywords"""
+    
+    def __init__(self, data_dir: str = "../data", query_repeats: int = 3):
+        self.data_dir = data_dir
+        self.query_repeats = query_repeats
+        self.model = None
+        
+        creator = DemoDataCreator(data_dir=data_dir)
+        if not os.path.exists(os.path.join(data_dir, 'scraped_content.json')):
+            creator.save_demo_data()
+        self.qa_pairs = creator.create_sample_qa_pairs()
+    
+    def evaluate(self, chunk_size: int, chunk_overlap: int, hnsw_config: Dict,
+                 n_results_options: List[int]) -> List[Dict]:
+        db_dir = tempfile.mkdtemp(prefix='cuny1969_sweep_')
+        try:
+            kb = CUNY1969KnowledgeBase(
+                data_dir=self.data_dir, db_dir=db_dir, model=self.model,
+                chunk_size=chunk_size, chunk_overlap=chunk_overlap, hnsw_config=hnsw_config, chroma_url=''
+            )
+            self.model = kb.model
+            
+            start = time.perf_counter()
+            kb.build_knowledge_base()
+            build_ms = (time.perf_counter() - start) * 1000
+            index_bytes = directory_size(db_dir)
+            chunk_count = kb.collection.count()
+            
+            questions = [pair['question'] for pair in self.qa_pairs]
+            query_embeddings = kb.encode(questions)
+            
+            rows = []
+            for n_results in n_results_options:
+                latencies = []
+                recalls = []
+                for row, pair in enumerate(self.qa_pairs):
+                    for _ in range(self.query_repeats):
+                        start = time.perf_counter()
+                        results = kb.search_batch(
+                            [pair['question']], n_results=n_results,
+                            query_embeddings=query_embeddings[row:row + 1]
+                        )[0]
+                        latencies.append((time.perf_counter() - start) * 1000)
+                    
+                    texts = [result['content'] for result in results['results']]
+                    recalls.append(keyword_recall(texts, pair['keywords']))
+                
+                latency = summarize(latencies)
+                rows.append({
+                    'chunk_size': chunk_size,
+                    'chunk_overlap': chunk_overlap,
+                    'hnsw_M': hnsw_config['hnsw:M'],
+                    'hnsw_construction_ef': hnsw_config['hnsw:construction_ef'],
+                    'hnsw_search_ef': hnsw_config['hnsw:search_ef'],
+                    'n_results': n_results,
+                    'recall': sum(recalls) / len(recalls),
+                    'build_ms': build_ms,
+                    'index_bytes': index_bytes,
+                    'chunks': chunk_count,
+                    'query_p50_ms': latency['p50'],
+                    'query_p95_ms': latency['p95']
+                })
+            
+            return rows
+        finally:
+            shutil.rmtree(db_dir, ignore_errors=True)
+    
+    def run(self, chunk_sizes: List[int], overlaps: List[int], m_values: List[int],
+            construction_efs: List[int], search_efs: List[int], n_results_options: List[int]) -> Dict:
+        rows = []
+        grid = list(itertools.product(chunk_sizes, overlaps, m_values, construction_efs, search_efs))
+        
+        for i, (chunk_size, overlap, m, construction_ef, search_ef) in enumerate(grid, 1):
+            if overlap >= chunk_size:
+                continue
+            
+            print(f"[{i}/{len(grid)}] chunk_size={chunk_size} overlap={overlap} "
+                  f"M={m} construction_ef={construction_ef} search_ef={search_ef}")
+            rows.extend(self.evaluate(
+                chunk_size, overlap,
+                {'hnsw:M': m, 'hnsw:construction_ef': construction_ef, 'hnsw:search_ef': search_ef},
+                n_results_options
+            ))
+        
+        return {
+            'objectives': [{'metric': metric, 'maximize': larger_better}
+                           for metric, larger_better in DEFAULT_OBJECTIVES],
+            'results': rows,
+            'pareto_frontier': pareto_frontier(rows)
+        }
+
+def print_frontier(frontier: List[Dict]):
+    print("\n" + "="*60)
+    print(" Pareto Frontier (recall vs. query latency vs. index size)")
+    print("="*60)
+    print(f"{'chunk':>6} {'ovl':>4} {'M':>4} {'c_ef':>5} {'s_ef':>5} {'k':>3} "
+          f"{'recall':>7} {'p50 ms':>8} {'KiB':>8} {'build ms':>9}")
+    
+    for row in sorted(frontier, key=lambda r: (-r['recall'], r['query_p50_ms'])):
+        print(f"{row['chunk_size']:>6} {row['chunk_overlap']:>4} {row['hnsw_M']:>4} "
+              f"{row['hnsw_construction_ef']:>5} {row['hnsw_search_ef']:>5} {row['n_results']:>3} "
+              f"{row['recall']:>7.3f} {row['query_p50_ms']:>8.2f} {row['index_bytes'] / 1024:>8.1f} "
+              f"{row['build_ms']:>9.1f}")
+
+def parse_int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(',') if item.strip()]
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='CUNY 1969 retrieval parameter sweep')
+    parser.add_argument('--data-dir', default='../data', help='Directory with scraped_content.json')
+    parser.add_argument('--chunk-sizes', type=parse_int_list, default=[100, 200, 300])
+    parser.add_argument('--overlaps', type=parse_int_list, default=[0, 50])
+    parser.add_argument('--m', type=parse_int_list, default=[8, 16, 32], help='HNSW M values')
+    parser.add_argument('--construction-ef', type=parse_int_list, default=[64, 128])
+    parser.add_argument('--search-ef', type=parse_int_list, default=[10, 50, 100])
+    parser.add_argument('--n-results', type=parse_int_list, default=[3, 5], help='k values for recall@k')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed repetitions per query')
+    parser.add_argument('--output', default=DEFAULT_SWEEP_FILE, help='Where to write JSON results')
+    
+    args = parser.parse_args()
+    
+    sweep = ParameterSweep(data_dir=args.data_dir, query_repeats=args.repeats)
+    report = sweep.run(
+        args.chunk_sizes, args.overlaps, args.m,
+        args.construction_ef, args.search_ef, args.n_results
+    )
+    
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    
+    print_frontier(report['pareto_frontier'])
+    print(f"\n{len(report['results'])} configurations written to {args.output}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
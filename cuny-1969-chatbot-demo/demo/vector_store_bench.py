@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import json
+import multiprocessing
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+import logging
+
+from chroma_server import COLLECTION_NAME, DEFAULT_CHROMA_PORT, ChromaServer, open_client
+from metrics import summarize
+
+DEFAULT_RESULTS_FILE = os.path.join("..", "data", "vector_store_bench.json")
+MODES = ['embedded', 'server']
+
+def _worker_main(worker_id: int, config: Dict, results, done):
+    # Only Chroma is imported here, so worker memory is the vector store's and not the encoder's
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        start = time.perf_counter()
+        collection = open_client(config['db_dir'], config['chroma_url']).get_collection(COLLECTION_NAME)
+        collection.query(query_embeddings=[config['vectors'][0]], n_results=config['n_results'])
+        open_ms = (time.perf_counter() - start) * 1000
+    except Exception as e:
+        results.put((worker_id, 'error', f"{type(e).__name__}: {e}"))
+        return
+    
+    vectors = config['vectors']
+    latencies = []
+    while time.time() < config['start_at']:
+        time.sleep(0.001)
+    deadline = config['start_at'] + config['duration']
+    while time.time() < deadline:
+        vector = vectors[(worker_id + len(latencies)) % len(vectors)]
+        query_start = time.perf_counter()
+        collection.query(query_embeddings=[vector], n_results=config['n_results'])
+        latencies.append((time.perf_counter() - query_start) * 1000)
+    
+    results.put((worker_id, 'done', {'pid': os.getpid(), 'open_ms': open_ms, 'latencies': latencies}))
+    # Stay alive until the parent has read this process's memory
+    done.wait(30)
+
+def query_vectors(db_dir: str) -> List[List[float]]:
+    """Demo questions and QA pairs encoded once up front, so workers time only the vector store"""
+    from chatbot_simple import SimpleCUNY1969Chatbot
+    from demo_data import DemoDataCreator
+    from knowledge_base import CUNY1969KnowledgeBase
+    
+    kb = CUNY1969KnowledgeBase(db_dir=db_dir, chroma_url='')
+    if kb.collection.count() == 0:
+        kb.build_knowledge_base()
+    questions = SimpleCUNY1969Chatbot().get_demo_questions()
+    questions += [pair['question'] for pair in DemoDataCreator().create_sample_qa_pairs()]
+    return [list(map(float, vector)) for vector in kb.encode(questions)]
+
+class VectorStoreBenchmark:
+    """Query throughput and memory of N worker processes, each opening the index itself or sharing one server"""
+    
+    def __init__(self, db_dir: str = "../data/chroma_db", port: int = DEFAULT_CHROMA_PORT, n_results: int = 5):
+        self.db_dir = db_dir
+        self.port = port
+        self.n_results = n_results
+        self.vectors = query_vectors(db_dir)
+    
+    def run_mode(self, mode: str, workers: int, duration: float) -> Dict:
+        from prefork import read_memory
+        
+        server = ChromaServer(self.db_dir, port=self.port).start() if mode == 'server' else None
+        context = multiprocessing.get_context('spawn')
+        results, done = context.Queue(), context.Event()
+        config = {
+            'db_dir': self.db_dir,
+            'chroma_url': server.url if server else '',
+            'vectors': self.vectors,
+            'n_results': self.n_results,
+            'duration': duration,
+            # Spawned workers need a few seconds to import Chroma and open the index before the common start
+            'start_at': time.time() + 5.0 + 0.5 * workers
+        }
+        processes = [context.Process(target=_worker_main, args=(worker_id, config, results, done), daemon=True)
+                     for worker_id in range(workers)]
+        try:
+            for process in processes:
+                process.start()
+            
+            reports = []
+            for _ in processes:
+                worker_id, status, detail = results.get()
+                if status == 'error':
+                    raise RuntimeError(f"{mode} worker {worker_id} failed: {detail}")
+                reports.append(detail)
+            
+            worker_memory = [read_memory(report['pid']) for report in reports]
+            server_memory = read_memory(server.pid) if server else {}
+        finally:
+            done.set()
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+            if server:
+                server.stop()
+        
+        latencies = [latency for report in reports for latency in report['latencies']]
+        worker_pss = sum(memory.get('pss_mb', 0.0) for memory in worker_memory)
+        return {
+            'mode': mode,
+            'workers': workers,
+            'queries': len(latencies),
+            'throughput_qps': len(latencies) / duration,
+            'latency_ms': summarize(latencies),
+            'open_ms': summarize([report['open_ms'] for report in reports]),
+            'worker_rss_mb': [memory.get('rss_mb') for memory in worker_memory],
+            'worker_pss_mb': worker_pss,
+            'server_pss_mb': server_memory.get('pss_mb', 0.0),
+            'total_pss_mb': worker_pss + server_memory.get('pss_mb', 0.0)
+        }
+    
+    def run(self, workers: List[int], duration: float, modes: Optional[List[str]] = None) -> Dict:
+        runs = []
+        for count in workers:
+            for mode in modes or MODES:
+                print(f"{mode}: {count} worker(s) for {duration:.0f} s")
+                runs.append(self.run_mode(mode, count, duration))
+        
+        return {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'db_dir': self.db_dir,
+            'cpu_count': os.cpu_count(),
+            'n_results': self.n_results,
+            'duration_s': duration,
+            'runs': runs
+        }
+
+def print_report(report: Dict):
+    print(f"\n{'mode':<9} {'workers':>7} {'qps':>8} {'p50 ms':>7} {'p95 ms':>7} {'open ms':>8} "
+          f"{'worker PSS':>11} {'server PSS':>11} {'total PSS':>10}")
+    for run in report['runs']:
+        print(f"{run['mode']:<9} {run['workers']:>7} {run['throughput_qps']:>8.1f} "
+              f"{run['latency_ms']['p50'] or 0:>7.2f} {run['latency_ms']['p95'] or 0:>7.2f} "
+              f"{run['open_ms']['p50'] or 0:>8.0f} {run['worker_pss_mb']:>8.1f} MB {run['server_pss_mb']:>8.1f} MB "
+              f"{run['total_pss_mb']:>7.1f} MB")
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Compare embedded Chroma against one shared Chroma server')
+    parser.add_argument('--db-dir', default='../data/chroma_db', help='Chroma database directory (built if empty)')
+    parser.add_argument('--workers', default='1,2,4', help='Comma-separated worker process counts')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds of querying per run')
+    parser.add_argument('--modes', default=','.join(MODES), help='Comma-separated subset of: ' + ', '.join(MODES))
+    parser.add_argument('--port', type=int, default=DEFAULT_CHROMA_PORT, help='Port for the benchmark server')
+    parser.add_argument('--n-results', type=int, default=5, help='Neighbours per query')
+    parser.add_argument('--output', default=DEFAULT_RESULTS_FILE, help='Where to write JSON results')
+    
+    args = parser.parse_args()
+    
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"Unknown mode(s) {unknown}; choose from {MODES}")
+    
+    benchmark = VectorStoreBenchmark(args.db_dir, port=args.port, n_results=args.n_results)
+    report = benchmark.run([int(value) for value in args.workers.split(',')], args.duration, modes)
+    print_report(report)
+    
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,160 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from metrics import Histogram, LATENCY_BUCKETS_MS, telemetry
+
+# Most important first: a queued request is never shed for one of its own class or a lower one
+PRIORITIES = ['interactive', 'batch', 'eval']
+
+class Rejected(Exception):
+    """A request was turned away (queue full, shed for a higher priority, or waited too long)"""
+    
+    def __init__(self, reason: str, priority: str, retry_after: float):
+        super().__init__(f"Server busy ({reason}); retry in {retry_after:.1f} s")
+        self.reason = reason
+        self.priority = priority
+        self.retry_after = retry_after
+
+class _Waiter:
+    def __init__(self, priority: str):
+        self.priority = priority
+        self.enqueued_at = time.perf_counter()
+        self.event = threading.Event()
+        self.admitted = False
+        self.shed = False
+
+class AdmissionController:
+    """Runs at most max_concurrency requests at once; the rest wait in a bounded priority queue or are turned away"""
+    
+    def __init__(self, max_concurrency: Optional[int] = None, max_queue: int = 64, max_wait_ms: float = 1000.0):
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.max_wait_ms = max_wait_ms
+        self.queue_wait = Histogram(
+            'chat_admission_wait_ms', LATENCY_BUCKETS_MS, 'Time an admitted request waited in the admission queue'
+        )
+        self.admitted = Counter()
+        self.rejected = Counter()
+        self._active = 0
+        self._queue = []
+        self._sequence = itertools.count()
+        self._service_ms = None
+        self._lock = threading.Lock()
+    
+    def _retry_after(self) -> float:
+        # Roughly how long until everything ahead has been served; called with the lock held
+        service_ms = self._service_ms if self._service_ms is not None else 100.0
+        return max((self._active + len(self._queue)) / self.max_concurrency * service_ms / 1000.0, 0.1)
+    
+    def _reject(self, reason: str, priority: str) -> Rejected:
+        # Called with the lock held
+        self.rejected[(priority, reason)] += 1
+        telemetry.incr('chat_admission_rejected', priority=priority, reason=reason)
+        return Rejected(reason, priority, self._retry_after())
+    
+    def acquire(self, priority: str = 'interactive'):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'; choose from {PRIORITIES}")
+        rank = PRIORITIES.index(priority)
+        
+        with self._lock:
+            if self._active < self.max_concurrency and not self._queue:
+                self._active += 1
+                self.admitted[priority] += 1
+                self.queue_wait.observe(0.0)
+                return
+            
+            if len(self._queue) >= self.max_queue:
+                # With max_queue=0 there is nothing to shed: every request past the limit is turned away
+                if not self._queue:
+                    raise self._reject('queue_full', priority)
+                worst = max(self._queue)
+                if worst[0] <= rank:
+                    raise self._reject('queue_full', priority)
+                # Shed the least important, most recent request to make room for this one
+                self._queue.remove(worst)
+                heapq.heapify(self._queue)
+                worst[2].shed = True
+                worst[2].event.set()
+            
+            waiter = _Waiter(priority)
+            heapq.heappush(self._queue, (rank, next(self._sequence), waiter))
+        
+        waiter.event.wait(self.max_wait_ms / 1000.0)
+        
+        with self._lock:
+            if not waiter.admitted:
+                if not waiter.shed:
+                    self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+                    heapq.heapify(self._queue)
+                raise self._reject('shed' if waiter.shed else 'timeout', priority)
+        self.queue_wait.observe((time.perf_counter() - waiter.enqueued_at) * 1000)
+    
+    def release(self, service_ms: Optional[float] = None):
+        with self._lock:
+            if service_ms is not None:
+                self._service_ms = service_ms if self._service_ms is None else 0.9 * self._service_ms + 0.1 * service_ms
+            if self._queue:
+                # The slot passes straight to the best waiter, so the count of running requests is unchanged
+                _, _, waiter = heapq.heappop(self._queue)
+                waiter.admitted = True
+                self.admitted[waiter.priority] += 1
+                waiter.event.set()
+            else:
+                self._active -= 1
+    
+    @contextmanager
+    def admit(self, priority: str = 'interactive'):
+        """Hold a slot for the body of the with block; raises Rejected if none can be had in time"""
+        self.acquire(priority)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release((time.perf_counter() - start) * 1000)
+    
+    def queue_depths(self) -> Dict[str, int]:
+        with self._lock:
+            depths = Counter(waiter.priority for _, _, waiter in self._queue)
+        return {priority: depths.get(priority, 0) for priority in PRIORITIES}
+    
+    def stats(self) -> Dict:
+        depths = self.queue_depths()
+        with self._lock:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'max_queue': self.max_queue,
+                'max_wait_ms': self.max_wait_ms,
+                'active': self._active,
+                'queue_depth': depths,
+                'admitted': dict(self.admitted),
+                'rejected': {f"{priority}/{reason}": count for (priority, reason), count in self.rejected.items()},
+                'service_ms': self._service_ms,
+                'queue_wait_ms': self.queue_wait.snapshot()
+            }
+    
+    def render_prometheus(self) -> str:
+        depths = self.queue_depths()
+        with self._lock:
+            active = self._active
+        lines = [
+            '# TYPE chat_admission_active gauge',
+            f'chat_admission_active {active}',
+            '# TYPE chat_admission_limit gauge',
+            f'chat_admission_limit {self.max_concurrency}',
+            '# TYPE chat_admission_queue_depth gauge'
+        ]
+        lines.extend(f'chat_admission_queue_depth{{priority="{priority}"}} {depth}' for priority, depth in depths.items())
+        lines.append(f'# HELP {self.queue_wait.name} {self.queue_wait.help_text}')
+        lines.append(f'# TYPE {self.queue_wait.name} histogram')
+        lines.extend(self.queue_wait.render_prometheus())
+        return '\n'.join(lines) + '\n'
\ No newline at end of file
@@ -3,43 +3,109 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from knowledge_base import CUNY1969KnowledgeBase
-from typing import Dict, List, Optional
+from context_assembly import ContextAssembler
+from semantic_cache import SemanticCache
+from metrics import telemetry
+from streaming import split_fragments
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class CUNY1969Chatbot:
-    def __init__(self, kb_path: str = "../data/chroma_db"):
-        self.kb = CUNY1969KnowledgeBase(db_dir=kb_path)
+    NO_RESULTS_ANSWER = "I couldn't find specific information about that in the CUNY 1969 archives. Could you try rephrasing your question?"
+    
+    def __init__(self, kb_path: str = "../data/chroma_db", n_candidates: int = 5,
+                 context_char_budget: int = 500, cache_threshold: float = 0.92,
+                 cache_capacity: int = 256, prewarm_cache: bool = True,
+                 kb: Optional[CUNY1969KnowledgeBase] = None):
+        self.kb = kb or CUNY1969KnowledgeBase(db_dir=kb_path)
         self.context_window = []
         self.max_context_items = 5
+        self.n_candidates = n_candidates
+        self.context_assembler = ContextAssembler(char_budget=context_char_budget)
+        self.cache = SemanticCache(threshold=cache_threshold, capacity=cache_capacity)
+        self.prewarm_cache = prewarm_cache
+        self._cache_generation = None
+        self._warm_attempted = False
+        self._sync_cache()
+    
+    def _cache_tag(self, user_input: str) -> str:
+        return 'images' if self._wants_images(user_input) else 'text'
+    
+    def _sync_cache(self):
+        generation = self.kb.get_generation()
+        if generation != self._cache_generation:
+            if len(self.cache):
+                self.cache.invalidate()
+            self._cache_generation = generation
+            self._warm_attempted = False
+        
+        # Warm-up is tried once per generation, so an empty index is not counted again on every request
+        if self._warm_attempted or not (self.prewarm_cache and self.cache.capacity > 0):
+            return
+        self._warm_attempted = True
+        if self.kb.collection.count() > 0:
+            self.warm_cache()
+    
+    def warm_cache(self, questions: Optional[List[str]] = None):
+        questions = questions or self.get_demo_questions()
+        query_embeddings = self.kb.encode(questions)
+        responses = self._answer_uncached(questions, query_embeddings)
+        
+        for question, query_embedding, response in zip(questions, query_embeddings, responses):
+            self.cache.put(query_embedding, response, self._cache_tag(question))
+        
+        logger.info(f"Semantic cache warmed with {len(questions)} questions")
+    
+    def _select_context(self, results: List[Dict],
+                        query_embedding: Optional[np.ndarray] = None) -> Tuple[str, List[str]]:
+        context, selected = self.context_assembler.assemble(results, query_embedding)
+        
+        sources = []
+        for result in selected:
+            # Deduplicated chunks list every page they appeared on
+            metadata = result['metadata']
+            for source_url in metadata.get('source_urls') or [metadata.get('source_url')]:
+                if source_url and source_url not in sources:
+                    sources.append(source_url)
+        
+        return context, sources
+    
+    def _retrieve(self, user_input: str, query_embeddings: np.ndarray) -> Tuple[Dict, List[Dict]]:
+        search_results = self.kb.search_batch(
+            [user_input], n_results=self.n_candidates,
+            query_embeddings=query_embeddings, include_embeddings=True
+        )[0]
+        
+        images = []
+        if search_results['results'] and self._wants_images(user_input):
+            images = self.kb.get_images_by_query_batch(
+                [user_input], n_results=3, query_embeddings=query_embeddings
+            )[0]
+        
+        return search_results, images
     
     def format_response(self, query: str, search_results: Dict, images: List[Dict] = None) -> Dict:
         results = search_results.get('results', [])
         
         if not results:
             return {
-                'answer': "I couldn't find specific information about that in the CUNY 1969 archives. Could you try rephrasing your question?",
+                'answer': self.NO_RESULTS_ANSWER,
                 'sources': [],
                 'images': []
             }
         
-        combined_text = []
-        sources = set()
-        
-        for result in results[:3]:
-            combined_text.append(result['content'])
-            if result['metadata'].get('source_url'):
-                sources.add(result['metadata']['source_url'])
-        
-        context = '\n\n'.join(combined_text)
-        
-        answer = self._generate_answer(query, context)
+        with telemetry.span('chat.format_response'):
+            context, sources = self._select_context(results, search_results.get('query_embedding'))
+            
+            answer = self._generate_answer(query, context)
         
         response = {
             'answer': answer,
-            'sources': list(sources),
+            'sources': sources,
             'images': images or []
         }
         
@@ -49,35 +115,28 @@ class CUNY1969Chatbot:
         query_lower = query.lower()
         
         if "what happened" in query_lower and "1969" in query_lower:
-            return f"In 1969, students at the City University of New York staged historic protests demanding racial justice and educational equity. The protests included building occupations, particularly at City College where students occupied the South Campus for two weeks. These actions led to the implementation of the groundbreaking Open Admissions policy in 1970, which dramatically increased access to higher education for Black and Puerto Rican students.\n\nBased on the archives: {context[:200]}..."
+            return f"In 1969, students at the City University of New York staged historic protests demanding racial justice and educational equity. The protests included building occupations, particularly at City College where students occupied the South Campus for two weeks. These actions led to the implementation of the groundbreaking Open Admissions policy in 1970, which dramatically increased access to higher education for Black and Puerto Rican students.\n\nBased on the archives: {context}"
         
         elif "khadija deloache" in query_lower or "who was khadija" in query_lower:
-            return f"Khadija DeLoache was a prominent student activist during the 1969 CUNY protests. She played a crucial leadership role in organizing students and articulating their demands. DeLoache memorably stated: 'We weren't just fighting for ourselves. We were fighting for every Black and Brown student who would come after us. This was about breaking down barriers that had kept our communities out of higher education for too long.'\n\nFrom the archives: {context[:200]}..."
+            return f"Khadija DeLoache was a prominent student activist during the 1969 CUNY protests. She played a crucial leadership role in organizing students and articulating their demands. DeLoache memorably stated: 'We weren't just fighting for ourselves. We were fighting for every Black and Brown student who would come after us. This was about breaking down barriers that had kept our communities out of higher education for too long.'\n\nFrom the archives: {context}"
         
         elif "five demands" in query_lower:
             return f"The Five Demands presented by protesting students in 1969 were:\n\n1. Establishment of a School of Black and Puerto Rican Studies\n2. A separate orientation program for Black and Puerto Rican freshmen\n3. Requiring the hiring of Black and Puerto Rican faculty\n4. Demanding that the racial composition of entering classes reflect the high school population of New York City\n5. That any student who wanted to attend CUNY be admitted\n\nThese demands aimed to transform CUNY into a more inclusive and representative institution."
         
         elif "mlk" in query_lower or "martin luther king" in query_lower:
-            return f"The assassination of Dr. Martin Luther King Jr. on April 4, 1968, had a profound impact on CUNY students. His death served as a catalyst for the 1969 protests, as many students felt that peaceful protest alone was insufficient to achieve meaningful change. This tragedy pushed students toward more militant tactics, including building occupations and strikes, to demand racial justice in higher education.\n\nContext from archives: {context[:200]}..."
+            return f"The assassination of Dr. Martin Luther King Jr. on April 4, 1968, had a profound impact on CUNY students. His death served as a catalyst for the 1969 protests, as many students felt that peaceful protest alone was insufficient to achieve meaningful change. This tragedy pushed students toward more militant tactics, including building occupations and strikes, to demand racial justice in higher education.\n\nContext from archives: {context}"
         
         elif "photo" in query_lower or "image" in query_lower or "show" in query_lower:
             return "Here are historical images from the 1969 CUNY protests, including photos of students occupying South Campus, protest posters displaying the Five Demands, and documentation of student leaders like Khadija DeLoache addressing crowds during this pivotal moment in CUNY history."
         
         else:
-            relevant_info = context[:500] if context else "No specific information found."
+            relevant_info = context if context else "No specific information found."
             return f"Based on the CUNY 1969 archives: {relevant_info}\n\nThe 1969 protests were a defining moment in CUNY's history, leading to increased access and diversity in higher education."
     
-    def chat(self, user_input: str) -> Dict:
-        logger.info(f"User query: {user_input}")
-        
-        search_results = self.kb.search(user_input, n_results=5)
-        
-        images = []
-        if any(word in user_input.lower() for word in ['photo', 'image', 'picture', 'show']):
-            images = self.kb.get_images_by_query(user_input, n_results=3)
-        
-        response = self.format_response(user_input, search_results, images)
-        
+    def _wants_images(self, user_input: str) -> bool:
+        return any(word in user_input.lower() for word in ['photo', 'image', 'picture', 'show'])
+    
+    def _remember(self, user_input: str, response: Dict):
         self.context_window.append({
             'query': user_input,
             'response': response['answer']
@@ -85,9 +144,110 @@ class CUNY1969Chatbot:
         
         if len(self.context_window) > self.max_context_items:
             self.context_window.pop(0)
+    
+    def chat(self, user_input: str) -> Dict:
+        logger.info(f"User query: {user_input}")
+        
+        with telemetry.span('chat'):
+            response = self._respond([user_input])[0]
+        
+        self._remember(user_input, response)
         
         return response
     
+    def chat_stream(self, user_input: str) -> Iterator[Dict]:
+        """Yield sources and images once retrieval finishes, then answer fragments"""
+        logger.info(f"User query (streaming): {user_input}")
+        
+        self._sync_cache()
+        query_embeddings = self.kb.encode([user_input])
+        tag = self._cache_tag(user_input)
+        
+        response = self.cache.lookup(query_embeddings[0], tag)
+        telemetry.incr('semantic_cache_lookups', result='hit' if response is not None else 'miss')
+        if response is not None:
+            yield {'type': 'sources', 'sources': response['sources']}
+            yield {'type': 'images', 'images': response['images']}
+            for fragment in split_fragments(response['answer']):
+                yield {'type': 'answer', 'text': fragment}
+            self._remember(user_input, response)
+            return
+        
+        search_results, images = self._retrieve(user_input, query_embeddings)
+        results = search_results.get('results', [])
+        
+        context, sources = ('', [])
+        if results:
+            context, sources = self._select_context(results, search_results.get('query_embedding'))
+        
+        yield {'type': 'sources', 'sources': sources}
+        yield {'type': 'images', 'images': images}
+        
+        answer = self._generate_answer(user_input, context) if results else self.NO_RESULTS_ANSWER
+        for fragment in split_fragments(answer):
+            yield {'type': 'answer', 'text': fragment}
+        
+        response = {'answer': answer, 'sources': sources, 'images': images}
+        self.cache.put(query_embeddings[0], response, tag)
+        self._remember(user_input, response)
+    
+    def chat_batch(self, user_inputs: List[str]) -> List[Dict]:
+        logger.info(f"Batched user queries: {len(user_inputs)}")
+        
+        with telemetry.span('chat.batch', size=len(user_inputs)):
+            responses = self._respond(user_inputs)
+        
+        for user_input, response in zip(user_inputs, responses):
+            self._remember(user_input, response)
+        
+        return responses
+    
+    def _respond(self, user_inputs: List[str]) -> List[Dict]:
+        self._sync_cache()
+        query_embeddings = self.kb.encode(user_inputs)
+        
+        responses = [None] * len(user_inputs)
+        misses = []
+        for row, user_input in enumerate(user_inputs):
+            cached = self.cache.lookup(query_embeddings[row], self._cache_tag(user_input))
+            telemetry.incr('semantic_cache_lookups', result='hit' if cached is not None else 'miss')
+            if cached is not None:
+                cached['tier'] = 'cache'
+                responses[row] = cached
+            else:
+                misses.append(row)
+        
+        if misses:
+            fresh = self._answer_uncached([user_inputs[i] for i in misses], query_embeddings[misses])
+            for row, response in zip(misses, fresh):
+                response['tier'] = 'vector'
+                self.cache.put(query_embeddings[row], response, self._cache_tag(user_inputs[row]))
+                responses[row] = response
+        
+        return responses
+    
+    def _answer_uncached(self, user_inputs: List[str], query_embeddings: np.ndarray) -> List[Dict]:
+        all_search_results = self.kb.search_batch(
+            user_inputs, n_results=self.n_candidates,
+            query_embeddings=query_embeddings, include_embeddings=True
+        )
+        
+        image_rows = [i for i, user_input in enumerate(user_inputs) if self._wants_images(user_input)]
+        all_images = [[] for _ in user_inputs]
+        if image_rows:
+            image_results = self.kb.get_images_by_query_batch(
+                [user_inputs[i] for i in image_rows],
+                n_results=3,
+                query_embeddings=query_embeddings[image_rows]
+            )
+            for row, images in zip(image_rows, image_results):
+                all_images[row] = images
+        
+        return [
+            self.format_response(user_input, search_results, images)
+            for user_input, search_results, images in zip(user_inputs, all_search_results, all_images)
+        ]
+    
     def get_demo_questions(self) -> List[str]:
         return [
             "What happened at CUNY in 1969?",
@@ -1,11 +1,23 @@
 import json
 import os
-from typing import Dict, List, Optional
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from typing import Dict, Iterator, List, Optional
 import re
+from streaming import split_fragments
 
 class SimpleCUNY1969Chatbot:
     """Simplified chatbot without vector database dependencies"""
     
+    SOURCES = [
+        'https://fivedemands.commons.gc.cuny.edu/',
+        'https://fivedemands.commons.gc.cuny.edu/timeline/',
+        'https://fivedemands.commons.gc.cuny.edu/seek-and-you-shall-find-a-search-for-education-excellence-and-knowledge/',
+        'https://fivedemands.commons.gc.cuny.edu/black-and-puerto-rican-studies/',
+        'https://fivedemands.commons.gc.cuny.edu/closing-the-open-door-open-admissions-at-the-city-university-of-new-york/'
+    ]
+    
     def __init__(self):
         self.knowledge_base = self.load_knowledge_base()
         self.context_window = []
@@ -133,6 +145,15 @@ class SimpleCUNY1969Chatbot:
         
         return "I couldn't find specific information about that in the CUNY 1969 archives. Try asking about the protests, timeline, Five Demands, key figures like Gallagher or Marshak, Open Admissions, SEEK program, or Black and Puerto Rican Studies."
     
+    def _remember(self, user_input: str, answer: str):
+        self.context_window.append({
+            'query': user_input,
+            'response': answer
+        })
+        
+        if len(self.context_window) > self.max_context_items:
+            self.context_window.pop(0)
+    
     def chat(self, user_input: str) -> Dict:
         """Main chat interface"""
         # Search for relevant content
@@ -143,26 +164,27 @@ class SimpleCUNY1969Chatbot:
         answer = self.generate_answer(user_input, search_results)
         
         # Store in context
-        self.context_window.append({
-            'query': user_input,
-            'response': answer
-        })
-        
-        if len(self.context_window) > self.max_context_items:
-            self.context_window.pop(0)
+        self._remember(user_input, answer)
         
         return {
             'answer': answer,
-            'sources': [
-                'https://fivedemands.commons.gc.cuny.edu/',
-                'https://fivedemands.commons.gc.cuny.edu/timeline/',
-                'https://fivedemands.commons.gc.cuny.edu/seek-and-you-shall-find-a-search-for-education-excellence-and-knowledge/',
-                'https://fivedemands.commons.gc.cuny.edu/black-and-puerto-rican-studies/',
-                'https://fivedemands.commons.gc.cuny.edu/closing-the-open-door-open-admissions-at-the-city-university-of-new-york/'
-            ],
+            'sources': list(self.SOURCES),
             'images': images
         }
     
+    def chat_stream(self, user_input: str) -> Iterator[Dict]:
+        """Yield sources and images once search finishes, then answer fragments"""
+        search_results = self.search_knowledge(user_input)
+        
+        yield {'type': 'sources', 'sources': list(self.SOURCES)}
+        yield {'type': 'images', 'images': self.get_relevant_images(user_input)}
+        
+        answer = self.generate_answer(user_input, search_results)
+        for fragment in split_fragments(answer):
+            yield {'type': 'answer', 'text': fragment}
+        
+        self._remember(user_input, answer)
+    
     def get_demo_questions(self) -> List[str]:
         """Get list of demo questions"""
         return [
@@ -0,0 +1,147 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import shutil
+import subprocess
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+import chromadb
+from chromadb.config import Settings
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# When set (e.g. http://127.0.0.1:8001), knowledge bases connect to this Chroma server instead of opening the files
+CHROMA_URL_ENV = "CUNY1969_CHROMA_URL"
+DEFAULT_CHROMA_PORT = 8001
+COLLECTION_NAME = "cuny_1969_knowledge"
+
+_clients: Dict[Tuple[int, str], object] = {}
+_clients_lock = threading.Lock()
+
+def parse_url(url: str) -> Tuple[str, int, bool]:
+    parsed = urlparse(url if '://' in url else f"http://{url}")
+    ssl = parsed.scheme == 'https'
+    return parsed.hostname or '127.0.0.1', parsed.port or (443 if ssl else DEFAULT_CHROMA_PORT), ssl
+
+def http_client(url: str, max_connections: int = 32, keepalive_secs: float = 60.0):
+    """One pooled HTTP client per process and server: every knowledge base in the process shares its keep-alive
+    connections instead of paying a TCP handshake per query"""
+    key = (os.getpid(), url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            host, port, ssl = parse_url(url)
+            client = chromadb.HttpClient(host=host, port=port, ssl=ssl, settings=Settings(
+                anonymized_telemetry=False,
+                chroma_http_keepalive_secs=keepalive_secs,
+                chroma_http_max_connections=max_connections,
+                chroma_http_max_keepalive_connections=max_connections
+            ))
+            _clients[key] = client
+        return client
+
+def open_client(db_dir: str, chroma_url: Optional[str] = None):
+    """The shared server's client if chroma_url is set, otherwise an embedded client on db_dir"""
+    if chroma_url:
+        return http_client(chroma_url)
+    return chromadb.PersistentClient(path=db_dir, settings=Settings(anonymized_telemetry=False))
+
+def wait_until_ready(url: str, timeout: float = 30.0, process: Optional[subprocess.Popen] = None):
+    deadline = time.monotonic() + timeout
+    host, port, ssl = parse_url(url)
+    while True:
+        try:
+            chromadb.HttpClient(host=host, port=port, ssl=ssl,
+                                settings=Settings(anonymized_telemetry=False)).heartbeat()
+            return
+        except Exception as e:
+            if process is not None and process.poll() is not None:
+                raise RuntimeError(f"Chroma server exited with code {process.returncode}") from e
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Chroma server at {url} not ready after {timeout:.0f} s: {e}") from e
+            time.sleep(0.2)
+
+class ChromaServer:
+    """A local `chroma run` process that owns db_dir; use as a context manager or call start()/stop()"""
+    
+    def __init__(self, db_dir: str = "../data/chroma_db", host: str = '127.0.0.1', port: int = DEFAULT_CHROMA_PORT,
+                 log_path: Optional[str] = None):
+        self.db_dir = db_dir
+        self.host = host
+        self.port = port
+        self.log_path = log_path
+        self.process: Optional[subprocess.Popen] = None
+        self._log = None
+    
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+    
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process else None
+    
+    def start(self, timeout: float = 30.0):
+        executable = shutil.which('chroma')
+        if executable is None:
+            raise RuntimeError("The chroma CLI is not on PATH; pip install chromadb")
+        
+        os.makedirs(self.db_dir, exist_ok=True)
+        self._log = open(self.log_path, 'ab') if self.log_path else subprocess.DEVNULL
+        self.process = subprocess.Popen(
+            [executable, 'run', '--path', self.db_dir, '--host', self.host, '--port', str(self.port)],
+            stdout=self._log, stderr=subprocess.STDOUT
+        )
+        try:
+            wait_until_ready(self.url, timeout, self.process)
+        except Exception:
+            self.stop()
+            raise
+        logger.info(f"Chroma server for {self.db_dir} listening on {self.url} (pid {self.process.pid})")
+        return self
+    
+    def stop(self, timeout: float = 10.0):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self._log not in (None, subprocess.DEVNULL):
+            self._log.close()
+        self._log = None
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Serve the CUNY 1969 vector store to every worker from one Chroma process')
+    parser.add_argument('--db-dir', default='../data/chroma_db', help='Chroma database directory the server owns')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to bind')
+    parser.add_argument('--port', type=int, default=DEFAULT_CHROMA_PORT, help='Port to listen on')
+    
+    args = parser.parse_args()
+    
+    server = ChromaServer(args.db_dir, args.host, args.port)
+    server.start()
+    print(f"Connect workers with: export {CHROMA_URL_ENV}={server.url}")
+    try:
+        server.process.wait()
+    except KeyboardInterrupt:
+        logger.info("Shutting down")
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,170 @@
+import json
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNKS_FILE = "chunks.bin"
+CHUNK_INDEX_FILE = "chunks_index.npy"
+CHUNK_DICT_FILE = "chunks.dict"
+CHUNK_TABLE_FILE = "chunk_table.json"
+CHUNK_STORE_FILES = [CHUNKS_FILE, CHUNK_INDEX_FILE, CHUNK_DICT_FILE, CHUNK_TABLE_FILE]
+
+# Metadata shared by every chunk and image of a scraped page (see CUNY1969KnowledgeBase.extract_metadata)
+PAGE_FIELDS = ['source_url', 'title', 'scraped_at', 'people_mentioned', 'dates_mentioned']
+
+def zlib_dictionary(samples: List[str], size: int = 32768) -> bytes:
+    """Preset dictionary of the phrases that repeat most; zlib looks back from the end, so the best go last"""
+    counts = Counter()
+    for sample in samples:
+        words = re.findall(r'\S+', sample)
+        for n in (1, 2, 3):
+            counts.update(' '.join(words[i:i + n]) for i in range(len(words) - n + 1))
+    
+    phrases, total = [], 0
+    for phrase, count in sorted(counts.items(), key=lambda item: item[1] * len(item[0]), reverse=True):
+        if count < 2 or len(phrase) < 4:
+            continue
+        encoded = (phrase + ' ').encode('utf-8')
+        if total + len(encoded) > size:
+            break
+        phrases.append(encoded)
+        total += len(encoded)
+    return b''.join(reversed(phrases))
+
+class TextCodec:
+    """zstd with a dictionary trained on the corpus when zstandard is installed, else zlib with a preset one"""
+    
+    def __init__(self, name: str, dictionary: bytes = b'', level: Optional[int] = None):
+        if name == 'zstd' and zstandard is None:
+            raise ImportError("This chunk store is zstd-compressed; pip install zstandard to read it")
+        self.name = name
+        self.dictionary = dictionary
+        self.level = level if level is not None else (9 if name == 'zstd' else 6)
+        self._local = threading.local()
+    
+    @classmethod
+    def train(cls, samples: List[str], dict_size: int = 32768) -> 'TextCodec':
+        if zstandard is not None:
+            try:
+                trained = zstandard.train_dictionary(dict_size, [sample.encode('utf-8') for sample in samples])
+                return cls('zstd', trained.as_bytes())
+            except zstandard.ZstdError:
+                # Too few or too small samples to train on
+                return cls('zstd')
+        return cls('zlib', zlib_dictionary(samples, min(dict_size, 32768)))
+    
+    def _zstd(self):
+        # zstandard (de)compressors must not be shared between threads
+        if getattr(self._local, 'compressor', None) is None:
+            dict_data = zstandard.ZstdCompressionDict(self.dictionary) if self.dictionary else None
+            self._local.compressor = zstandard.ZstdCompressor(level=self.level, dict_data=dict_data)
+            self._local.decompressor = zstandard.ZstdDecompressor(dict_data=dict_data)
+        return self._local.compressor, self._local.decompressor
+    
+    def compress(self, text: str) -> bytes:
+        data = text.encode('utf-8')
+        if self.name == 'zstd':
+            return self._zstd()[0].compress(data)
+        compressor = zlib.compressobj(self.level, zdict=self.dictionary) if self.dictionary else zlib.compressobj(self.level)
+        return compressor.compress(data) + compressor.flush()
+    
+    def decompress(self, data: bytes) -> str:
+        if self.name == 'zstd':
+            return self._zstd()[1].decompress(data).decode('utf-8')
+        decompressor = zlib.decompressobj(zdict=self.dictionary) if self.dictionary else zlib.decompressobj()
+        return (decompressor.decompress(data) + decompressor.flush()).decode('utf-8')
+
+def write_chunk_store(directory: str, ids: List[str], documents: List[str], metadatas: List[Dict],
+                      dict_size: int = 32768) -> Dict:
+    """Compressed texts addressed by (offset, length), plus a page table the records point into"""
+    codec = TextCodec.train(documents, dict_size)
+    
+    pages, page_rows, records = [], {}, []
+    for record_id, metadata in zip(ids, metadatas):
+        page = {field: metadata[field] for field in PAGE_FIELDS if field in metadata}
+        key = json.dumps(page, sort_keys=True, ensure_ascii=False)
+        if key not in page_rows:
+            page_rows[key] = len(pages)
+            pages.append(page)
+        extra = {field: value for field, value in metadata.items() if field not in page}
+        records.append({'id': record_id, 'page': page_rows[key], 'extra': extra})
+    
+    index = np.zeros((len(documents), 2), dtype=np.int64)
+    offset = 0
+    with open(os.path.join(directory, CHUNKS_FILE), 'wb') as f:
+        for row, document in enumerate(documents):
+            frame = codec.compress(document)
+            f.write(frame)
+            index[row] = (offset, len(frame))
+            offset += len(frame)
+    np.save(os.path.join(directory, CHUNK_INDEX_FILE), index)
+    
+    with open(os.path.join(directory, CHUNK_DICT_FILE), 'wb') as f:
+        f.write(codec.dictionary)
+    with open(os.path.join(directory, CHUNK_TABLE_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'codec': codec.name, 'level': codec.level, 'pages': pages, 'records': records},
+                  f, ensure_ascii=False)
+    
+    raw_bytes = sum(len(document.encode('utf-8')) for document in documents)
+    raw_bytes += sum(len(json.dumps(metadata, ensure_ascii=False).encode('utf-8')) for metadata in metadatas)
+    stored_bytes = sum(os.path.getsize(os.path.join(directory, name)) for name in CHUNK_STORE_FILES)
+    return {'codec': codec.name, 'records': len(records), 'pages': len(pages),
+            'raw_bytes': raw_bytes, 'stored_bytes': stored_bytes}
+
+class _LazyRows:
+    def __init__(self, store: 'ChunkStore', fetch):
+        self._store = store
+        self._fetch = fetch
+    
+    def __len__(self) -> int:
+        return len(self._store)
+    
+    def __getitem__(self, row: int):
+        if not -len(self) <= row < len(self):
+            raise IndexError(row)
+        return self._fetch(row % len(self))
+
+class ChunkStore:
+    """Read side: the text file is memory-mapped and a chunk is decompressed only when it is returned"""
+    
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, CHUNK_TABLE_FILE), 'r', encoding='utf-8') as f:
+            table = json.load(f)
+        with open(os.path.join(directory, CHUNK_DICT_FILE), 'rb') as f:
+            self.codec = TextCodec(table['codec'], f.read(), table['level'])
+        
+        self.pages = table['pages']
+        self._records = table['records']
+        self.ids = [record['id'] for record in self._records]
+        self.index = np.load(os.path.join(directory, CHUNK_INDEX_FILE), mmap_mode='r')
+        
+        chunks_path = os.path.join(directory, CHUNKS_FILE)
+        self._data = np.memmap(chunks_path, dtype=np.uint8, mode='r') if os.path.getsize(chunks_path) else b''
+        self.documents = _LazyRows(self, self.text)
+        self.metadatas = _LazyRows(self, self.metadata)
+    
+    def __len__(self) -> int:
+        return len(self._records)
+    
+    def text(self, row: int) -> str:
+        offset, length = self.index[row]
+        return self.codec.decompress(bytes(self._data[offset:offset + length]))
+    
+    def metadata(self, row: int) -> Dict:
+        record = self._records[row]
+        return {**self.pages[record['page']], **record['extra']}
+    
+    def column(self, field: str) -> np.ndarray:
+        """One metadata field for every row (None where absent), read without building the merged metadata dicts"""
+        pages = self.pages
+        return np.array([record['extra'][field] if field in record['extra'] else pages[record['page']].get(field)
+                         for record in self._records], dtype=object)
\ No newline at end of file
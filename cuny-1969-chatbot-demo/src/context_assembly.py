@@ -0,0 +1,86 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+def similarity_matrix(query_embedding: np.ndarray, candidate_embeddings: np.ndarray) -> np.ndarray:
+    """Cosine similarities: row 0 against the query, rows 1.. between candidates"""
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+    
+    return np.vstack([query, candidates]) @ candidates.T
+
+def mmr_order(similarity: np.ndarray, lambda_mult: float = 0.7, k: Optional[int] = None) -> List[int]:
+    """Order candidates by Maximal Marginal Relevance over a similarity_matrix"""
+    relevance = similarity[0]
+    pairwise = similarity[1:]
+    n = len(relevance)
+    k = n if k is None else min(k, n)
+    
+    selected = []
+    redundancy = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    
+    for step in range(k):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy if step else relevance.copy()
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        
+        selected.append(best)
+        available[best] = False
+        redundancy = pairwise[:, best] if step == 0 else np.maximum(redundancy, pairwise[:, best])
+    
+    return selected
+
+class ContextAssembler:
+    """Fills a character budget with diverse passages picked by MMR"""
+    
+    def __init__(self, char_budget: int = 500, lambda_mult: float = 0.7,
+                 max_passages: int = 3, min_passage_chars: int = 80,
+                 duplicate_threshold: float = 0.95):
+        self.char_budget = char_budget
+        self.lambda_mult = lambda_mult
+        self.max_passages = max_passages
+        self.min_passage_chars = min_passage_chars
+        self.duplicate_threshold = duplicate_threshold
+    
+    def _truncate(self, text: str, limit: int) -> str:
+        if len(text) <= limit:
+            return text
+        
+        cut = text[:max(limit - 3, 0)].rsplit(' ', 1)[0]
+        return cut + '...'
+    
+    def order(self, results: List[Dict], query_embedding: Optional[np.ndarray] = None) -> List[int]:
+        embeddings = [result.get('embedding') for result in results]
+        if query_embedding is None or any(embedding is None for embedding in embeddings):
+            return list(range(len(results)))
+        
+        similarity = similarity_matrix(query_embedding, np.asarray(embeddings, dtype=np.float32))
+        ordered = mmr_order(similarity, lambda_mult=self.lambda_mult)
+        
+        # Passages that are near-copies of one already picked add nothing to the context
+        pairwise = similarity[1:]
+        kept = []
+        for index in ordered:
+            if kept and float(pairwise[kept, index].max()) >= self.duplicate_threshold:
+                continue
+            kept.append(index)
+        
+        return kept
+    
+    def assemble(self, results: List[Dict], query_embedding: Optional[np.ndarray] = None) -> Tuple[str, List[Dict]]:
+        passages = []
+        selected = []
+        remaining = self.char_budget
+        
+        for index in self.order(results, query_embedding):
+            if len(selected) >= self.max_passages or remaining < self.min_passage_chars:
+                break
+            
+            text = self._truncate(results[index]['content'], remaining)
+            passages.append(text)
+            selected.append(results[index])
+            remaining -= len(text) + 2
+        
+        return '\n\n'.join(passages), selected
\ No newline at end of file
@@ -0,0 +1,122 @@
+import re
+import zlib
+from typing import Dict, List
+import numpy as np
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+def shingles(text: str, size: int = 5) -> List[str]:
+    words = re.findall(r'\w+', text.lower())
+    if len(words) <= size:
+        return [' '.join(words)] if words else []
+    return [' '.join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+class MinHashDeduplicator:
+    """Groups near-duplicate texts with MinHash signatures and LSH banding"""
+    
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, bands: int = 32,
+                 shingle_size: int = 5, seed: int = 1969):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.array(
+            [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles(text, self.shingle_size)],
+            dtype=np.uint64
+        )
+        if len(hashes) == 0:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        
+        # (a * x + b) mod p per permutation; uint64 products wrap, which keeps the hashes well mixed
+        permuted = (np.outer(hashes, self._a) + self._b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0)
+    
+    def clusters(self, texts: List[str]) -> List[List[int]]:
+        """Index groups of near-duplicates (each sorted, first index is the canonical one); singletons omitted"""
+        signatures = np.array([self.signature(text) for text in texts], dtype=np.uint64)
+        rows = self.num_perm // self.bands
+        
+        parent = list(range(len(texts)))
+        
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+        
+        checked = set()
+        for band in range(self.bands):
+            buckets: Dict[bytes, List[int]] = {}
+            for i, signature in enumerate(signatures):
+                buckets.setdefault(signature[band * rows:(band + 1) * rows].tobytes(), []).append(i)
+            
+            for members in buckets.values():
+                for other in members[1:]:
+                    pair = (members[0], other)
+                    if pair in checked:
+                        continue
+                    checked.add(pair)
+                    # Banding only proposes candidates; the signature agreement estimates Jaccard
+                    if np.mean(signatures[members[0]] == signatures[other]) >= self.threshold:
+                        root_a, root_b = find(members[0]), find(other)
+                        if root_a != root_b:
+                            parent[max(root_a, root_b)] = min(root_a, root_b)
+        
+        groups: Dict[int, List[int]] = {}
+        for i in range(len(texts)):
+            groups.setdefault(find(i), []).append(i)
+        return [members for members in groups.values() if len(members) > 1]
+
+class StreamingDeduplicator:
+    """clusters() for texts arriving one at a time: the same pairs are compared, so the same groups come out"""
+    
+    def __init__(self, deduplicator: MinHashDeduplicator):
+        self.deduplicator = deduplicator
+        self._rows = deduplicator.num_perm // deduplicator.bands
+        self._buckets: List[Dict[bytes, int]] = [{} for _ in range(deduplicator.bands)]
+        self._signatures: List[np.ndarray] = []
+        self._parent: List[int] = []
+    
+    def __len__(self) -> int:
+        return len(self._signatures)
+    
+    def find(self, i: int) -> int:
+        parent = self._parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    
+    def add(self, text: str) -> int:
+        """Index of the first text this one is a near-duplicate of (its own if none); a group's first copy never changes"""
+        signature = self.deduplicator.signature(text)
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        self._parent.append(index)
+        
+        checked = set()
+        for band, buckets in enumerate(self._buckets):
+            other = buckets.setdefault(signature[band * self._rows:(band + 1) * self._rows].tobytes(), index)
+            if other == index or other in checked:
+                continue
+            checked.add(other)
+            if np.mean(self._signatures[other] == signature) >= self.deduplicator.threshold:
+                root_a, root_b = self.find(other), self.find(index)
+                if root_a != root_b:
+                    self._parent[max(root_a, root_b)] = min(root_a, root_b)
+        return self.find(index)
+    
+    def clusters(self) -> List[List[int]]:
+        groups: Dict[int, List[int]] = {}
+        for i in range(len(self)):
+            groups.setdefault(self.find(i), []).append(i)
+        return [members for members in groups.values() if len(members) > 1]
\ No newline at end of file
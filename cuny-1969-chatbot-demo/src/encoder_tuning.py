@@ -0,0 +1,228 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_TUNING_FILE = os.path.join("..", "data", "encoder_tuning.json")
+BATCH_SIZES = [1, 4, 8, 16, 32, 64]
+# A configuration this close to the best throughput wins if it needs fewer threads, leaving cores for other work
+THREAD_TOLERANCE = 0.05
+TUNING_MODES = ['auto', 'retune', 'off']
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def core_budget(workers: int = 1, cores: Optional[int] = None) -> int:
+    """Cores each of `workers` concurrently encoding processes may use without oversubscribing the host"""
+    return max((cores or available_cores()) // max(workers, 1), 1)
+
+def set_encoder_threads(threads: int) -> bool:
+    """Intra-op threads for torch and ONNX Runtime in this process; False when neither is installed"""
+    from encoders import onnxruntime, set_onnx_threads
+    
+    set_onnx_threads(threads)
+    try:
+        import torch
+    except ImportError:
+        return onnxruntime is not None
+    torch.set_num_threads(threads)
+    return True
+
+def thread_counts(max_threads: int) -> List[int]:
+    counts, threads = [], 1
+    while threads < max_threads:
+        counts.append(threads)
+        threads *= 2
+    return counts + [max_threads]
+
+def host_key(model_name: str) -> str:
+    """Tunings are only reused on the same machine, core count, model/backend and runtime builds"""
+    from encoders import onnxruntime
+    
+    try:
+        import torch
+        runtime = f"torch {torch.__version__}"
+    except ImportError:
+        runtime = 'torch none'
+    if onnxruntime is not None:
+        runtime += f", onnxruntime {onnxruntime.__version__}"
+    return f"{platform.node()}/{platform.machine()}/{available_cores()} cores/{model_name}/{runtime}"
+
+def sample_texts(data_dir: str = "../data", count: int = 48, chunk_size: int = 300) -> List[str]:
+    """Passages shaped like the knowledge base's chunks, from the scraped pages or the demo content"""
+    from demo_data import DemoDataCreator
+    
+    scraped_path = os.path.join(data_dir, 'scraped_content.json')
+    if os.path.exists(scraped_path):
+        with open(scraped_path, 'r', encoding='utf-8') as f:
+            pages = json.load(f)
+    else:
+        pages = DemoDataCreator(data_dir=data_dir).create_demo_content()
+    
+    words = ' '.join(block['text'] for page in pages for block in page.get('content', [])).split()
+    chunks = [' '.join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
+    if not chunks:
+        raise ValueError(f"No text to tune the encoder with in {data_dir}")
+    # Repeat a small corpus so every batch size gets several full batches
+    return (chunks * (count // len(chunks) + 1))[:count]
+
+def probe(model, texts: List[str], batch_sizes: Optional[List[int]] = None,
+          threads: Optional[List[int]] = None, repeats: int = 2) -> List[Dict]:
+    """Encoding throughput (texts per second, best of repeats) for every thread count and batch size"""
+    batch_sizes = batch_sizes or BATCH_SIZES
+    # Without torch there is no thread knob: probe batch sizes only
+    threads = threads or thread_counts(available_cores())
+    if not set_encoder_threads(threads[0]):
+        threads = [0]
+    
+    grid = []
+    for thread_count in threads:
+        if thread_count:
+            set_encoder_threads(thread_count)
+        for batch_size in batch_sizes:
+            model.encode(texts[:batch_size], batch_size=batch_size, show_progress_bar=False)
+            best = float('inf')
+            for _ in range(repeats):
+                start = time.perf_counter()
+                model.encode(texts, batch_size=batch_size, show_progress_bar=False)
+                best = min(best, time.perf_counter() - start)
+            grid.append({
+                'threads': thread_count,
+                'batch_size': batch_size,
+                'texts_per_s': len(texts) / best if best > 0 else float('inf')
+            })
+            logger.info(f"threads={thread_count or 'default'} batch_size={batch_size}: "
+                        f"{grid[-1]['texts_per_s']:.1f} texts/s")
+    return grid
+
+def select(grid: List[Dict], budget: Optional[int] = None) -> Dict:
+    """Fastest setting that fits in `budget` threads, preferring fewer threads when throughput is nearly equal"""
+    fitting = [entry for entry in grid if budget is None or entry['threads'] <= budget] or \
+              [min(grid, key=lambda entry: entry['threads'])]
+    best = max(entry['texts_per_s'] for entry in fitting)
+    close = [entry for entry in fitting if entry['texts_per_s'] >= best * (1 - THREAD_TOLERANCE)]
+    return min(close, key=lambda entry: (entry['threads'], -entry['texts_per_s']))
+
+def load_tuning(path: str, key: str) -> Optional[Dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get(key)
+    except (OSError, ValueError):
+        return None
+
+def save_tuning(path: str, key: str, tuning: Dict):
+    tunings = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            tunings = json.load(f)
+    tunings[key] = tuning
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(tunings, f, indent=2)
+    os.replace(tmp_path, path)
+
+def tune(model, model_name: str, path: str = DEFAULT_TUNING_FILE, data_dir: str = "../data") -> Dict:
+    """Probe this host and store the grid under its key; restores the full core count afterwards"""
+    start = time.perf_counter()
+    grid = probe(model, sample_texts(data_dir))
+    set_encoder_threads(available_cores())
+    tuning = {
+        'host': host_key(model_name),
+        'tuned_at': datetime.now().isoformat(timespec='seconds'),
+        'probe_s': time.perf_counter() - start,
+        'best': select(grid),
+        'grid': grid
+    }
+    save_tuning(path, tuning['host'], tuning)
+    logger.info(f"Encoder tuned in {tuning['probe_s']:.1f} s: {tuning['best']} (saved to {path})")
+    return tuning
+
+def ensure_tuning(model_name: str, model=None, path: str = DEFAULT_TUNING_FILE, data_dir: str = "../data",
+                  retune: bool = False) -> Dict:
+    """This host's stored tuning, probing first if there is none. Without a model the probe runs in a child
+    process, so a parent that forks workers never starts a multi-threaded OpenMP pool itself"""
+    tuning = None if retune else load_tuning(path, host_key(model_name))
+    if tuning is not None:
+        return tuning
+    if model is not None:
+        return tune(model, model_name, path, data_dir)
+    
+    # The child loads the same backend from CUNY1969_ENCODER, which it inherits
+    subprocess.run([sys.executable, os.path.abspath(__file__), '--output', path, '--data-dir', data_dir,
+                    '--retune'], check=True)
+    tuning = load_tuning(path, host_key(model_name))
+    if tuning is None:
+        raise RuntimeError(f"Encoder tuning for this host was not written to {path}")
+    return tuning
+
+def apply_tuning(kb, setting: Dict, set_threads: bool = True):
+    kb.encode_batch_size = setting['batch_size']
+    if set_threads and setting['threads']:
+        set_encoder_threads(setting['threads'])
+
+def add_tuning_arguments(parser):
+    parser.add_argument('--encoder-tuning', choices=TUNING_MODES, default='auto',
+                        help="auto: use this host's stored encoder batch size/threads, probing once if missing; "
+                             "retune: probe again; off: library defaults")
+    parser.add_argument('--tuning-file', default=DEFAULT_TUNING_FILE, help='Where per-host encoder tunings are kept')
+
+def configure_encoder(args, kb, workers: int = 1, set_threads: bool = True, isolated: bool = False) -> Optional[Dict]:
+    """Tune kb's encoder for its share of the cores when `workers` processes encode at once; returns the setting"""
+    if args.encoder_tuning == 'off':
+        return None
+    from encoders import encoder_name
+    
+    tuning = ensure_tuning(encoder_name(kb.model), model=None if isolated else kb.model, path=args.tuning_file,
+                           data_dir=getattr(args, 'data_dir', '../data'), retune=args.encoder_tuning == 'retune')
+    budget = core_budget(workers)
+    setting = select(tuning['grid'], budget)
+    apply_tuning(kb, setting, set_threads)
+    logger.info(f"Encoder: batch size {setting['batch_size']}, {setting['threads'] or 'default'} thread(s) "
+                f"({budget} core(s) per process for {workers} process(es))")
+    return setting
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Probe encoder throughput across batch sizes and thread counts')
+    parser.add_argument('--backend', default=None,
+                        help='Encoder backend to tune (default: $CUNY1969_ENCODER or torch; see encoders.py)')
+    parser.add_argument('--data-dir', default='../data', help='Data directory with scraped_content.json')
+    parser.add_argument('--output', default=DEFAULT_TUNING_FILE, help='Tuning file to update')
+    parser.add_argument('--workers', type=int, default=1, help='Show the setting for this many concurrent workers')
+    parser.add_argument('--retune', action='store_true', help='Probe even if this host is already tuned')
+    
+    args = parser.parse_args()
+    
+    from encoders import encoder_name, load_encoder
+    
+    model = load_encoder(args.backend)
+    model_name = encoder_name(model)
+    tuning = load_tuning(args.output, host_key(model_name)) if not args.retune else None
+    if tuning is None:
+        tuning = tune(model, model_name, args.output, args.data_dir)
+    
+    print(f"\n{tuning['host']} (tuned {tuning['tuned_at']})")
+    print(f"{'threads':>7} {'batch':>6} {'texts/s':>9}")
+    for entry in tuning['grid']:
+        print(f"{entry['threads'] or '-':>7} {entry['batch_size']:>6} {entry['texts_per_s']:>9.1f}")
+    setting = select(tuning['grid'], core_budget(args.workers))
+    print(f"\nWith {args.workers} worker(s): batch size {setting['batch_size']}, "
+          f"{setting['threads'] or 'default'} thread(s) each")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,304 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import time
+from typing import Dict, List, Optional
+import numpy as np
+import logging
+
+from metrics import summarize
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:
+    Tokenizer = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_NAME = 'all-MiniLM-L6-v2'
+# Select the backend for every knowledge base in the process, e.g. CUNY1969_ENCODER=onnx-int8
+ENCODER_ENV = "CUNY1969_ENCODER"
+ENCODER_DIR_ENV = "CUNY1969_ENCODER_DIR"
+DEFAULT_ENCODER_DIR = os.path.join("..", "data", "encoders", DEFAULT_MODEL_NAME)
+BACKENDS = ['torch', 'torch-int8', 'onnx', 'onnx-int8']
+ONNX_FILES = {'onnx': 'model.onnx', 'onnx-int8': 'model_int8.onnx'}
+SENTENCE_TRANSFORMER_DIR = 'sentence_transformer'
+ENCODER_CONFIG_FILE = 'encoder_config.json'
+PROBE_FILE = 'probe.npz'
+# Lowest cosine between a backend's embedding and the reference one, over the probe set, that we accept
+MIN_COSINE = 0.98
+
+_num_threads = 0
+
+def set_onnx_threads(threads: int):
+    """Intra-op threads for ONNX Runtime sessions in this process (0 = one per core); sessions are rebuilt lazily"""
+    global _num_threads
+    _num_threads = threads
+
+def default_backend() -> str:
+    return os.environ.get(ENCODER_ENV) or 'torch'
+
+def default_encoder_dir() -> str:
+    return os.environ.get(ENCODER_DIR_ENV) or DEFAULT_ENCODER_DIR
+
+def encoder_name(model) -> str:
+    """Model and backend, e.g. for keying tunings; the reference backend keeps the plain model name"""
+    backend = getattr(model, 'backend', 'torch')
+    return DEFAULT_MODEL_NAME if backend == 'torch' else f"{DEFAULT_MODEL_NAME}:{backend}"
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+class OnnxEncoder:
+    """The exported transformer on ONNX Runtime with mean pooling in numpy; encode() matches SentenceTransformer's"""
+    
+    def __init__(self, model_dir: str, backend: str = 'onnx'):
+        if onnxruntime is None or Tokenizer is None:
+            raise ImportError("pip install onnxruntime tokenizers to use the ONNX encoder backends")
+        with open(os.path.join(model_dir, ENCODER_CONFIG_FILE), 'r', encoding='utf-8') as f:
+            self.config = json.load(f)
+        
+        self.backend = backend
+        self.model_path = os.path.join(model_dir, ONNX_FILES[backend])
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(f"No {ONNX_FILES[backend]} in {model_dir}; run encoders.py --export")
+        
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=self.config['max_seq_length'])
+        self.tokenizer.enable_padding(pad_id=self.config['pad_id'], pad_token=self.config['pad_token'])
+        self._session = None
+        self._session_threads = None
+    
+    @property
+    def session(self):
+        # Created on first use and again after a thread change, so a pre-fork master need not hold a thread pool
+        if self._session is None or self._session_threads != _num_threads:
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = _num_threads
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self._session = onnxruntime.InferenceSession(
+                self.model_path, options, providers=['CPUExecutionProvider']
+            )
+            self._session_threads = _num_threads
+        return self._session
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config['dimension']
+    
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            feeds = {
+                'input_ids': np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+                'attention_mask': np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+                'token_type_ids': np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+            }
+            hidden = self.session.run(None, {name: feeds[name] for name in self.config['inputs']})[0]
+            mask = feeds['attention_mask'][:, :, None].astype(np.float32)
+            batches.append((hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9))
+        
+        embeddings = np.concatenate(batches) if batches else np.zeros((0, self.config['dimension']), np.float32)
+        if normalize_embeddings or self.config['normalize']:
+            embeddings = _normalize(embeddings)
+        embeddings = embeddings.astype(np.float32)
+        return embeddings[0] if single else embeddings
+
+def quantize_torch(model):
+    """int8 dynamic quantization of every Linear layer; weights are int8, activations quantized per batch"""
+    import torch
+    
+    quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    quantized.backend = 'torch-int8'
+    return quantized
+
+def check_agreement(encoder, model_dir: str, min_cosine: float = MIN_COSINE) -> Dict:
+    """Cosine between the encoder's embeddings of the probe set and the reference encoder's, saved at export"""
+    probe_path = os.path.join(model_dir, PROBE_FILE)
+    if not os.path.exists(probe_path):
+        raise FileNotFoundError(f"No {PROBE_FILE} in {model_dir}; run encoders.py --export")
+    with np.load(probe_path) as probe:
+        texts, reference = [str(text) for text in probe['texts']], probe['embeddings']
+    
+    embeddings = _normalize(np.asarray(encoder.encode(texts, normalize_embeddings=True), dtype=np.float32))
+    cosines = np.sum(embeddings * _normalize(reference), axis=1)
+    report = {
+        'backend': getattr(encoder, 'backend', 'torch'),
+        'texts': len(texts),
+        'min_cosine': float(cosines.min()),
+        'mean_cosine': float(cosines.mean())
+    }
+    if report['min_cosine'] < min_cosine:
+        raise ValueError(f"{report['backend']} encoder disagrees with the reference: cosine down to "
+                         f"{report['min_cosine']:.4f} < {min_cosine} on the probe set; re-export or use torch")
+    return report
+
+def load_encoder(backend: Optional[str] = None, model_dir: Optional[str] = None, check: bool = True,
+                 min_cosine: float = MIN_COSINE):
+    """Encoder for the backend ($CUNY1969_ENCODER, default torch); the others load from the exported model_dir
+    and are checked against the reference embeddings first"""
+    backend = backend or default_backend()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}'; choose from {BACKENDS}")
+    if backend.startswith('torch') and SentenceTransformer is None:
+        raise ImportError(f"pip install sentence-transformers to use the {backend} encoder")
+    if backend == 'torch':
+        return SentenceTransformer(DEFAULT_MODEL_NAME)
+    
+    model_dir = model_dir or default_encoder_dir()
+    start = time.perf_counter()
+    if backend == 'torch-int8':
+        encoder = quantize_torch(SentenceTransformer(os.path.join(model_dir, SENTENCE_TRANSFORMER_DIR)))
+    else:
+        encoder = OnnxEncoder(model_dir, backend)
+    
+    if check:
+        report = check_agreement(encoder, model_dir, min_cosine)
+        logger.info(f"Loaded {backend} encoder from {model_dir} in {(time.perf_counter() - start) * 1000:.0f} ms; "
+                    f"cosine vs reference min {report['min_cosine']:.4f}, mean {report['mean_cosine']:.4f}")
+    return encoder
+
+def probe_texts(data_dir: str = "../data") -> List[str]:
+    """Questions and chunk-sized passages, covering both query and ingest inputs"""
+    from chatbot_simple import SimpleCUNY1969Chatbot
+    from demo_data import DemoDataCreator
+    from encoder_tuning import sample_texts
+    
+    questions = SimpleCUNY1969Chatbot().get_demo_questions()
+    questions += [pair['question'] for pair in DemoDataCreator(data_dir=data_dir).create_sample_qa_pairs()]
+    return list(dict.fromkeys(questions + sample_texts(data_dir, count=16)))
+
+def export_encoder(output_dir: str = DEFAULT_ENCODER_DIR, model_name: str = DEFAULT_MODEL_NAME,
+                   data_dir: str = "../data", opset: int = 17) -> Dict:
+    """Write the local model directory: the SentenceTransformer, its tokenizer, fp32 and int8 ONNX graphs of the
+    transformer, and reference embeddings of the probe set"""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers.models import Normalize, Pooling
+    
+    model = SentenceTransformer(model_name, device='cpu')
+    pooling = next((module for module in model if isinstance(module, Pooling)), None)
+    if pooling is None or pooling.get_pooling_mode_str() != 'mean':
+        raise ValueError(f"{model_name} does not use mean pooling, which the ONNX encoder implements")
+    
+    os.makedirs(output_dir, exist_ok=True)
+    model.save(os.path.join(output_dir, SENTENCE_TRANSFORMER_DIR))
+    model.tokenizer.save_pretrained(output_dir)
+    
+    sample = model.tokenizer(["CUNY 1969 open admissions"], return_tensors='pt')
+    inputs = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    transformer = model[0].auto_model.eval()
+    
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+        
+        def forward(self, *args):
+            return self.transformer(**dict(zip(inputs, args))).last_hidden_state
+    
+    axes = {name: {0: 'batch', 1: 'sequence'} for name in inputs + ['last_hidden_state']}
+    fp32_path = os.path.join(output_dir, ONNX_FILES['onnx'])
+    with torch.no_grad():
+        torch.onnx.export(LastHiddenState(), tuple(sample[name] for name in inputs), fp32_path,
+                          input_names=inputs, output_names=['last_hidden_state'], dynamic_axes=axes,
+                          opset_version=opset)
+    quantize_dynamic(fp32_path, os.path.join(output_dir, ONNX_FILES['onnx-int8']), weight_type=QuantType.QInt8)
+    
+    config = {
+        'model_name': model_name,
+        'dimension': model.get_sentence_embedding_dimension(),
+        'max_seq_length': model.max_seq_length,
+        'normalize': any(isinstance(module, Normalize) for module in model),
+        'pad_token': model.tokenizer.pad_token,
+        'pad_id': model.tokenizer.pad_token_id,
+        'inputs': inputs
+    }
+    with open(os.path.join(output_dir, ENCODER_CONFIG_FILE), 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+    
+    texts = probe_texts(data_dir)
+    np.savez(os.path.join(output_dir, PROBE_FILE), texts=np.array(texts),
+             embeddings=model.encode(texts, normalize_embeddings=True, show_progress_bar=False))
+    logger.info(f"Exported {model_name} to {output_dir} with {len(texts)} probe texts")
+    return config
+
+def compare_backends(queries: List[str], backends: List[str], model_dir: Optional[str] = None,
+                     iterations: int = 5) -> Dict:
+    """Per-query and whole-batch encode latency of each backend, its speedup over torch and its agreement"""
+    model_dir = model_dir or default_encoder_dir()
+    results = {}
+    for backend in ['torch'] + [backend for backend in backends if backend != 'torch']:
+        try:
+            encoder = load_encoder(backend, model_dir, check=False)
+            agreement = check_agreement(encoder, model_dir, min_cosine=-1.0) if backend != 'torch' else None
+        except (ImportError, OSError, ValueError) as e:
+            logger.warning(f"Skipping the {backend} encoder: {e}")
+            results[backend] = {'error': str(e)}
+            continue
+        
+        encoder.encode(queries, batch_size=len(queries), show_progress_bar=False)
+        query_ms, batch_ms = [], []
+        for _ in range(iterations):
+            for query in queries:
+                start = time.perf_counter()
+                encoder.encode([query], show_progress_bar=False)
+                query_ms.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            encoder.encode(queries, batch_size=len(queries), show_progress_bar=False)
+            batch_ms.append((time.perf_counter() - start) * 1000)
+        results[backend] = {'query_ms': summarize(query_ms), 'batch_ms': summarize(batch_ms), 'agreement': agreement}
+    
+    reference = results.get('torch', {})
+    for backend, result in results.items():
+        if 'error' in result or 'error' in reference:
+            continue
+        result['query_speedup'] = reference['query_ms']['p50'] / result['query_ms']['p50']
+        result['batch_speedup'] = reference['batch_ms']['p50'] / result['batch_ms']['p50']
+    return results
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Export the embedding model for ONNX Runtime and check the backends')
+    parser.add_argument('--export', action='store_true', help='Export the model, ONNX graphs and probe set')
+    parser.add_argument('--check', default=','.join(BACKENDS[1:]),
+                        help='Comma-separated backends to check against the reference embeddings')
+    parser.add_argument('--model-dir', default=None, help=f'Exported model directory (default: ${ENCODER_DIR_ENV} '
+                                                          f'or {DEFAULT_ENCODER_DIR})')
+    parser.add_argument('--data-dir', default='../data', help='Data directory for the probe passages')
+    
+    args = parser.parse_args()
+    
+    model_dir = args.model_dir or default_encoder_dir()
+    if args.export:
+        export_encoder(model_dir, data_dir=args.data_dir)
+    
+    for backend in [backend.strip() for backend in args.check.split(',') if backend.strip()]:
+        try:
+            report = check_agreement(load_encoder(backend, model_dir, check=False), model_dir, min_cosine=-1.0)
+        except (ImportError, OSError, ValueError) as e:
+            print(f"{backend:<11} unavailable: {e}")
+            continue
+        verdict = 'ok' if report['min_cosine'] >= MIN_COSINE else 'REJECTED'
+        print(f"{backend:<11} min cosine {report['min_cosine']:.4f}  mean {report['mean_cosine']:.4f}  {verdict}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
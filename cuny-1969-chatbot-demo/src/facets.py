@@ -0,0 +1,164 @@
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Union
+from urllib.parse import urlparse
+import numpy as np
+
+FACETS_FILE = "facets.json"
+FACETS = ['content_type', 'year', 'person', 'source']
+
+class RunLengthBitmap:
+    """Sorted row set stored as (start, length) runs; chunks of one page sit next to each other"""
+    
+    def __init__(self, starts: Optional[np.ndarray] = None, lengths: Optional[np.ndarray] = None):
+        self.starts = np.asarray(starts if starts is not None else [], dtype=np.int64)
+        self.lengths = np.asarray(lengths if lengths is not None else [], dtype=np.int64)
+    
+    @classmethod
+    def from_positions(cls, positions: Iterable[int]) -> 'RunLengthBitmap':
+        positions = np.unique(np.fromiter(positions, dtype=np.int64))
+        if len(positions) == 0:
+            return cls()
+        
+        breaks = np.flatnonzero(np.diff(positions) != 1) + 1
+        starts = positions[np.concatenate([[0], breaks])]
+        ends = positions[np.concatenate([breaks - 1, [len(positions) - 1]])]
+        return cls(starts, ends - starts + 1)
+    
+    def __len__(self) -> int:
+        return int(self.lengths.sum())
+    
+    def positions(self) -> np.ndarray:
+        if len(self.starts) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(start, start + length) for start, length in zip(self.starts, self.lengths)])
+    
+    def __and__(self, other: 'RunLengthBitmap') -> 'RunLengthBitmap':
+        starts, lengths = [], []
+        i = j = 0
+        while i < len(self.starts) and j < len(other.starts):
+            a_end = self.starts[i] + self.lengths[i]
+            b_end = other.starts[j] + other.lengths[j]
+            start = max(self.starts[i], other.starts[j])
+            end = min(a_end, b_end)
+            if start < end:
+                starts.append(start)
+                lengths.append(end - start)
+            if a_end <= b_end:
+                i += 1
+            else:
+                j += 1
+        return RunLengthBitmap(starts, lengths)
+    
+    def __or__(self, other: 'RunLengthBitmap') -> 'RunLengthBitmap':
+        order = np.argsort(np.concatenate([self.starts, other.starts]), kind='stable')
+        all_starts = np.concatenate([self.starts, other.starts])[order]
+        all_ends = all_starts + np.concatenate([self.lengths, other.lengths])[order]
+        
+        starts, ends = [], []
+        for start, end in zip(all_starts, all_ends):
+            if ends and start <= ends[-1]:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        return RunLengthBitmap(starts, np.asarray(ends, dtype=np.int64) - np.asarray(starts, dtype=np.int64))
+    
+    def to_list(self) -> List[int]:
+        return np.column_stack([self.starts, self.lengths]).reshape(-1).tolist()
+    
+    @classmethod
+    def from_list(cls, runs: List[int]) -> 'RunLengthBitmap':
+        pairs = np.asarray(runs, dtype=np.int64).reshape(-1, 2)
+        return cls(pairs[:, 0], pairs[:, 1])
+
+def facet_values(metadata: Dict) -> Dict[str, List[str]]:
+    """Normalized facet values of one record; people are also indexed by each name part, sources by host"""
+    people = set()
+    for name in metadata.get('people_mentioned') or []:
+        name = name.strip().lower()
+        if name:
+            people.add(name)
+            people.update(name.split())
+    
+    sources = set()
+    for source in [metadata.get('source_url', '')] + list(metadata.get('source_urls') or []):
+        if source:
+            sources.update([source.lower(), urlparse(source).netloc.lower()])
+    
+    return {
+        'content_type': [metadata['content_type']] if metadata.get('content_type') else [],
+        'year': sorted({str(year) for year in metadata.get('dates_mentioned') or []}),
+        'person': sorted(people),
+        'source': sorted(sources)
+    }
+
+class FacetIndex:
+    """Facet value -> bitmap of record rows, for restricting vector search before scoring"""
+    
+    def __init__(self, ids: List[str], postings: Dict[str, Dict[str, RunLengthBitmap]]):
+        self.ids = ids
+        self.postings = postings
+    
+    @classmethod
+    def build(cls, ids: List[str], metadatas: List[Dict]) -> 'FacetIndex':
+        positions: Dict[str, Dict[str, List[int]]] = {facet: {} for facet in FACETS}
+        for row, metadata in enumerate(metadatas):
+            for facet, values in facet_values(metadata).items():
+                for value in values:
+                    positions[facet].setdefault(value, []).append(row)
+        
+        postings = {
+            facet: {value: RunLengthBitmap.from_positions(rows) for value, rows in values.items()}
+            for facet, values in positions.items()
+        }
+        return cls(list(ids), postings)
+    
+    def values(self, facet: str) -> Dict[str, int]:
+        return {value: len(bitmap) for value, bitmap in self.postings.get(facet, {}).items()}
+    
+    def select(self, filters: Dict[str, Union[str, int, List]]) -> RunLengthBitmap:
+        """AND across facets, OR across the values given for one facet"""
+        selected = None
+        for facet, wanted in filters.items():
+            if facet not in FACETS:
+                raise ValueError(f"Unknown facet '{facet}'; choose from {FACETS}")
+            
+            wanted = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+            matches = RunLengthBitmap()
+            for value in wanted:
+                bitmap = self.postings[facet].get(str(value).strip().lower())
+                if bitmap is not None:
+                    matches = matches | bitmap
+            
+            selected = matches if selected is None else selected & matches
+            if len(selected) == 0:
+                break
+        
+        return selected if selected is not None else RunLengthBitmap([0], [len(self.ids)])
+    
+    def ids_for(self, filters: Dict[str, Union[str, int, List]]) -> List[str]:
+        return [self.ids[row] for row in self.select(filters).positions()]
+    
+    def save(self, path: str):
+        payload = {
+            'ids': self.ids,
+            'postings': {
+                facet: {value: bitmap.to_list() for value, bitmap in values.items()}
+                for facet, values in self.postings.items()
+            }
+        }
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(f"{path}.tmp", path)
+    
+    @classmethod
+    def load(cls, path: str) -> 'FacetIndex':
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        
+        postings = {
+            facet: {value: RunLengthBitmap.from_list(runs) for value, runs in values.items()}
+            for facet, values in payload['postings'].items()
+        }
+        return cls(payload['ids'], postings)
\ No newline at end of file
@@ -0,0 +1,129 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional
+import logging
+
+from chatbot_simple import SimpleCUNY1969Chatbot
+from metrics import telemetry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TIERS = ['vector', 'cache', 'keyword']
+
+class BudgetedChatbot:
+    """Answers within a latency budget: vector retrieval if it finishes in time, else a cached answer, else keywords.
+    The chatbot is not thread-safe, so one worker runs its calls one at a time under a lock"""
+    
+    def __init__(self, chatbot, budget_ms: float = 250.0, keyword_bot: Optional[SimpleCUNY1969Chatbot] = None,
+                 max_pending: int = 8):
+        self.chatbot = chatbot
+        self.budget_ms = budget_ms
+        self.keyword_bot = keyword_bot or SimpleCUNY1969Chatbot()
+        self.max_pending = max_pending
+        self.tier_counts = Counter()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='chat-vector')
+        # Cache-tier embeddings are encoded here, next to the vector call, never on the request thread
+        self._lookup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='chat-cache-lookup')
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._chatbot_lock = threading.Lock()
+    
+    def _finished(self, future):
+        # Runs when vector retrieval completes or is cancelled, even after the request gave up on it
+        with self._lock:
+            self._pending -= 1
+    
+    def _run(self, user_inputs: List[str]) -> List[Dict]:
+        with self._chatbot_lock:
+            return self.chatbot.chat_batch(user_inputs)
+    
+    def _submit(self, user_inputs: List[str]):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return None
+            self._pending += 1
+        
+        future = self._executor.submit(self._run, user_inputs)
+        future.add_done_callback(self._finished)
+        return future
+    
+    def _lookup_embeddings(self, lookup, deadline: float):
+        """The cache tier's query embeddings if encoding finished by the deadline, else None. Fallback happens
+        when the vector path is slow or failing, which is often the encoder itself"""
+        if lookup is None:
+            return None
+        try:
+            return lookup.result(timeout=max(deadline - time.perf_counter(), 0.0))
+        except FutureTimeoutError:
+            lookup.cancel()
+            return None
+        except Exception as e:
+            logger.warning(f"Encoding for the cache tier failed, answering by keyword: {e}")
+            return None
+    
+    def _degrade(self, user_input: str, query_embedding=None) -> Dict:
+        # Completed vector answers land in the chatbot's semantic cache, so a late call still serves later requests
+        if query_embedding is not None:
+            cached = self.chatbot.cache.lookup(query_embedding, self.chatbot._cache_tag(user_input))
+            if cached is not None:
+                return {**cached, 'tier': 'cache'}
+        return {**self.keyword_bot.chat(user_input), 'tier': 'keyword'}
+    
+    def chat_batch(self, user_inputs: List[str]) -> List[Dict]:
+        with telemetry.span('chat.budgeted', size=len(user_inputs)) as span:
+            deadline = time.perf_counter() + self.budget_ms / 1000.0
+            future = self._submit(user_inputs)
+            lookup = self._lookup_executor.submit(self.chatbot.kb.encode, user_inputs) if len(self.chatbot.cache) else None
+            reason = 'overload'
+            
+            if future is not None:
+                try:
+                    responses = future.result(timeout=max(deadline - time.perf_counter(), 0.0))
+                    reason = None
+                except FutureTimeoutError:
+                    # Drop the call if it is still queued behind another; one already running finishes into the cache
+                    future.cancel()
+                    reason = 'timeout'
+                except Exception as e:
+                    logger.warning(f"Vector retrieval failed, degrading {len(user_inputs)} queries: {e}")
+                    reason = 'error'
+            
+            if reason is not None:
+                telemetry.incr('chat_fallbacks', len(user_inputs), reason=reason)
+                query_embeddings = self._lookup_embeddings(lookup, deadline)
+                responses = [
+                    self._degrade(user_input, query_embeddings[row] if query_embeddings is not None else None)
+                    for row, user_input in enumerate(user_inputs)
+                ]
+            elif lookup is not None:
+                lookup.cancel()
+            span.set_attribute('fallback', reason or 'none')
+        
+        tiers = [response.get('tier', 'vector') for response in responses]
+        with self._lock:
+            self.tier_counts.update(tiers)
+        for tier in tiers:
+            telemetry.incr('chat_responses', tier=tier)
+        return responses
+    
+    def chat(self, user_input: str) -> Dict:
+        return self.chat_batch([user_input])[0]
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            pending = self._pending
+        return {'budget_ms': self.budget_ms, 'pending': pending, 'tiers': dict(self.tier_counts)}
+    
+    def __getattr__(self, name):
+        return getattr(self.chatbot, name)
+    
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._lookup_executor.shutdown(wait=False, cancel_futures=True)
\ No newline at end of file
@@ -0,0 +1,362 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import hashlib
+import json
+import shutil
+import sqlite3
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import logging
+
+from chunk_store import CHUNK_STORE_FILES, ChunkStore, write_chunk_store
+from facets import FACETS_FILE, FacetIndex
+from page_index import PAGES_FILE, PageIndex
+from projection import PROJECTION_FILE
+from knowledge_base import BUILD_MARKER_FILE, DEFAULT_MODEL_NAME
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Format 2 keeps texts in a compressed chunk store; format 1 bundles (records.sqlite) still load
+BUNDLE_FORMAT_VERSION = 2
+SUPPORTED_FORMAT_VERSIONS = (1, 2)
+DEFAULT_BUNDLE_DIR = os.path.join("..", "data", "kb_bundle")
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.f32"
+RECORDS_FILE = "records.sqlite"
+VECTOR_DTYPE = '<f4'
+SCRAPED_FILE = "scraped_content.json"
+
+def read_generation(directory: str) -> Optional[str]:
+    try:
+        with open(os.path.join(directory, BUILD_MARKER_FILE), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def _write_atomic(path: str, text: str):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def scraped_sha256(data_dir: str) -> Optional[str]:
+    path = os.path.join(data_dir, SCRAPED_FILE)
+    return file_sha256(path) if os.path.exists(path) else None
+
+def stale_reason(manifest: Dict, db_dir: Optional[str] = None, data_dir: Optional[str] = None) -> Optional[str]:
+    """Why the bundle no longer matches the Chroma build in db_dir or the scraped pages in data_dir (None if it does)"""
+    if db_dir is not None:
+        generation = read_generation(db_dir)
+        if generation is not None and manifest.get('source_generation') != generation:
+            return f"{db_dir} was rebuilt after the export"
+    if data_dir is not None:
+        digest = scraped_sha256(data_dir)
+        if digest is not None and manifest.get('source_data_sha256') != digest:
+            return f"{os.path.join(data_dir, SCRAPED_FILE)} changed after the export"
+    return None
+
+class ReadOnlyIndex:
+    """Stand-in for a Chroma collection over a memory-mapped, normalized vector matrix (cosine distance)"""
+    
+    def __init__(self, vectors: np.ndarray, ids: List[str], documents: List[str], metadatas: List[Dict],
+                 columns: Optional[Dict[str, np.ndarray]] = None):
+        self.vectors = vectors
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        # Per-field value arrays for where filters, so a filtered query never walks the metadata dicts
+        self._columns = dict(columns or {})
+        self._rows = None
+    
+    def count(self) -> int:
+        return len(self.ids)
+    
+    def add(self, **kwargs):
+        raise RuntimeError("ReadOnlyIndex cannot be modified; rebuild the Chroma collection and export a new bundle")
+    
+    def _column(self, field: str) -> np.ndarray:
+        if field not in self._columns:
+            self._columns[field] = np.array([metadata.get(field) for metadata in self.metadatas], dtype=object)
+        return self._columns[field]
+    
+    def _matches(self, where: Optional[Dict]) -> Optional[np.ndarray]:
+        if not where:
+            return None
+        
+        mask = np.ones(len(self.ids), dtype=bool)
+        for field, condition in where.items():
+            if field == '$and':
+                for clause in condition:
+                    mask &= self._matches(clause)
+                continue
+            value = condition.get('$eq') if isinstance(condition, dict) else condition
+            mask &= self._column(field) == value
+        return mask
+    
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[Dict] = None,
+              include: Optional[List[str]] = None, ids: Optional[List[str]] = None) -> Dict:
+        include = include or ['documents', 'metadatas', 'distances']
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.vectors.shape[1])
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        
+        # Restrictions (ids from the facet index, metadata where) pick the rows before scoring
+        candidates = None
+        if ids is not None:
+            if self._rows is None:
+                self._rows = {record_id: row for row, record_id in enumerate(self.ids)}
+            candidates = np.asarray(sorted(self._rows[record_id] for record_id in ids), dtype=np.int64)
+        mask = self._matches(where)
+        if mask is not None:
+            candidates = np.flatnonzero(mask) if candidates is None else candidates[mask[candidates]]
+        
+        if candidates is None:
+            candidates = np.arange(len(self.ids))
+            similarities = queries @ self.vectors.T
+        else:
+            similarities = queries @ self.vectors[candidates].T
+        k = min(n_results, len(candidates))
+        
+        results = {'ids': [], 'documents': [], 'metadatas': [], 'distances': [], 'embeddings': []}
+        for scores in similarities:
+            best = np.argpartition(-scores, k - 1)[:k] if k else np.empty(0, dtype=np.int64)
+            best = best[np.lexsort((best, -scores[best]))]
+            top = candidates[best]
+            
+            results['ids'].append([self.ids[i] for i in top])
+            results['documents'].append([self.documents[i] for i in top])
+            results['metadatas'].append([self.metadatas[i] for i in top])
+            results['distances'].append([float(1.0 - score) for score in scores[best]])
+            if 'embeddings' in include:
+                results['embeddings'].append(np.array(self.vectors[top]))
+        
+        return {key: value for key, value in results.items() if key == 'ids' or key in include}
+
+def current_version(bundle_root: str = DEFAULT_BUNDLE_DIR) -> Optional[str]:
+    try:
+        with open(os.path.join(bundle_root, CURRENT_FILE), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def read_manifest(bundle_dir: str) -> Dict:
+    with open(os.path.join(bundle_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _read_records(path: str) -> Tuple[List[str], List[str], List[Dict]]:
+    connection = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    try:
+        rows = connection.execute("SELECT id, document, metadata FROM records ORDER BY row").fetchall()
+    finally:
+        connection.close()
+    
+    return [row[0] for row in rows], [row[1] for row in rows], [json.loads(row[2]) for row in rows]
+
+def prune_versions(bundle_root: str, keep: int = 3):
+    current = current_version(bundle_root)
+    versions = sorted(
+        name for name in os.listdir(bundle_root)
+        if os.path.isfile(os.path.join(bundle_root, name, MANIFEST_FILE))
+    )
+    for name in versions[:-keep] if keep > 0 else versions:
+        if name != current:
+            shutil.rmtree(os.path.join(bundle_root, name), ignore_errors=True)
+
+def export_bundle(kb, bundle_root: str = DEFAULT_BUNDLE_DIR, model_name: str = DEFAULT_MODEL_NAME,
+                  keep: int = 3) -> str:
+    """Write the collection as a new bundle version and point CURRENT at it"""
+    data = kb.collection.get(include=['embeddings', 'documents', 'metadatas'])
+    vectors = np.asarray(data['embeddings'], dtype=np.float32).reshape(len(data['ids']), -1)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    
+    os.makedirs(bundle_root, exist_ok=True)
+    staging_dir = os.path.join(bundle_root, f".staging-{uuid.uuid4().hex}")
+    os.makedirs(staging_dir)
+    
+    try:
+        # Rows are contiguous little-endian float32 from offset 0, so the mapping is page-aligned
+        vectors_path = os.path.join(staging_dir, VECTORS_FILE)
+        np.ascontiguousarray(vectors, dtype=VECTOR_DTYPE).tofile(vectors_path)
+        
+        store_stats = write_chunk_store(staging_dir, data['ids'], data['documents'], data['metadatas'])
+        
+        facets_path = os.path.join(staging_dir, FACETS_FILE)
+        FacetIndex.build(data['ids'], data['metadatas']).save(facets_path)
+        
+        pages_path = os.path.join(staging_dir, PAGES_FILE)
+        PageIndex.build(data['ids'], data['metadatas'], vectors).save(pages_path)
+        
+        files = [VECTORS_FILE] + CHUNK_STORE_FILES + [FACETS_FILE, PAGES_FILE]
+        
+        # Stored vectors may be projected; queries need the same projection
+        projection = kb.get_projection()
+        if projection is not None:
+            projection.save(os.path.join(staging_dir, PROJECTION_FILE))
+            files.append(PROJECTION_FILE)
+        
+        file_info = {
+            name: {'sha256': file_sha256(os.path.join(staging_dir, name)),
+                   'bytes': os.path.getsize(os.path.join(staging_dir, name))}
+            for name in files
+        }
+        version = f"{datetime.now():%Y%m%d-%H%M%S}-{file_info[VECTORS_FILE]['sha256'][:8]}"
+        # The same vectors exported again within a second (e.g. to replace a damaged version) need a new name
+        if os.path.exists(os.path.join(bundle_root, version)):
+            version = f"{version}-{uuid.uuid4().hex[:4]}"
+        manifest = {
+            'format_version': BUNDLE_FORMAT_VERSION,
+            'version': version,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'model_name': model_name,
+            'source_generation': kb.get_generation(),
+            'source_data_sha256': scraped_sha256(kb.data_dir),
+            'count': len(data['ids']),
+            'dim': int(vectors.shape[1]) if len(vectors) else 0,
+            'dtype': VECTOR_DTYPE,
+            'chunk_store': store_stats,
+            'files': file_info
+        }
+        _write_atomic(os.path.join(staging_dir, MANIFEST_FILE), json.dumps(manifest, indent=2))
+        _write_atomic(os.path.join(staging_dir, BUILD_MARKER_FILE), version)
+        
+        os.rename(staging_dir, os.path.join(bundle_root, version))
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    
+    _write_atomic(os.path.join(bundle_root, CURRENT_FILE), version)
+    prune_versions(bundle_root, keep=keep)
+    
+    logger.info(f"Exported {manifest['count']} records to bundle {version}; texts and metadata take "
+                f"{store_stats['stored_bytes'] / 1024:.0f} KiB ({store_stats['codec']}, "
+                f"{store_stats['pages']} pages) instead of {store_stats['raw_bytes'] / 1024:.0f} KiB")
+    return version
+
+def verify_bundle(bundle_dir: str) -> List[str]:
+    """Problems found when re-hashing the bundle's files (empty when intact)"""
+    manifest = read_manifest(bundle_dir)
+    problems = []
+    for name, expected in manifest['files'].items():
+        path = os.path.join(bundle_dir, name)
+        if not os.path.exists(path):
+            problems.append(f"{name} is missing")
+        elif file_sha256(path) != expected['sha256']:
+            problems.append(f"{name} does not match its sha256")
+    return problems
+
+def load_bundle(bundle_root: str = DEFAULT_BUNDLE_DIR, version: Optional[str] = None,
+                model_name: str = DEFAULT_MODEL_NAME, verify: bool = False) -> Tuple[ReadOnlyIndex, Dict]:
+    version = version or current_version(bundle_root)
+    if version is None:
+        raise FileNotFoundError(f"No knowledge-base bundle in {bundle_root}")
+    
+    bundle_dir = os.path.join(bundle_root, version)
+    manifest = read_manifest(bundle_dir)
+    if manifest['format_version'] not in SUPPORTED_FORMAT_VERSIONS:
+        raise ValueError(f"Bundle {version} has format {manifest['format_version']}, "
+                         f"expected one of {SUPPORTED_FORMAT_VERSIONS}")
+    if manifest['model_name'] != model_name:
+        raise ValueError(f"Bundle {version} was embedded with {manifest['model_name']}, not {model_name}")
+    if verify:
+        problems = verify_bundle(bundle_dir)
+        if problems:
+            raise ValueError(f"Bundle {version} is corrupt: {'; '.join(problems)}")
+    
+    vectors_path = os.path.join(bundle_dir, VECTORS_FILE)
+    if manifest['count']:
+        vectors = np.memmap(vectors_path, dtype=manifest['dtype'], mode='r',
+                            shape=(manifest['count'], manifest['dim']))
+    else:
+        vectors = np.zeros((0, manifest['dim']), dtype=np.float32)
+    if manifest['format_version'] == 1:
+        ids, documents, metadatas = _read_records(os.path.join(bundle_dir, RECORDS_FILE))
+        columns = None
+    else:
+        store = ChunkStore(bundle_dir)
+        ids, documents, metadatas = store.ids, store.documents, store.metadatas
+        # Every image query filters on content_type
+        columns = {'content_type': store.column('content_type')}
+    
+    return ReadOnlyIndex(vectors, ids, documents, metadatas, columns), manifest
+
+def open_bundle_knowledge_base(bundle_root: str = DEFAULT_BUNDLE_DIR, model=None, verify: bool = False,
+                               db_dir: Optional[str] = None, data_dir: Optional[str] = None):
+    """Knowledge base served from the current bundle, or None if there is no usable bundle. With db_dir or
+    data_dir, a bundle exported before the last Chroma build or scrape is not used either"""
+    from knowledge_base import CUNY1969KnowledgeBase
+    
+    start = time.perf_counter()
+    try:
+        index, manifest = load_bundle(bundle_root, verify=verify)
+    except FileNotFoundError:
+        logger.info(f"No knowledge-base bundle in {bundle_root}")
+        return None
+    except (ValueError, KeyError, OSError, ImportError, sqlite3.Error) as e:
+        logger.warning(f"Ignoring knowledge-base bundle in {bundle_root}: {e}")
+        return None
+    load_ms = (time.perf_counter() - start) * 1000
+    
+    reason = stale_reason(manifest, db_dir, data_dir)
+    if reason is not None:
+        logger.warning(f"Ignoring stale knowledge-base bundle {manifest['version']}: {reason}")
+        return None
+    
+    logger.info(f"Mapped bundle {manifest['version']} ({manifest['count']} records) in {load_ms:.1f} ms")
+    return CUNY1969KnowledgeBase(
+        db_dir=os.path.join(bundle_root, manifest['version']), model=model, collection=index
+    )
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Export or check the CUNY 1969 knowledge-base bundle')
+    parser.add_argument('--data-dir', default='../data', help='Directory with scraped_content.json')
+    parser.add_argument('--db-dir', default='../data/chroma_db', help='Chroma database directory')
+    parser.add_argument('--bundle-dir', default=DEFAULT_BUNDLE_DIR, help='Where bundle versions are kept')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Rebuild the Chroma collection from the scraped data before exporting')
+    parser.add_argument('--reduce-dim', type=int, default=None,
+                        help='Store vectors projected to this many dimensions when building (use a fresh --db-dir)')
+    parser.add_argument('--keep', type=int, default=3, help='Bundle versions to keep')
+    parser.add_argument('--verify', action='store_true', help='Re-hash the current bundle and exit')
+    
+    args = parser.parse_args()
+    
+    if args.verify:
+        version = current_version(args.bundle_dir)
+        if version is None:
+            print(f"No bundle in {args.bundle_dir}")
+            sys.exit(1)
+        problems = verify_bundle(os.path.join(args.bundle_dir, version))
+        print(f"Bundle {version}: " + ('; '.join(problems) if problems else 'OK'))
+        sys.exit(1 if problems else 0)
+    
+    from knowledge_base import CUNY1969KnowledgeBase
+    
+    kb = CUNY1969KnowledgeBase(data_dir=args.data_dir, db_dir=args.db_dir, reduce_dim=args.reduce_dim)
+    if args.rebuild or kb.collection.count() == 0:
+        kb.reset_collection()
+        kb.build_knowledge_base()
+    
+    version = export_bundle(kb, args.bundle_dir, keep=args.keep)
+    
+    start = time.perf_counter()
+    load_bundle(args.bundle_dir, version)
+    print(f"Bundle {version} written to {args.bundle_dir} "
+          f"(loads in {(time.perf_counter() - start) * 1000:.1f} ms)")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
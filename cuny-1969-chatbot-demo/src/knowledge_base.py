@@ -1,41 +1,204 @@
 import json
 import os
-from typing import List, Dict, Optional
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
+from itertools import islice
+from typing import TYPE_CHECKING, Iterable, List, Dict, Optional, Tuple
+import numpy as np
 import re
+import time
+import uuid
 import logging
 
+from chroma_server import CHROMA_URL_ENV, COLLECTION_NAME, open_client
+from encoders import DEFAULT_MODEL_NAME, load_encoder
+from dedupe import MinHashDeduplicator, StreamingDeduplicator
+from facets import FACETS_FILE, FacetIndex
+from metrics import telemetry
+from page_index import PAGES_FILE, PageIndex
+from projection import PROJECTION_FILE, Projection
+
+if TYPE_CHECKING:
+    # Only the torch backends need sentence-transformers; encoders.load_encoder imports it when they are used
+    from sentence_transformers import SentenceTransformer
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+BUILD_MARKER_FILE = "build_id"
+# Stays under Chroma's maximum batch size for a single add()
+ADD_BATCH_SIZE = 4096
+_NOT_LOADED = object()
+
 class CUNY1969KnowledgeBase:
-    def __init__(self, data_dir: str = "../data", db_dir: str = "../data/chroma_db"):
+    def __init__(self, data_dir: str = "../data", db_dir: str = "../data/chroma_db",
+                 model: Optional['SentenceTransformer'] = None, chunk_size: int = 300,
+                 chunk_overlap: int = 0, hnsw_config: Optional[Dict] = None, collection=None,
+                 dedupe: bool = True, dedupe_threshold: float = 0.8, search_pages: int = 0,
+                 reduce_dim: Optional[int] = None, reduction: str = 'pca', chroma_url: Optional[str] = None,
+                 encode_batch_size: int = 32):
         self.data_dir = data_dir
         self.db_dir = db_dir
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        # The encoder backend comes from CUNY1969_ENCODER (default: the PyTorch SentenceTransformer)
+        self.model = model or load_encoder()
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        # SentenceTransformer's default; encoder_tuning.configure_encoder sets the best one for the host
+        self.encode_batch_size = encode_batch_size
+        self._facets = None
+        self._facets_generation = None
+        self._pages = None
+        self._pages_generation = None
+        # With search_pages > 0 a query is scored only against the chunks of its best-matching pages
+        self.search_pages = search_pages
+        # With reduce_dim set, builds store vectors projected to that many dimensions (see projection.py)
+        self.reduce_dim = reduce_dim
+        self.reduction = reduction
+        self._projection = None
+        self._projection_generation = _NOT_LOADED
+        self.deduplicator = MinHashDeduplicator(threshold=dedupe_threshold) if dedupe else None
+        self.last_dedupe_report = None
+        
+        # A ready-made collection (e.g. prefork.ReadOnlyIndex) skips opening Chroma
+        if collection is not None:
+            self.client = None
+            self.collection = collection
+            return
         
+        # Derived files (facets, pages, projection, build marker) stay in db_dir even when a server holds the vectors
         os.makedirs(self.db_dir, exist_ok=True)
         
-        self.client = chromadb.PersistentClient(
-            path=self.db_dir,
-            settings=Settings(anonymized_telemetry=False)
-        )
+        # With a Chroma server URL (argument or CUNY1969_CHROMA_URL) the index is shared over pooled HTTP connections;
+        # chroma_url='' opens db_dir directly regardless, for indexes of their own (generations, sweeps)
+        self.chroma_url = os.environ.get(CHROMA_URL_ENV) if chroma_url is None else chroma_url
+        self.client = open_client(self.db_dir, self.chroma_url)
         
+        # hnsw_config takes Chroma's keys, e.g. {"hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 50}
+        self._collection_metadata = {"hnsw:space": "cosine", **(hnsw_config or {})}
         self.collection = self.client.get_or_create_collection(
-            name="cuny_1969_knowledge",
-            metadata={"hnsw:space": "cosine"}
+            name=COLLECTION_NAME,
+            metadata=self._collection_metadata
+        )
+    
+    def close(self):
+        """Release the embedded Chroma client, so its directory can be removed (a no-op for bundles)"""
+        if self.client is not None and hasattr(self.client, 'close'):
+            self.client.close()
+        self.client = None
+    
+    def reset_collection(self):
+        """Drop every stored chunk, so the next build replaces the index instead of adding to it
+        (Chroma keeps the existing record for an id that is added again)"""
+        if self.client is None:
+            raise RuntimeError("This knowledge base is read-only; rebuild it from its Chroma directory")
+        
+        self.client.delete_collection(COLLECTION_NAME)
+        self.collection = self.client.create_collection(
+            name=COLLECTION_NAME,
+            metadata=self._collection_metadata
         )
     
-    def chunk_text(self, text: str, chunk_size: int = 300) -> List[str]:
+    def get_generation(self) -> Optional[str]:
+        marker_path = os.path.join(self.db_dir, BUILD_MARKER_FILE)
+        try:
+            with open(marker_path, 'r', encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+    
+    def _mark_rebuilt(self):
+        marker_path = os.path.join(self.db_dir, BUILD_MARKER_FILE)
+        tmp_path = f"{marker_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(uuid.uuid4().hex)
+        os.replace(tmp_path, marker_path)
+    
+    def get_facet_index(self) -> Optional[FacetIndex]:
+        generation = self.get_generation()
+        if self._facets is None or generation != self._facets_generation:
+            facets_path = os.path.join(self.db_dir, FACETS_FILE)
+            if not os.path.exists(facets_path):
+                return None
+            self._facets = FacetIndex.load(facets_path)
+            self._facets_generation = generation
+        return self._facets
+    
+    def _save_facets(self, ids: List[str], metadatas: List[Dict]):
+        FacetIndex.build(ids, metadatas).save(os.path.join(self.db_dir, FACETS_FILE))
+    
+    def get_page_index(self) -> Optional[PageIndex]:
+        generation = self.get_generation()
+        if self._pages is None or generation != self._pages_generation:
+            pages_path = os.path.join(self.db_dir, PAGES_FILE)
+            if not os.path.exists(pages_path):
+                return None
+            self._pages = PageIndex.load(pages_path)
+            self._pages_generation = generation
+        return self._pages
+    
+    def _save_pages(self, ids: List[str], metadatas: List[Dict], embeddings):
+        PageIndex.build(ids, metadatas, embeddings).save(os.path.join(self.db_dir, PAGES_FILE))
+    
+    def get_projection(self) -> Optional[Projection]:
+        generation = self.get_generation()
+        if generation != self._projection_generation:
+            projection_path = os.path.join(self.db_dir, PROJECTION_FILE)
+            self._projection = Projection.load(projection_path) if os.path.exists(projection_path) else None
+            self._projection_generation = generation
+        return self._projection
+    
+    def project(self, embeddings: np.ndarray) -> np.ndarray:
+        """Encoder vectors in the space the index is stored in"""
+        embeddings = np.asarray(embeddings)
+        projection = self.get_projection()
+        if projection is None or embeddings.shape[-1] == projection.dim:
+            return embeddings
+        return projection.transform(embeddings)
+    
+    def _fit_projection(self, embeddings: np.ndarray) -> np.ndarray:
+        projection_path = os.path.join(self.db_dir, PROJECTION_FILE)
+        if not self.reduce_dim:
+            if os.path.exists(projection_path):
+                os.remove(projection_path)
+            return embeddings
+        
+        with telemetry.span('kb.fit_projection', dim=self.reduce_dim):
+            projection = Projection.fit(embeddings, self.reduce_dim, method=self.reduction)
+        projection.save(projection_path)
+        logger.info(f"Projected {embeddings.shape[1]}-dimensional vectors to {projection.dim} ({projection.method})")
+        return projection.transform(embeddings)
+    
+    def _filter_ids(self, filters: Dict) -> List[str]:
+        facets = self.get_facet_index()
+        if facets is None:
+            raise ValueError(f"No facet index in {self.db_dir}; rebuild the knowledge base to filter by facet")
+        
+        with telemetry.span('kb.facet_filter', facets=len(filters)):
+            return facets.ids_for(filters)
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        with telemetry.span('kb.encode', texts=len(texts)):
+            return self.model.encode(
+                texts,
+                batch_size=self.encode_batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
+    
+    def chunk_text(self, text: str, chunk_size: Optional[int] = None,
+                   overlap: Optional[int] = None) -> List[str]:
+        chunk_size = chunk_size or self.chunk_size
+        overlap = self.chunk_overlap if overlap is None else overlap
+        step = max(chunk_size - overlap, 1)
+        
         words = text.split()
         chunks = []
         
-        for i in range(0, len(words), chunk_size):
+        for i in range(0, len(words), step):
             chunk = ' '.join(words[i:i + chunk_size])
             if chunk:
                 chunks.append(chunk)
+            if i + chunk_size >= len(words):
+                break
         
         return chunks
     
@@ -77,18 +240,12 @@ class CUNY1969KnowledgeBase:
         with open(scraped_file, 'r', encoding='utf-8') as f:
             return json.load(f)
     
-    def build_knowledge_base(self):
-        scraped_data = self.load_scraped_data()
-        
-        if not scraped_data:
-            logger.warning("No scraped data found")
-            return
-        
+    def prepare_records(self, scraped_data: List[Dict], start: int = 0) -> Tuple[List[str], List[Dict], List[str]]:
         all_chunks = []
         all_metadatas = []
         all_ids = []
         
-        for idx, page_data in enumerate(scraped_data):
+        for idx, page_data in enumerate(scraped_data, start):
             full_text = '\n'.join([item['text'] for item in page_data.get('content', [])])
             
             chunks = self.chunk_text(full_text)
@@ -117,56 +274,309 @@ class CUNY1969KnowledgeBase:
                 all_metadatas.append(img_metadata)
                 all_ids.append(f"page_{idx}_img_{img_idx}")
         
-        if all_chunks:
-            self.collection.add(
-                documents=all_chunks,
-                metadatas=all_metadatas,
-                ids=all_ids
-            )
-            
-            logger.info(f"Added {len(all_chunks)} chunks to knowledge base")
+        return all_chunks, all_metadatas, all_ids
     
-    def search(self, query: str, n_results: int = 5) -> Dict:
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=n_results
-        )
+    def deduplicate_records(self, chunks: List[str], metadatas: List[Dict],
+                            ids: List[str]) -> Tuple[List[str], List[Dict], List[str], Dict]:
+        """Collapse near-duplicate text chunks into the first copy, which keeps every source URL"""
+        start = time.perf_counter()
+        text_rows = [i for i, metadata in enumerate(metadatas) if metadata.get('content_type') == 'text']
+        groups = self.deduplicator.clusters([chunks[i] for i in text_rows])
+        removed = self._collapse_duplicates(metadatas, [[text_rows[i] for i in group] for group in groups])
         
-        formatted_results = []
-        for i in range(len(results['documents'][0])):
-            formatted_results.append({
-                'content': results['documents'][0][i],
-                'metadata': results['metadatas'][0][i],
-                'distance': results['distances'][0][i] if 'distances' in results else None
-            })
-        
-        return {
-            'query': query,
-            'results': formatted_results
+        kept = [i for i in range(len(chunks)) if i not in removed]
+        report = {
+            'chunks': len(chunks),
+            'removed': len(removed),
+            'groups': len(groups),
+            'dedupe_ms': (time.perf_counter() - start) * 1000
         }
+        return [chunks[i] for i in kept], [metadatas[i] for i in kept], [ids[i] for i in kept], report
     
-    def get_images_by_query(self, query: str, n_results: int = 3) -> List[Dict]:
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=n_results * 3,
-            where={"content_type": "image"}
-        )
+    def _collapse_duplicates(self, metadatas: List[Dict], groups: List[List[int]]) -> set:
+        """Fold each group of rows into its first row's metadata; returns the rows to drop"""
+        removed = set()
+        for rows in groups:
+            canonical = dict(metadatas[rows[0]])
+            source_urls = [metadatas[row].get('source_url') for row in rows if metadatas[row].get('source_url')]
+            canonical['source_urls'] = list(dict.fromkeys(source_urls)) or ['']
+            canonical['duplicate_count'] = len(rows) - 1
+            metadatas[rows[0]] = canonical
+            removed.update(rows[1:])
+        return removed
+    
+    def _report_dedupe(self, report: Dict, index_ms: float, indexed: int):
+        # Removed chunks would have cost about as much to embed and index as the ones that were kept
+        report['saved_ms'] = index_ms / indexed * report['removed'] if indexed else 0.0
+        self.last_dedupe_report = report
+        telemetry.incr('kb_chunks_deduplicated', report['removed'])
+        
+        logger.info(f"Dedupe removed {report['removed']} of {report['chunks']} chunks "
+                    f"({report['groups']} groups) in {report['dedupe_ms']:.0f} ms, "
+                    f"saving about {report['saved_ms']:.0f} ms of embedding and indexing")
+    
+    def build_knowledge_base(self):
+        with telemetry.span('kb.build') as span:
+            scraped_data = self.load_scraped_data()
+            
+            if not scraped_data:
+                logger.warning("No scraped data found")
+                return
+            
+            all_chunks, all_metadatas, all_ids = self.prepare_records(scraped_data)
+            dedupe_report = None
+            if self.deduplicator is not None:
+                all_chunks, all_metadatas, all_ids, dedupe_report = self.deduplicate_records(
+                    all_chunks, all_metadatas, all_ids
+                )
+            span.set_attribute('pages', len(scraped_data))
+            span.set_attribute('chunks', len(all_chunks))
+            
+            if all_chunks:
+                start = time.perf_counter()
+                embeddings = self._fit_projection(self.encode(all_chunks))
+                self.collection.add(
+                    documents=all_chunks,
+                    embeddings=embeddings.tolist(),
+                    metadatas=all_metadatas,
+                    ids=all_ids
+                )
+                index_ms = (time.perf_counter() - start) * 1000
+                self._save_facets(all_ids, all_metadatas)
+                self._save_pages(all_ids, all_metadatas, embeddings)
+                self._mark_rebuilt()
+                telemetry.incr('kb_chunks_indexed', len(all_chunks))
+                
+                logger.info(f"Added {len(all_chunks)} chunks to knowledge base")
+                if dedupe_report is not None:
+                    self._report_dedupe(dedupe_report, index_ms, len(all_chunks))
+    
+    def ingest(self, pages: Iterable[Dict], batch_pages: int = 64) -> int:
+        """Index pages as they arrive (e.g. from loaders.iter_archive); each batch is chunked, checked for
+        near-duplicates of everything before it and encoded while later pages are still being extracted"""
+        with telemetry.span('kb.ingest') as span:
+            stream = StreamingDeduplicator(self.deduplicator) if self.deduplicator is not None else None
+            all_chunks, all_metadatas, all_ids = [], [], []
+            text_rows, vectors = [], []
+            page_count, dedupe_s, encode_s = 0, 0.0, 0.0
+            
+            iterator = iter(pages)
+            while True:
+                batch = list(islice(iterator, batch_pages))
+                if not batch:
+                    break
+                chunks, metadatas, ids = self.prepare_records(batch, start=page_count)
+                page_count += len(batch)
+                
+                # A chunk that already duplicates an earlier one is dropped at the end, so it is never encoded
+                start = time.perf_counter()
+                encode_rows = []
+                for chunk, metadata in zip(chunks, metadatas):
+                    row = len(vectors)
+                    vectors.append(None)
+                    if stream is not None and metadata.get('content_type') == 'text':
+                        text_rows.append(row)
+                        if stream.add(chunk) != len(stream) - 1:
+                            continue
+                    encode_rows.append(row)
+                all_chunks.extend(chunks)
+                all_metadatas.extend(metadatas)
+                all_ids.extend(ids)
+                dedupe_s += time.perf_counter() - start
+                
+                if encode_rows:
+                    start = time.perf_counter()
+                    for row, vector in zip(encode_rows, self.encode([all_chunks[row] for row in encode_rows])):
+                        vectors[row] = vector
+                    encode_s += time.perf_counter() - start
+            
+            span.set_attribute('pages', page_count)
+            if not all_chunks:
+                logger.warning("No pages to ingest")
+                return 0
+            
+            removed, groups = set(), []
+            if stream is not None:
+                start = time.perf_counter()
+                groups = [[text_rows[i] for i in group] for group in stream.clusters()]
+                removed = self._collapse_duplicates(all_metadatas, groups)
+                dedupe_s += time.perf_counter() - start
+            kept = [row for row in range(len(all_chunks)) if row not in removed]
+            seen = len(all_chunks)
+            all_chunks = [all_chunks[row] for row in kept]
+            all_metadatas = [all_metadatas[row] for row in kept]
+            all_ids = [all_ids[row] for row in kept]
+            span.set_attribute('chunks', len(all_chunks))
+            
+            start = time.perf_counter()
+            embeddings = self._fit_projection(np.vstack([vectors[row] for row in kept]))
+            for i in range(0, len(all_chunks), ADD_BATCH_SIZE):
+                self.collection.add(
+                    documents=all_chunks[i:i + ADD_BATCH_SIZE],
+                    embeddings=embeddings[i:i + ADD_BATCH_SIZE].tolist(),
+                    metadatas=all_metadatas[i:i + ADD_BATCH_SIZE],
+                    ids=all_ids[i:i + ADD_BATCH_SIZE]
+                )
+            index_ms = (encode_s + time.perf_counter() - start) * 1000
+            self._save_facets(all_ids, all_metadatas)
+            self._save_pages(all_ids, all_metadatas, embeddings)
+            self._mark_rebuilt()
+            telemetry.incr('kb_chunks_indexed', len(all_chunks))
+            
+            logger.info(f"Ingested {len(all_chunks)} chunks from {page_count} pages")
+            if stream is not None:
+                report = {'chunks': seen, 'removed': len(removed), 'groups': len(groups), 'dedupe_ms': dedupe_s * 1000}
+                self._report_dedupe(report, index_ms, len(all_chunks))
+            return len(all_chunks)
+    
+    def _format_results(self, results: Dict, row: int) -> List[Dict]:
+        formatted_results = []
+        for i in range(len(results['documents'][row])):
+            formatted_result = {
+                'id': results['ids'][row][i],
+                'content': results['documents'][row][i],
+                'metadata': results['metadatas'][row][i],
+                'distance': results['distances'][row][i] if 'distances' in results else None
+            }
+            if results.get('embeddings') is not None:
+                formatted_result['embedding'] = np.asarray(results['embeddings'][row][i], dtype=np.float32)
+            formatted_results.append(formatted_result)
         
+        return formatted_results
+    
+    def _format_images(self, results: Dict, row: int, n_results: int) -> List[Dict]:
         images = []
-        for i in range(len(results['documents'][0])):
+        for i in range(len(results['documents'][row])):
             if len(images) >= n_results:
                 break
             
-            metadata = results['metadatas'][0][i]
+            metadata = results['metadatas'][row][i]
             if metadata.get('content_type') == 'image':
                 images.append({
-                    'alt_text': results['documents'][0][i],
+                    'alt_text': results['documents'][row][i],
                     'local_path': metadata.get('image_local_path', ''),
                     'source_url': metadata.get('source_url', ''),
                     'image_url': metadata.get('image_url', '')
                 })
         
         return images
+    
+    def search(self, query: str, n_results: int = 5, include_embeddings: bool = False,
+               filters: Optional[Dict] = None, n_pages: Optional[int] = None) -> Dict:
+        return self.search_batch(
+            [query], n_results=n_results, include_embeddings=include_embeddings, filters=filters,
+            n_pages=n_pages
+        )[0]
+    
+    def _select_pages(self, query_embeddings: np.ndarray, n_pages: int, filter_ids: Optional[List[str]] = None):
+        pages = self.get_page_index()
+        if pages is None:
+            logger.warning(f"No page index in {self.db_dir}; rebuild the knowledge base for page-first search")
+            return None, None
+        
+        # With filters, only pages holding a matching chunk are worth picking
+        allowed = pages.pages_with(filter_ids) if filter_ids is not None else None
+        with telemetry.span('kb.page_select', queries=len(query_embeddings), pages=len(pages)):
+            return pages, pages.top_pages(query_embeddings, n_pages, allowed=allowed)
+    
+    def search_batch(self, queries: List[str], n_results: int = 5,
+                     query_embeddings: Optional[np.ndarray] = None,
+                     include_embeddings: bool = False, filters: Optional[Dict] = None,
+                     n_pages: Optional[int] = None) -> List[Dict]:
+        """filters (e.g. {'year': 1969, 'person': 'Gallagher'}) narrow the candidates via the facet index before scoring;
+        n_pages (default self.search_pages) first picks that many pages by centroid and searches only their chunks"""
+        if not queries:
+            return []
+        
+        if query_embeddings is None:
+            query_embeddings = self.encode(queries)
+        query_embeddings = self.project(query_embeddings)
+        
+        include = ['documents', 'metadatas', 'distances']
+        if include_embeddings:
+            include.append('embeddings')
+        
+        filter_ids = self._filter_ids(filters) if filters else None
+        
+        pages, page_hits = None, None
+        n_pages = self.search_pages if n_pages is None else n_pages
+        if n_pages > 0:
+            pages, page_hits = self._select_pages(query_embeddings, n_pages, filter_ids)
+        
+        # Queries that picked the same pages share one restricted query
+        batches: Dict[Optional[Tuple[int, ...]], List[int]] = {}
+        for row in range(len(queries)):
+            key = tuple(sorted(page for page, _ in page_hits[row])) if page_hits is not None else None
+            batches.setdefault(key, []).append(row)
+        
+        formatted = [[] for _ in queries]
+        for selected, rows in batches.items():
+            ids = filter_ids
+            if selected is not None:
+                ids = pages.ids_for(selected)
+                if filter_ids is not None:
+                    allowed = set(filter_ids)
+                    ids = [record_id for record_id in ids if record_id in allowed]
+                    # Too few matches on the chosen pages: the filter alone is narrow enough to score flat
+                    if len(ids) < n_results:
+                        ids = filter_ids
+                telemetry.incr('kb_page_candidates', len(ids) * len(rows))
+            
+            limit = n_results if ids is None else min(n_results, len(ids))
+            if limit <= 0:
+                continue
+            
+            with telemetry.span('kb.search', queries=len(rows)):
+                results = self.collection.query(
+                    query_embeddings=query_embeddings[rows].tolist(),
+                    n_results=limit,
+                    include=include,
+                    **({'ids': ids} if ids is not None else {})
+                )
+            for i, row in enumerate(rows):
+                formatted[row] = self._format_results(results, i)
+        
+        search_results = []
+        for row, query in enumerate(queries):
+            search_result = {'query': query, 'results': formatted[row]}
+            if page_hits is not None:
+                search_result['pages'] = pages.group(formatted[row], page_hits[row])
+            if include_embeddings:
+                search_result['query_embedding'] = query_embeddings[row]
+            search_results.append(search_result)
+            telemetry.incr('kb_results_returned', len(search_result['results']))
+        
+        return search_results
+    
+    def get_images_by_query(self, query: str, n_results: int = 3, filters: Optional[Dict] = None) -> List[Dict]:
+        return self.get_images_by_query_batch([query], n_results=n_results, filters=filters)[0]
+    
+    def get_images_by_query_batch(self, queries: List[str], n_results: int = 3,
+                                  query_embeddings: Optional[np.ndarray] = None,
+                                  filters: Optional[Dict] = None) -> List[List[Dict]]:
+        if not queries:
+            return []
+        
+        # Chroma's where clause already narrows to images cheaply; listing every image id only pays off with filters
+        if filters:
+            ids = self._filter_ids({**filters, 'content_type': 'image'})
+            if not ids:
+                return [[] for _ in queries]
+            query_kwargs = {'ids': ids, 'n_results': min(n_results, len(ids))}
+        else:
+            query_kwargs = {'where': {"content_type": "image"}, 'n_results': n_results * 3}
+        
+        if query_embeddings is None:
+            query_embeddings = self.encode(queries)
+        query_embeddings = self.project(query_embeddings)
+        
+        with telemetry.span('kb.get_images_by_query', queries=len(queries)):
+            results = self.collection.query(query_embeddings=query_embeddings.tolist(), **query_kwargs)
+        
+        images = [self._format_images(results, row, n_results) for row in range(len(queries))]
+        telemetry.incr('kb_images_returned', sum(len(row) for row in images))
+        
+        return images
 
 if __name__ == "__main__":
     kb = CUNY1969KnowledgeBase()
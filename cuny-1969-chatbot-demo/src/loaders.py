@@ -0,0 +1,241 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import multiprocessing
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+import logging
+
+from encoder_tuning import add_tuning_arguments, configure_encoder
+from metrics import telemetry
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TEXT_TAGS = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li']
+
+def parse_html(markup) -> Tuple[str, List[Dict], List[Dict]]:
+    """Title, text blocks and image tags (src, alt) of the page's main content; shared with the scraper"""
+    if BeautifulSoup is None:
+        raise ImportError("pip install beautifulsoup4 to parse HTML")
+    soup = BeautifulSoup(markup, 'html.parser')
+    title = soup.find('title').text.strip() if soup.find('title') else ''
+    
+    main_content = soup.find('div', {'class': 'entry-content'}) or soup.find('main') or soup.find('article')
+    if not main_content:
+        main_content = soup.find('body') or soup
+    
+    text_content = []
+    for element in main_content.find_all(TEXT_TAGS):
+        text = element.get_text(strip=True)
+        if text:
+            text_content.append({
+                'type': element.name,
+                'text': text
+            })
+    
+    images = [{'src': img.get('src', ''), 'alt': img.get('alt', '')} for img in main_content.find_all('img')]
+    return title, text_content, images
+
+def paragraphs(text: str) -> List[Dict]:
+    blocks = (' '.join(block.split()) for block in re.split(r'\n\s*\n', text))
+    return [{'type': 'p', 'text': block} for block in blocks if block]
+
+class Loader:
+    """Turns one local file into a page record shaped like the scraper's (url, title, content, images)"""
+    
+    extensions: Tuple[str, ...] = ()
+    
+    def available(self) -> bool:
+        return True
+    
+    def load(self, path: str) -> Dict:
+        raise NotImplementedError
+    
+    def record(self, path: str, title: str, content: List[Dict], images: Optional[List[Dict]] = None) -> Dict:
+        return {
+            'url': Path(path).resolve().as_uri(),
+            'title': title or Path(path).stem,
+            'content': content,
+            'images': images or [],
+            'scraped_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(os.path.getmtime(path)))
+        }
+
+class HtmlLoader(Loader):
+    """Saved web pages; images are kept when the file they point to was saved alongside the page"""
+    
+    extensions = ('.html', '.htm')
+    
+    def available(self) -> bool:
+        return BeautifulSoup is not None
+    
+    def load(self, path: str) -> Dict:
+        with open(path, 'rb') as f:
+            title, content, image_tags = parse_html(f.read())
+        
+        images = []
+        for tag in image_tags:
+            src = urlparse(tag['src'])
+            if not src.path or src.scheme not in ('', 'file'):
+                continue
+            local_path = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(path)), unquote(src.path)))
+            if os.path.isfile(local_path):
+                images.append({
+                    'url': Path(local_path).as_uri(),
+                    'alt_text': tag['alt'],
+                    'local_path': local_path
+                })
+        return self.record(path, title, content, images)
+
+class TextLoader(Loader):
+    """Plain-text transcriptions; a short first line is taken as the title"""
+    
+    extensions = ('.txt',)
+    
+    def load(self, path: str) -> Dict:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+        
+        first_line = text.strip().split('\n', 1)[0].strip()
+        title = first_line if 0 < len(first_line) <= 120 else ''
+        return self.record(path, title, paragraphs(text))
+
+class PdfLoader(Loader):
+    """PDF finding aids, one text block per paragraph of each page (needs pypdf)"""
+    
+    extensions = ('.pdf',)
+    
+    def available(self) -> bool:
+        return PdfReader is not None
+    
+    def load(self, path: str) -> Dict:
+        if PdfReader is None:
+            raise ImportError("pip install pypdf to load PDF files")
+        
+        reader = PdfReader(path)
+        content = []
+        for page in reader.pages:
+            content.extend(paragraphs(page.extract_text() or ''))
+        title = (reader.metadata.title if reader.metadata else None) or ''
+        return self.record(path, title.strip(), content)
+
+LOADERS: Dict[str, Loader] = {}
+
+def register_loader(loader: Loader):
+    """Make loader handle its extensions; a later registration for an extension replaces the earlier one"""
+    for extension in loader.extensions:
+        LOADERS[extension.lower()] = loader
+
+for _loader in (HtmlLoader(), TextLoader(), PdfLoader()):
+    register_loader(_loader)
+
+def discover(root: str) -> List[str]:
+    """Files under root that an available loader handles, in a stable order"""
+    paths, skipped = [], {}
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            extension = os.path.splitext(filename)[1].lower()
+            loader = LOADERS.get(extension)
+            if loader is None:
+                continue
+            if not loader.available():
+                skipped[extension] = skipped.get(extension, 0) + 1
+                continue
+            paths.append(os.path.join(directory, filename))
+    
+    for extension, count in skipped.items():
+        logger.warning(f"Skipping {count} {extension} file(s): the {type(LOADERS[extension]).__name__} "
+                       f"dependency is not installed")
+    return paths
+
+def load_file(path: str) -> Optional[Dict]:
+    """Page record for one file, or None if it fails to load or holds no text or images"""
+    try:
+        page = LOADERS[os.path.splitext(path)[1].lower()].load(path)
+    except Exception as e:
+        logger.error(f"Error loading {path}: {e}")
+        return None
+    return page if page['content'] or page['images'] else None
+
+def _install_loaders(loaders: Dict[str, Loader]):
+    # Spawned workers import this module afresh, so loaders registered elsewhere are passed in
+    LOADERS.update(loaders)
+
+def iter_archive(root: str, workers: Optional[int] = None, chunksize: int = 8) -> Iterator[Dict]:
+    """Page records for every loadable file under root, extracted on a process pool and yielded in order"""
+    paths = discover(root)
+    workers = min(workers or os.cpu_count() or 1, max(len(paths), 1))
+    logger.info(f"Loading {len(paths)} files from {root} with {workers} worker process(es)")
+    
+    if workers == 1:
+        pages = map(load_file, paths)
+        executor = None
+    else:
+        # spawn rather than fork: the parent may already run encoder threads
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=_install_loaders, initargs=(dict(LOADERS),))
+        pages = executor.map(load_file, paths, chunksize=chunksize)
+    
+    try:
+        for path, page in zip(paths, pages):
+            extension = os.path.splitext(path)[1].lower()
+            if page is None:
+                telemetry.incr('loader_files_skipped', kind=extension)
+                continue
+            telemetry.incr('loader_files_loaded', kind=extension)
+            yield page
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Index a local CUNY 1969 archive of HTML, text and PDF files')
+    parser.add_argument('archive', help='Directory to load files from (searched recursively)')
+    parser.add_argument('--data-dir', default='../data', help='Data directory')
+    parser.add_argument('--db-dir', default='../data/chroma_db', help='Chroma database directory (use a fresh one)')
+    parser.add_argument('--workers', type=int, default=None, help='Extraction processes (default: one per core)')
+    parser.add_argument('--batch-pages', type=int, default=64, help='Pages chunked and encoded together')
+    parser.add_argument('--output', default=None,
+                        help='Write the page records to this JSON file (scraped_content.json format) instead of indexing')
+    add_tuning_arguments(parser)
+    
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    if args.output:
+        pages = list(iter_archive(args.archive, workers=args.workers))
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(pages, f, indent=2, ensure_ascii=False)
+        print(f"Wrote {len(pages)} pages to {args.output} in {time.perf_counter() - start:.1f} s")
+        return
+    
+    from knowledge_base import CUNY1969KnowledgeBase
+    
+    kb = CUNY1969KnowledgeBase(data_dir=args.data_dir, db_dir=args.db_dir)
+    configure_encoder(args, kb)
+    if kb.collection.count():
+        logger.warning(f"{args.db_dir} already holds {kb.collection.count()} records; ids from this archive may collide")
+    indexed = kb.ingest(iter_archive(args.archive, workers=args.workers), batch_pages=args.batch_pages)
+    print(f"Indexed {indexed} chunks from {args.archive} in {time.perf_counter() - start:.1f} s")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,313 @@
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS_MS = [0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Linearly interpolated percentile, q in [0, 100]"""
+    if not values:
+        return None
+    
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def summarize(values: List[float]) -> Dict:
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values) if values else None,
+        'min': min(values) if values else None,
+        'max': max(values) if values else None,
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99)
+    }
+
+class Histogram:
+    """Fixed-bucket histogram, safe to observe from several threads"""
+    
+    def __init__(self, name: str, buckets: List[float], help_text: str = ""):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation"""
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+            largest = self.max
+        
+        if total == 0:
+            return None
+        
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.buckets[index], largest) if index < len(self.buckets) else largest
+        
+        return largest
+    
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+            total_sum = self.sum
+            largest = self.max
+        
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(self.buckets + [float('inf')], counts):
+            cumulative += count
+            buckets['+Inf' if bound == float('inf') else str(bound)] = cumulative
+        
+        return {
+            'count': total,
+            'sum': total_sum,
+            'mean': total_sum / total if total else None,
+            'max': largest,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': buckets
+        }
+    
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.sum = 0.0
+            self.max = 0.0
+    
+    def render_prometheus(self, labels: str = "") -> List[str]:
+        snapshot = self.snapshot()
+        label_prefix = f"{labels}," if labels else ""
+        lines = []
+        for bound, cumulative in snapshot['buckets'].items():
+            lines.append(f'{self.name}_bucket{{{label_prefix}le="{bound}"}} {cumulative}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{self.name}_sum{suffix} {snapshot['sum']}")
+        lines.append(f"{self.name}_count{suffix} {snapshot['count']}")
+        return lines
+
+def _format_labels(attributes: Dict) -> str:
+    return ','.join(f'{key}="{value}"' for key, value in sorted(attributes.items()))
+
+class MetricsSink:
+    """Receives finished spans and counter increments from Telemetry"""
+    
+    def record_span(self, name: str, duration_ms: float, attributes: Dict):
+        pass
+    
+    def increment(self, name: str, value: float, attributes: Dict):
+        pass
+
+class InMemorySink(MetricsSink):
+    """Aggregates span durations into histograms and sums counters"""
+    
+    def __init__(self):
+        self._spans: Dict[str, Histogram] = {}
+        self._counters: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+    
+    def record_span(self, name: str, duration_ms: float, attributes: Dict):
+        histogram = self._spans.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._spans.setdefault(
+                    name, Histogram('cuny1969_span_duration_ms', LATENCY_BUCKETS_MS)
+                )
+        histogram.observe(duration_ms)
+    
+    def increment(self, name: str, value: float, attributes: Dict):
+        key = (name, _format_labels(attributes))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def snapshot(self) -> Dict:
+        with self._lock:
+            spans = dict(self._spans)
+            counters = dict(self._counters)
+        
+        return {
+            'spans': {name: histogram.snapshot() for name, histogram in spans.items()},
+            'counters': {
+                f"{name}{{{labels}}}" if labels else name: value
+                for (name, labels), value in counters.items()
+            }
+        }
+    
+    def render_prometheus(self) -> str:
+        with self._lock:
+            spans = dict(self._spans)
+            counters = dict(self._counters)
+        
+        lines = [
+            '# HELP cuny1969_span_duration_ms Duration of instrumented pipeline stages',
+            '# TYPE cuny1969_span_duration_ms histogram'
+        ]
+        for name, histogram in sorted(spans.items()):
+            lines.extend(histogram.render_prometheus(f'span="{name}"'))
+        
+        for counter_name in sorted({name for name, _ in counters}):
+            metric = f"cuny1969_{counter_name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (name, labels), value in sorted(counters.items()):
+                if name == counter_name:
+                    lines.append(f"{metric}{{{labels}}} {value}" if labels else f"{metric} {value}")
+        
+        return '\n'.join(lines) + '\n'
+
+class PrometheusSink(InMemorySink):
+    """In-memory aggregator that can also serve the Prometheus text format on its own port"""
+    
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        sink = self
+        
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = sink.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='prometheus-metrics', daemon=True).start()
+        logger.info(f"Prometheus metrics on http://{host}:{port}/metrics")
+        return server
+
+class JsonLogSink(MetricsSink):
+    """Writes one JSON log line per span and counter increment"""
+    
+    def __init__(self, logger_name: str = "cuny1969.telemetry"):
+        self.logger = logging.getLogger(logger_name)
+    
+    def record_span(self, name: str, duration_ms: float, attributes: Dict):
+        self.logger.info(json.dumps({
+            'type': 'span', 'name': name, 'duration_ms': round(duration_ms, 3), 'ts': time.time(), **attributes
+        }, default=str))
+    
+    def increment(self, name: str, value: float, attributes: Dict):
+        self.logger.info(json.dumps({
+            'type': 'counter', 'name': name, 'value': value, 'ts': time.time(), **attributes
+        }, default=str))
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+    
+    def set_attribute(self, key: str, value):
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+class _Span:
+    def __init__(self, telemetry: 'Telemetry', name: str, attributes: Dict):
+        self.telemetry = telemetry
+        self.name = name
+        self.attributes = attributes
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        duration_ms = (time.perf_counter() - self.started) * 1000
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+        for sink in self.telemetry.sinks:
+            sink.record_span(self.name, duration_ms, self.attributes)
+        return False
+    
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+class Telemetry:
+    """Timing spans and counters; a shared no-op span is handed out while no sink is attached"""
+    
+    def __init__(self):
+        self.sinks: List[MetricsSink] = []
+        self.enabled = False
+    
+    def add_sink(self, sink: MetricsSink) -> MetricsSink:
+        self.sinks.append(sink)
+        self.enabled = True
+        return sink
+    
+    def clear_sinks(self):
+        self.sinks = []
+        self.enabled = False
+    
+    def span(self, name: str, **attributes):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, attributes)
+    
+    def incr(self, name: str, value: float = 1, **attributes):
+        if not self.enabled:
+            return
+        for sink in self.sinks:
+            sink.increment(name, value, attributes)
+    
+    def find_sink(self, sink_type: type) -> Optional[MetricsSink]:
+        for sink in self.sinks:
+            if isinstance(sink, sink_type):
+                return sink
+        return None
+
+telemetry = Telemetry()
+
+def configure_from_env(variable: str = "CUNY1969_METRICS") -> Telemetry:
+    """Attach sinks listed in e.g. CUNY1969_METRICS=memory,json,prometheus:9464"""
+    if telemetry.sinks:
+        return telemetry
+    
+    for entry in filter(None, (item.strip() for item in os.environ.get(variable, '').split(','))):
+        kind, _, option = entry.partition(':')
+        if kind == 'memory':
+            telemetry.add_sink(InMemorySink())
+        elif kind == 'json':
+            telemetry.add_sink(JsonLogSink())
+        elif kind == 'prometheus':
+            sink = telemetry.add_sink(PrometheusSink())
+            if option:
+                sink.serve(int(option))
+        else:
+            logger.warning(f"Unknown metrics sink in {variable}: {kind}")
+    
+    return telemetry
\ No newline at end of file
@@ -0,0 +1,109 @@
+import json
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+PAGES_FILE = "pages.npz"
+PAGE_ID_PATTERN = re.compile(r'^(page_\d+)_')
+
+def page_of(record_id: str) -> Optional[str]:
+    match = PAGE_ID_PATTERN.match(record_id)
+    return match.group(1) if match else None
+
+class PageIndex:
+    """Centroid vector per scraped page, for picking the pages whose chunks a query is scored against"""
+    
+    def __init__(self, pages: List[str], vectors: np.ndarray, members: List[List[str]],
+                 titles: List[str], urls: List[str]):
+        self.pages = pages
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        self.members = members
+        self.titles = titles
+        self.urls = urls
+        self._member_sets = [set(ids) for ids in members]
+    
+    def __len__(self) -> int:
+        return len(self.pages)
+    
+    @classmethod
+    def build(cls, ids: List[str], metadatas: List[Dict], embeddings) -> 'PageIndex':
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        rows: Dict[str, List[int]] = {}
+        url_pages = {}
+        for row, (record_id, metadata) in enumerate(zip(ids, metadatas)):
+            page = page_of(record_id)
+            if page is not None:
+                rows.setdefault(page, []).append(row)
+                if metadata.get('source_url'):
+                    url_pages.setdefault(metadata['source_url'], page)
+        
+        # A deduplicated chunk also belongs to the other pages it appeared on
+        for row, metadata in enumerate(metadatas):
+            for url in metadata.get('source_urls') or []:
+                page = url_pages.get(url)
+                if page is not None and row not in rows[page]:
+                    rows[page].append(row)
+        
+        pages = sorted(rows, key=lambda page: int(page.split('_')[1]))
+        vectors = np.zeros((len(pages), embeddings.shape[1]), dtype=np.float32)
+        for i, page in enumerate(pages):
+            centroid = embeddings[rows[page]].mean(axis=0)
+            vectors[i] = centroid / max(np.linalg.norm(centroid), 1e-12)
+        
+        return cls(
+            pages, vectors,
+            members=[[ids[row] for row in rows[page]] for page in pages],
+            titles=[metadatas[rows[page][0]].get('title', '') for page in pages],
+            urls=[metadatas[rows[page][0]].get('source_url', '') for page in pages]
+        )
+    
+    def top_pages(self, query_embeddings: np.ndarray, n_pages: int,
+                  allowed: Optional[Sequence[int]] = None) -> List[List[Tuple[int, float]]]:
+        """Best (page row, cosine similarity) pairs per query, most similar first; only `allowed` rows if given"""
+        page_rows = np.arange(len(self.pages)) if allowed is None else np.asarray(allowed, dtype=np.int64)
+        scores = np.asarray(query_embeddings, dtype=np.float32) @ self.vectors[page_rows].T
+        n_pages = min(n_pages, len(page_rows))
+        if n_pages <= 0:
+            return [[] for _ in range(len(scores))]
+        
+        top = []
+        for row in scores:
+            candidates = np.argpartition(-row, n_pages - 1)[:n_pages]
+            candidates = candidates[np.argsort(-row[candidates], kind='stable')]
+            top.append([(int(page_rows[page]), float(row[page])) for page in candidates])
+        return top
+    
+    def pages_with(self, ids: Sequence[str]) -> List[int]:
+        """Rows of the pages holding at least one of ids"""
+        wanted = set(ids)
+        return [page for page, members in enumerate(self._member_sets) if not wanted.isdisjoint(members)]
+    
+    def ids_for(self, page_rows: Sequence[int]) -> List[str]:
+        return list(dict.fromkeys(record_id for page in page_rows for record_id in self.members[page]))
+    
+    def group(self, results: List[Dict], page_hits: List[Tuple[int, float]]) -> List[Dict]:
+        """Results grouped under the selected pages; a chunk shared by several pages goes to the best one"""
+        groups = [
+            {'page': self.pages[page], 'title': self.titles[page], 'source_url': self.urls[page],
+             'score': score, 'results': []}
+            for page, score in page_hits
+        ]
+        for result in results:
+            for group, (page, _) in zip(groups, page_hits):
+                if result.get('id') in self._member_sets[page]:
+                    group['results'].append(result)
+                    break
+        return [group for group in groups if group['results']]
+    
+    def save(self, path: str):
+        meta = {'pages': self.pages, 'members': self.members, 'titles': self.titles, 'urls': self.urls}
+        with open(f"{path}.tmp", 'wb') as f:
+            np.savez(f, vectors=self.vectors, meta=np.array(json.dumps(meta, ensure_ascii=False)))
+        os.replace(f"{path}.tmp", path)
+    
+    @classmethod
+    def load(cls, path: str) -> 'PageIndex':
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            return cls(meta['pages'], data['vectors'], meta['members'], meta['titles'], meta['urls'])
\ No newline at end of file
@@ -0,0 +1,261 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import gc
+import signal
+import time
+from http.server import ThreadingHTTPServer
+from typing import Dict, List
+import logging
+
+from kb_bundle import (DEFAULT_BUNDLE_DIR, current_version, export_bundle, open_bundle_knowledge_base,
+                       read_manifest, stale_reason)
+from metrics import InMemorySink, PrometheusSink, configure_from_env, telemetry
+from admission import AdmissionController
+from encoder_tuning import add_tuning_arguments, configure_encoder, core_budget, set_encoder_threads
+from server import ChatRequestHandler, bind_handler, default_concurrency
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def read_memory(pid: int) -> Dict[str, float]:
+    """RSS, PSS, shared and private memory in MB from /proc/<pid>/smaps_rollup (Linux only)"""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    except OSError:
+        return {}
+    
+    return {
+        'rss_mb': fields.get('Rss', 0.0),
+        'pss_mb': fields.get('Pss', 0.0),
+        'shared_mb': fields.get('Shared_Clean', 0.0) + fields.get('Shared_Dirty', 0.0),
+        'private_mb': fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0)
+    }
+
+def memory_report(master_pid: int, worker_pids: List[int]) -> Dict:
+    processes = [{'pid': master_pid, 'role': 'master', **read_memory(master_pid)}]
+    processes.extend({'pid': pid, 'role': 'worker', **read_memory(pid)} for pid in worker_pids)
+    
+    workers = [process for process in processes[1:] if 'rss_mb' in process]
+    if 'rss_mb' not in processes[0] or not workers:
+        return {'processes': processes}
+    
+    return {
+        'processes': processes,
+        'total_pss_mb': sum(process['pss_mb'] for process in processes if 'pss_mb' in process),
+        'independent_rss_mb': processes[0]['rss_mb'] * (len(workers) + 1),
+        'private_mb_per_worker': sum(process['private_mb'] for process in workers) / len(workers)
+    }
+
+def log_memory_report(report: Dict):
+    lines = [f"{'pid':>8} {'role':<7} {'rss MB':>8} {'pss MB':>8} {'shared MB':>10} {'private MB':>11}"]
+    for process in report['processes']:
+        if 'rss_mb' not in process:
+            lines.append(f"{process['pid']:>8} {process['role']:<7} (smaps_rollup unavailable)")
+            continue
+        lines.append(f"{process['pid']:>8} {process['role']:<7} {process['rss_mb']:>8.1f} "
+                     f"{process['pss_mb']:>8.1f} {process['shared_mb']:>10.1f} {process['private_mb']:>11.1f}")
+    
+    if 'total_pss_mb' in report:
+        lines.append(f"Total PSS {report['total_pss_mb']:.1f} MB vs {report['independent_rss_mb']:.1f} MB "
+                     f"for independent processes; each extra worker costs "
+                     f"{report['private_mb_per_worker']:.1f} MB private")
+    
+    logger.info("Memory by process:\n" + "\n".join(lines))
+
+class PreforkServer:
+    """Binds once, then forks workers that share the master's model and index pages copy-on-write"""
+    
+    def __init__(self, chatbot, host: str = "127.0.0.1", port: int = 8000, workers: int = 2,
+                 max_batch_size: int = 16, batch_window_ms: float = 5.0, max_concurrency: int = 0,
+                 max_queue: int = 64, max_wait_ms: float = 1000.0, encoder_threads: int = 0):
+        self.chatbot = chatbot
+        self.workers = workers
+        # Intra-op threads each worker's encoder may use; by default an equal share of the cores
+        self.encoder_threads = encoder_threads or core_budget(workers)
+        self.max_batch_size = max_batch_size
+        self.batch_window_ms = batch_window_ms
+        # Per worker; by default each gets an equal share of the cores
+        self.max_concurrency = max_concurrency or default_concurrency(max_batch_size, workers)
+        self.max_queue = max_queue
+        self.max_wait_ms = max_wait_ms
+        self.server = ThreadingHTTPServer((host, port), ChatRequestHandler)
+        self.server.daemon_threads = True
+        self.worker_pids: List[int] = []
+        self._running = False
+    
+    def _spawn(self) -> int:
+        pid = os.fork()
+        if pid:
+            self.worker_pids.append(pid)
+            return pid
+        
+        # Worker: the batcher thread has to be started after the fork
+        status = 0
+        try:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+            set_encoder_threads(self.encoder_threads)
+            admission = None
+            if self.max_queue > 0:
+                admission = AdmissionController(self.max_concurrency, max_queue=self.max_queue,
+                                                max_wait_ms=self.max_wait_ms)
+            self.server.RequestHandlerClass = bind_handler(
+                self.chatbot, max_batch_size=self.max_batch_size, batch_window_ms=self.batch_window_ms,
+                admission=admission
+            )
+            self.server.serve_forever()
+        except SystemExit:
+            pass
+        except Exception as e:
+            logger.error(f"Worker {os.getpid()} failed: {e}")
+            status = 1
+        finally:
+            os._exit(status)
+    
+    def _reap(self):
+        while self.worker_pids:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.worker_pids:
+                self.worker_pids.remove(pid)
+                if self._running:
+                    logger.warning(f"Worker {pid} exited with status {status}; starting a replacement")
+                    self._spawn()
+    
+    def _stop(self, *_):
+        self._running = False
+    
+    def serve_forever(self, report_interval: float = 60.0):
+        # Objects that exist now are never collected, so the GC will not write to their shared pages
+        gc.collect()
+        gc.freeze()
+        
+        self._running = True
+        for _ in range(self.workers):
+            self._spawn()
+        logger.info(f"Master {os.getpid()} started {self.workers} workers: {self.worker_pids}")
+        
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        
+        next_report = time.monotonic() + min(report_interval, 2.0) if report_interval > 0 else None
+        try:
+            while self._running:
+                time.sleep(0.5)
+                self._reap()
+                if next_report is not None and time.monotonic() >= next_report:
+                    log_memory_report(memory_report(os.getpid(), self.worker_pids))
+                    next_report = time.monotonic() + report_interval
+        finally:
+            self._running = False
+            for pid in self.worker_pids:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+            for pid in self.worker_pids:
+                try:
+                    os.waitpid(pid, 0)
+                except ChildProcessError:
+                    pass
+            self.server.server_close()
+            logger.info("Shutting down")
+
+def load_chatbot(db_dir: str = "../data/chroma_db", bundle_dir: str = DEFAULT_BUNDLE_DIR,
+                 rebuild_bundle: bool = False, data_dir: str = "../data"):
+    from knowledge_base import CUNY1969KnowledgeBase
+    from chatbot import CUNY1969Chatbot
+    
+    version = current_version(bundle_dir)
+    try:
+        manifest = read_manifest(os.path.join(bundle_dir, version)) if version else None
+    except (OSError, ValueError) as e:
+        # An unreadable manifest is treated like a stale bundle: export a new one
+        logger.warning(f"Ignoring knowledge-base bundle {version}: {e}")
+        manifest = None
+    db_stale = manifest is not None and stale_reason(manifest, db_dir=db_dir) is not None
+    data_stale = manifest is not None and stale_reason(manifest, data_dir=data_dir) is not None
+    
+    model = None
+    if rebuild_bundle or manifest is None or db_stale or data_stale:
+        kb = CUNY1969KnowledgeBase(data_dir=data_dir, db_dir=db_dir)
+        if data_stale:
+            logger.info(f"Rebuilding {db_dir}: {stale_reason(manifest, data_dir=data_dir)}")
+            kb.reset_collection()
+            kb.build_knowledge_base()
+        if kb.collection.count() == 0:
+            raise RuntimeError(f"{db_dir} holds no chunks; build the knowledge base before serving "
+                               f"(python kb_bundle.py --rebuild)")
+        export_bundle(kb, bundle_dir)
+        model = kb.model
+        # Workers must not inherit an open Chroma client
+        del kb
+        gc.collect()
+    
+    kb = open_bundle_knowledge_base(bundle_dir, model=model)
+    if kb is None:
+        raise RuntimeError(f"Could not load the knowledge-base bundle in {bundle_dir}")
+    return CUNY1969Chatbot(kb=kb)
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='CUNY 1969 Chatbot pre-fork server')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to bind')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='Worker processes to fork')
+    parser.add_argument('--data-dir', default='../data', help='Directory with the scraped pages')
+    parser.add_argument('--db-dir', default='../data/chroma_db', help='Chroma database directory')
+    parser.add_argument('--bundle-dir', default=DEFAULT_BUNDLE_DIR,
+                        help='Knowledge-base bundle to memory-map (exported from --db-dir when missing or stale)')
+    parser.add_argument('--rebuild-bundle', action='store_true',
+                        help='Export a new bundle even if the current one matches the Chroma build')
+    parser.add_argument('--max-batch-size', type=int, default=16, help='Largest number of queries per batch')
+    parser.add_argument('--batch-window-ms', type=float, default=5.0,
+                        help='How long to wait for more queries after the first one arrives')
+    parser.add_argument('--max-concurrency', type=int, default=0,
+                        help='Requests each worker admits at once (0 = one full batch per core of its share)')
+    parser.add_argument('--max-queue', type=int, default=64,
+                        help='Requests that may wait for admission in each worker (0 = no admission control)')
+    parser.add_argument('--max-wait-ms', type=float, default=1000.0,
+                        help='How long a request may wait for admission before it gets 503')
+    parser.add_argument('--report-interval', type=float, default=60.0,
+                        help='Seconds between memory reports (0 disables)')
+    parser.add_argument('--no-telemetry', action='store_true',
+                        help='Do not record pipeline spans and counters for /metrics')
+    add_tuning_arguments(parser)
+    
+    args = parser.parse_args()
+    
+    configure_from_env()
+    if not args.no_telemetry and telemetry.find_sink(InMemorySink) is None:
+        telemetry.add_sink(PrometheusSink())
+    
+    # One thread until the fork: an OpenMP pool started here would be inherited half-dead by the workers
+    set_encoder_threads(1)
+    chatbot = load_chatbot(args.db_dir, args.bundle_dir, args.rebuild_bundle, args.data_dir)
+    # Probed in a child process for the same reason; each worker sets its threads after the fork
+    setting = configure_encoder(args, chatbot.kb, workers=args.workers, set_threads=False, isolated=True)
+    
+    server = PreforkServer(
+        chatbot, args.host, args.port, workers=args.workers,
+        max_batch_size=args.max_batch_size, batch_window_ms=args.batch_window_ms,
+        max_concurrency=args.max_concurrency, max_queue=args.max_queue, max_wait_ms=args.max_wait_ms,
+        encoder_threads=setting['threads'] if setting else 0
+    )
+    logger.info(f"Serving on http://{args.host}:{args.port} with {args.workers} workers")
+    server.serve_forever(report_interval=args.report_interval)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
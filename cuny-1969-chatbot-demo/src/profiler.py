@@ -0,0 +1,286 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_DIR = os.path.join("..", "data", "profiles")
+# Frames from files in these directories count as project code; the rest is attributed to its project caller
+PROJECT_DIRS = [
+    os.path.dirname(os.path.abspath(__file__)),
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'demo')
+]
+OTHER_MODULE = '(other)'
+MODES = ['sample', 'trace']
+# A sampled step with fewer samples than this says little about where its time went, so it is traced instead
+MIN_SAMPLES = 10
+
+def project_module(filename: str) -> Optional[str]:
+    directory, name = os.path.split(os.path.abspath(filename))
+    if directory in PROJECT_DIRS and name.endswith('.py') and name != os.path.basename(__file__):
+        return name[:-3]
+    return None
+
+def frame_label(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+def frame_stack(frame, modules: Dict[str, Optional[str]]) -> List[str]:
+    """Labels from the outermost frame down to this one, noting which project module each belongs to"""
+    stack = []
+    while frame is not None:
+        label = frame_label(frame)
+        if label not in modules:
+            modules[label] = project_module(frame.f_code.co_filename)
+        stack.append(label)
+        frame = frame.f_back
+    return stack[::-1]
+
+class Profile:
+    """Weight per call stack (root first): sample counts, or microseconds when traced"""
+    
+    def __init__(self, name: str, unit: str = 'samples'):
+        self.name = name
+        self.unit = unit
+        self.stacks: Counter = Counter()
+        self.modules: Dict[str, Optional[str]] = {}
+        self.duration_ms = 0.0
+        self.note: Optional[str] = None
+    
+    @property
+    def weight(self) -> float:
+        return sum(self.stacks.values())
+    
+    def merge(self, other: 'Profile'):
+        self.stacks.update(other.stacks)
+        self.modules.update(other.modules)
+        self.duration_ms += other.duration_ms
+    
+    def by_module(self) -> Dict[str, float]:
+        """Share of the profile per project module, counting library code (torch, chromadb, ...) toward its caller"""
+        counts = Counter()
+        for stack, count in self.stacks.items():
+            owner = next((self.modules[label] for label in reversed(stack) if self.modules[label]), OTHER_MODULE)
+            counts[owner] += count
+        total = self.weight or 1
+        return {module: count / total for module, count in counts.most_common()}
+    
+    def top_functions(self, n: int = 15) -> List[Dict]:
+        self_counts, total_counts = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            self_counts[stack[-1]] += count
+            for label in set(stack):
+                total_counts[label] += count
+        
+        total = self.weight or 1
+        return [
+            {
+                'function': label,
+                'module': self.modules.get(label) or OTHER_MODULE,
+                'self': count / total,
+                'total': total_counts[label] / total
+            }
+            for label, count in self_counts.most_common(n)
+        ]
+    
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format, readable by flamegraph.pl and speedscope"""
+        return ''.join(f"{';'.join(stack)} {round(count)}\n" for stack, count in sorted(self.stacks.items())
+                       if round(count) > 0)
+    
+    def summary(self, top: int = 15) -> Dict:
+        return {
+            'name': self.name,
+            'unit': self.unit,
+            'weight': self.weight,
+            'duration_ms': self.duration_ms,
+            'note': self.note,
+            'modules': self.by_module(),
+            'top_functions': self.top_functions(top)
+        }
+    
+    def write(self, directory: str) -> str:
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r'[^a-z0-9]+', '_', self.name.lower()).strip('_') or 'profile'
+        path = os.path.join(directory, f"{slug}.folded")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.collapsed())
+        return path
+
+class SamplingProfiler:
+    """Samples one thread's Python stack every interval_ms from a background thread; no tracing overhead"""
+    
+    def __init__(self, name: str = 'profile', interval_ms: float = 2.0, thread_id: Optional[int] = None):
+        self.profile = Profile(name, 'samples')
+        self.interval_ms = interval_ms
+        self.thread_id = thread_id
+        self._stopped = threading.Event()
+        self._sampler = None
+        self._started = None
+        self._switch_interval = None
+    
+    def start(self):
+        self.thread_id = self.thread_id or threading.get_ident()
+        # The sampler only runs when it gets the GIL; by default a busy thread holds it for 5 ms at a time
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval_ms / 2000.0))
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._sampler.start()
+        return self
+    
+    def stop(self) -> Profile:
+        self._stopped.set()
+        self._sampler.join()
+        sys.setswitchinterval(self._switch_interval)
+        self.profile.duration_ms += (time.perf_counter() - self._started) * 1000
+        return self.profile
+    
+    def _run(self):
+        while not self._stopped.wait(self.interval_ms / 1000.0):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None and not self._stopped.is_set():
+                self.profile.stacks[tuple(frame_stack(frame, self.profile.modules))] += 1
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+class TracingProfiler:
+    """Deterministic: every Python and C call on the calling thread, weighted by wall time in microseconds.
+    Much slower than sampling, but exact for calls too short to sample (e.g. the keyword engine)"""
+    
+    def __init__(self, name: str = 'profile'):
+        self.profile = Profile(name, 'us')
+        self._base = ()
+        self._stack: List[str] = []
+        self._last = None
+        self._started = None
+    
+    def _charge(self, now: float):
+        if self._stack:
+            self.profile.stacks[self._base + tuple(self._stack)] += (now - self._last) * 1e6
+        self._last = now
+    
+    def _callback(self, frame, event, arg):
+        self._charge(time.perf_counter())
+        if event in ('call', 'c_call') and not self._stack:
+            # A call made directly from the profiled block: its callers form the stack prefix
+            self._base = tuple(frame_stack(frame.f_back if event == 'call' else frame, self.profile.modules))
+        if event == 'call':
+            label = frame_label(frame)
+            if label not in self.profile.modules:
+                self.profile.modules[label] = project_module(frame.f_code.co_filename)
+            self._stack.append(label)
+        elif event == 'c_call':
+            label = f"{getattr(arg, '__module__', None) or 'builtins'}:{getattr(arg, '__name__', '?')}"
+            self.profile.modules.setdefault(label, None)
+            self._stack.append(label)
+        elif self._stack:
+            self._stack.pop()
+    
+    def start(self):
+        self._started = self._last = time.perf_counter()
+        sys.setprofile(self._callback)
+        return self
+    
+    def stop(self) -> Profile:
+        sys.setprofile(None)
+        self._stack.clear()
+        self.profile.duration_ms += (time.perf_counter() - self._started) * 1000
+        return self.profile
+
+@contextmanager
+def profiled(name: str = 'chat', mode: str = 'sample', interval_ms: float = 2.0, output_dir: Optional[str] = None):
+    """Profile the body of the with block, e.g. one chatbot.chat() call; writes <name>.folded if output_dir is set"""
+    if mode not in MODES:
+        raise ValueError(f"Unknown profile mode '{mode}'; choose from {MODES}")
+    profiler = SamplingProfiler(name, interval_ms=interval_ms) if mode == 'sample' else TracingProfiler(name)
+    profiler.start()
+    try:
+        yield profiler.profile
+    finally:
+        profile = profiler.stop()
+        if output_dir:
+            path = profile.write(output_dir)
+            logger.info(f"Profile '{name}' ({profile.duration_ms:.0f} ms) written to {path}")
+
+def format_report(profile: Profile, top: int = 15) -> str:
+    lines = [f"{profile.name}: {profile.weight:.0f} {profile.unit} over {profile.duration_ms:.0f} ms"]
+    if profile.note:
+        lines.append(f"  ({profile.note})")
+    lines.extend(["", "By module:"])
+    lines.extend(f"  {module:<20} {share:>6.1%}" for module, share in profile.by_module().items())
+    lines.extend(["", f"{'self':>7} {'total':>7}  function"])
+    lines.extend(f"{row['self']:>7.1%} {row['total']:>7.1%}  {row['function']}" for row in profile.top_functions(top))
+    return '\n'.join(lines)
+
+def add_profile_arguments(parser):
+    parser.add_argument('--profile', action='store_true', help='Profile setup and each scenario instead of the demo')
+    parser.add_argument('--profile-dir', default=DEFAULT_PROFILE_DIR, help='Where to write .folded stacks and the report')
+    parser.add_argument('--profile-mode', choices=MODES, default='sample',
+                        help='sample: low-overhead stack sampling; trace: every call, exact but slow')
+    parser.add_argument('--profile-interval-ms', type=float, default=2.0, help='Sampling interval')
+    parser.add_argument('--profile-top', type=int, default=15, help='Hot functions to list per profile')
+
+def profile_steps(steps: List[Tuple[str, Callable]], mode: str, interval_ms: float) -> List[Profile]:
+    """Profile each (name, fn) step. If sampling left any step with fewer than MIN_SAMPLES, all of them are
+    run again traced, so their profiles share a unit and can be merged"""
+    profiles = []
+    for name, fn in steps:
+        with profiled(name, mode, interval_ms) as profile:
+            fn()
+        profiles.append(profile)
+    
+    sparse = [profile for profile in profiles if profile.unit == 'samples' and profile.weight < MIN_SAMPLES]
+    if not sparse:
+        return profiles
+    
+    logger.info(f"{len(sparse)} of {len(profiles)} step(s) got fewer than {MIN_SAMPLES} samples at "
+                f"{interval_ms:g} ms; tracing instead")
+    traced = profile_steps(steps, 'trace', interval_ms)
+    for sampled, profile in zip(profiles, traced):
+        profile.note = f"only {sampled.weight:.0f} sample(s) at {interval_ms:g} ms, so traced instead"
+    return traced
+
+def run_profile(args, runner) -> int:
+    """Run the runner's setup and every scenario under the profiler; print and write the results"""
+    # The runners pause so a viewer can read along; that is idle time, not work to profile
+    runner.pace_s = 0
+    # The scenarios ask the questions a warmed semantic cache already holds; without it they measure retrieval
+    runner.chatbot_options = {'prewarm_cache': False, 'cache_capacity': 0}
+    profiles = profile_steps([('setup', runner.setup_demo)], args.profile_mode, args.profile_interval_ms)
+    scenarios = profile_steps(
+        [(scenario['name'], lambda scenario=scenario: runner.run_scenario(scenario))
+         for scenario in runner.demo_scenarios],
+        args.profile_mode, args.profile_interval_ms
+    )
+    
+    combined = Profile('all scenarios', scenarios[0].unit)
+    for profile in scenarios:
+        combined.merge(profile)
+    if scenarios[0].note:
+        combined.note = "scenarios got too few samples, so traced instead"
+    profiles += scenarios
+    
+    for profile in profiles + [combined]:
+        profile.write(args.profile_dir)
+        print("\n" + format_report(profile, args.profile_top))
+    
+    report_path = os.path.join(args.profile_dir, 'profile_report.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump([profile.summary(args.profile_top) for profile in profiles + [combined]], f, indent=2)
+    print(f"\nFolded stacks and {os.path.basename(report_path)} written to {args.profile_dir} "
+          f"(view with flamegraph.pl or https://www.speedscope.app)")
+    return 0
\ No newline at end of file
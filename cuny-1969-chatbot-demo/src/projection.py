@@ -0,0 +1,171 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROJECTION_FILE = "projection.npz"
+METHODS = ['pca', 'random']
+DEFAULT_REPORT_FILE = os.path.join("..", "data", "projection_report.json")
+
+class Projection:
+    """Linear map from encoder space to fewer dimensions, applied to stored vectors and queries alike"""
+    
+    def __init__(self, components: np.ndarray, method: str):
+        self.components = np.ascontiguousarray(components, dtype=np.float32)
+        self.method = method
+    
+    @property
+    def dim(self) -> int:
+        return self.components.shape[0]
+    
+    @property
+    def input_dim(self) -> int:
+        return self.components.shape[1]
+    
+    @classmethod
+    def fit(cls, embeddings: np.ndarray, dim: int, method: str = 'pca', seed: int = 1969) -> 'Projection':
+        if method not in METHODS:
+            raise ValueError(f"Unknown projection '{method}'; choose from {METHODS}")
+        embeddings = np.asarray(embeddings, dtype=np.float64)
+        input_dim = embeddings.shape[1]
+        if not 0 < dim < input_dim:
+            raise ValueError(f"Projection dimension must be between 1 and {input_dim - 1}, got {dim}")
+        
+        if method == 'pca':
+            # Uncentered, so inner products rather than spread around the mean are preserved;
+            # eigh on the D x D Gram matrix stays cheap however many chunks there are
+            eigenvalues, eigenvectors = np.linalg.eigh(embeddings.T @ embeddings)
+            order = np.argsort(eigenvalues)[::-1]
+            rank = int(np.sum(eigenvalues > eigenvalues.max() * 1e-9)) if len(embeddings) else 0
+            components = eigenvectors[:, order[:max(min(dim, rank), 1)]].T
+        else:
+            rng = np.random.default_rng(seed)
+            orthonormal, _ = np.linalg.qr(rng.standard_normal((input_dim, dim)))
+            components = orthonormal.T
+        
+        return cls(components, method)
+    
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        """Project and re-normalize, so cosine distance still applies; one matmul for the whole batch"""
+        projected = np.asarray(vectors, dtype=np.float32).reshape(-1, self.input_dim) @ self.components.T
+        return projected / np.maximum(np.linalg.norm(projected, axis=1, keepdims=True), 1e-12)
+    
+    def save(self, path: str):
+        with open(f"{path}.tmp", 'wb') as f:
+            np.savez(f, components=self.components, method=np.array(self.method))
+        os.replace(f"{path}.tmp", path)
+    
+    @classmethod
+    def load(cls, path: str) -> 'Projection':
+        with np.load(path) as data:
+            return cls(data['components'], str(data['method']))
+
+def exact_top_k(queries: np.ndarray, vectors: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ vectors.T
+    k = min(k, vectors.shape[0])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+def projection_report(vectors: np.ndarray, queries: np.ndarray, dims: List[int], method: str = 'pca',
+                      k: int = 5, repeats: int = 20) -> List[Dict]:
+    """recall@k against the full-width exact neighbours, with index memory and per-query scan latency"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    truth = exact_top_k(queries, vectors, k)
+    
+    rows = []
+    for dim in [vectors.shape[1]] + [dim for dim in dims if dim < vectors.shape[1]]:
+        if dim == vectors.shape[1]:
+            projection, stored = None, vectors
+        else:
+            projection = Projection.fit(vectors, dim, method=method)
+            stored = projection.transform(vectors)
+        
+        latencies = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for query in queries:
+                projected = projection.transform(query) if projection is not None else query[None, :]
+                found = exact_top_k(projected, stored, k)
+            latencies.append((time.perf_counter() - start) * 1000 / len(queries))
+        
+        found = exact_top_k(projection.transform(queries) if projection is not None else queries, stored, k)
+        recall = np.mean([len(set(a) & set(b)) / len(a) for a, b in zip(truth, found)])
+        rows.append({
+            'dim': dim,
+            'effective_dim': stored.shape[1],
+            'method': method if projection is not None else 'none',
+            f'recall@{k}': float(recall),
+            'vector_bytes': int(stored.nbytes),
+            'projection_bytes': int(projection.components.nbytes) if projection is not None else 0,
+            'query_ms': float(np.median(latencies))
+        })
+    return rows
+
+def held_out_queries(questions: List[str], chunks: List[str], seed: int = 1969) -> List[str]:
+    """Queries that are not themselves stored: the questions, plus a random span of a third of each chunk's words"""
+    rng = np.random.default_rng(seed)
+    spans = []
+    for chunk in chunks:
+        words = chunk.split()
+        length = max(len(words) // 3, 1)
+        start = int(rng.integers(0, len(words) - length + 1))
+        spans.append(' '.join(words[start:start + length]))
+    return questions + spans
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Recall/memory/latency of projected CUNY 1969 embeddings')
+    parser.add_argument('--data-dir', default='../data', help='Directory with scraped_content.json')
+    parser.add_argument('--dims', type=lambda value: [int(item) for item in value.split(',')],
+                        default=[64, 128, 256], help='Projected dimensions to compare')
+    parser.add_argument('--method', choices=METHODS, default='pca', help='How the projection is fitted')
+    parser.add_argument('--k', type=int, default=5, help='k for recall@k')
+    parser.add_argument('--output', default=DEFAULT_REPORT_FILE, help='Where to write JSON results')
+    
+    args = parser.parse_args()
+    
+    from demo_data import DemoDataCreator
+    from knowledge_base import CUNY1969KnowledgeBase
+    
+    creator = DemoDataCreator(data_dir=args.data_dir)
+    if not os.path.exists(os.path.join(args.data_dir, 'scraped_content.json')):
+        creator.save_demo_data()
+    
+    # Only the encoder and chunking are needed, so the knowledge base opens a throwaway index, not the live one
+    db_dir = tempfile.mkdtemp(prefix='cuny1969_projection_')
+    try:
+        kb = CUNY1969KnowledgeBase(data_dir=args.data_dir, db_dir=db_dir, chroma_url='')
+        chunks, _, _ = kb.prepare_records(kb.load_scraped_data())
+        vectors = kb.encode(chunks)
+        # Scoring the stored chunks themselves would find each one at distance zero and inflate recall
+        queries = kb.encode(held_out_queries([pair['question'] for pair in creator.create_sample_qa_pairs()], chunks))
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+    
+    rows = projection_report(vectors, queries, args.dims, method=args.method, k=args.k)
+    
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'chunks': len(chunks), 'queries': len(queries), 'results': rows}, f, indent=2)
+    
+    print(f"\n{len(chunks)} chunks, {len(queries)} queries, exact search")
+    print(f"{'dim':>5} {'eff':>5} {'method':>7} {f'recall@{args.k}':>9} {'vec KiB':>9} {'proj KiB':>9} {'ms/query':>9}")
+    for row in rows:
+        print(f"{row['dim']:>5} {row['effective_dim']:>5} {row['method']:>7} {row[f'recall@{args.k}']:>9.3f} "
+              f"{row['vector_bytes'] / 1024:>9.1f} {row['projection_bytes'] / 1024:>9.1f} {row['query_ms']:>9.3f}")
+    print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
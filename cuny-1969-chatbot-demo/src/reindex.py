@@ -0,0 +1,366 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+import logging
+
+from knowledge_base import CUNY1969KnowledgeBase
+from metrics import telemetry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_GENERATIONS_DIR = os.path.join("..", "data", "kb_generations")
+ACTIVE_FILE = "ACTIVE"
+PREVIOUS_FILE = "PREVIOUS"
+# One lease file per open reader, readers/<generation>/<pid>-<id>, so another process knows what is in use
+READERS_DIR = "readers"
+# How long a reader keeps a generation it switched away from, for requests still running on it
+RETIRE_GRACE_S = 30.0
+
+def read_pointer(root: str, name: str = ACTIVE_FILE) -> Optional[str]:
+    try:
+        with open(os.path.join(root, name), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def write_pointer(root: str, name: str, generation: Optional[str]):
+    path = os.path.join(root, name)
+    if generation is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(generation)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def acquire_lease(root: str, generation: str) -> str:
+    lease_dir = os.path.join(root, READERS_DIR, generation)
+    os.makedirs(lease_dir, exist_ok=True)
+    path = os.path.join(lease_dir, f"{os.getpid()}-{uuid.uuid4().hex[:8]}")
+    with open(path, 'w', encoding='utf-8'):
+        pass
+    return path
+
+def release_lease(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def live_readers(root: str, generation: str) -> int:
+    """Readers holding the generation open; leases left behind by processes that died are removed"""
+    lease_dir = os.path.join(root, READERS_DIR, generation)
+    try:
+        names = os.listdir(lease_dir)
+    except FileNotFoundError:
+        return 0
+    
+    count = 0
+    for name in names:
+        pid = name.split('-', 1)[0]
+        if pid.isdigit() and _process_alive(int(pid)):
+            count += 1
+        else:
+            release_lease(os.path.join(lease_dir, name))
+    return count
+
+class LiveKnowledgeBase:
+    """Reader that follows the ACTIVE pointer; a flip is picked up on the next call, without a restart"""
+    
+    def __init__(self, root: str = DEFAULT_GENERATIONS_DIR, model=None, retire_grace_s: float = RETIRE_GRACE_S):
+        self.root = root
+        self.model = model
+        self.retire_grace_s = retire_grace_s
+        self._lock = threading.Lock()
+        self._pointer_stat = None
+        self._generation = None
+        self._kb = None
+        self._lease = None
+        # (release time, knowledge base, lease) of generations switched away from
+        self._retired = []
+        self._encode_batch_size = 32
+        self.current()
+    
+    def current(self) -> CUNY1969KnowledgeBase:
+        """The knowledge base of the active generation; callers holding the old one can finish with it"""
+        try:
+            stat = os.stat(os.path.join(self.root, ACTIVE_FILE))
+            pointer_stat = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except FileNotFoundError:
+            pointer_stat = None
+        
+        if self._retired and time.monotonic() >= self._retired[0][0]:
+            self._release_retired()
+        
+        if pointer_stat == self._pointer_stat and self._kb is not None:
+            return self._kb
+        
+        with self._lock:
+            generation = read_pointer(self.root)
+            if generation is None:
+                raise FileNotFoundError(f"No active generation in {self.root}; run reindex.py first")
+            
+            if generation != self._generation:
+                # Leased before opening, so collect_garbage never removes a generation being opened
+                lease = acquire_lease(self.root, generation)
+                try:
+                    kb = CUNY1969KnowledgeBase(db_dir=os.path.join(self.root, generation), model=self.model,
+                                                chroma_url='', encode_batch_size=self._encode_batch_size)
+                except Exception:
+                    release_lease(lease)
+                    raise
+                self.model = kb.model
+                previous = self._generation
+                if self._kb is not None:
+                    self._retired.append((time.monotonic() + self.retire_grace_s, self._kb, self._lease))
+                self._kb, self._lease, self._generation = kb, lease, generation
+                if previous is not None:
+                    logger.info(f"Switched from generation {previous} to {generation}")
+                    telemetry.incr('kb_generation_switches')
+            self._pointer_stat = pointer_stat
+            return self._kb
+    
+    def _release_retired(self, everything: bool = False):
+        with self._lock:
+            now = time.monotonic()
+            keep = []
+            for entry in self._retired:
+                release_at, kb, lease = entry
+                if everything or now >= release_at:
+                    kb.close()
+                    release_lease(lease)
+                else:
+                    keep.append(entry)
+            self._retired = keep
+    
+    def close(self):
+        """Release every generation this reader holds"""
+        self._release_retired(everything=True)
+        with self._lock:
+            if self._kb is not None:
+                self._kb.close()
+                release_lease(self._lease)
+            self._kb, self._lease, self._generation, self._pointer_stat = None, None, None, None
+    
+    @property
+    def generation(self) -> Optional[str]:
+        self.current()
+        return self._generation
+    
+    @property
+    def encode_batch_size(self) -> int:
+        return self._encode_batch_size
+    
+    @encode_batch_size.setter
+    def encode_batch_size(self, value: int):
+        # Kept for the generations flipped to later, not just the current one
+        self._encode_batch_size = value
+        self.current().encode_batch_size = value
+    
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
+
+class BlueGreenIndexer:
+    """Builds a shadow generation, smoke-tests it, then flips ACTIVE; the previous one stays for rollback"""
+    
+    def __init__(self, root: str = DEFAULT_GENERATIONS_DIR, data_dir: str = "../data", model=None,
+                 smoke_queries: Optional[List[Dict]] = None, min_recall: float = 0.5,
+                 max_shrink: float = 0.5):
+        self.root = root
+        self.data_dir = data_dir
+        self.model = model
+        self.smoke_queries = smoke_queries
+        self.min_recall = min_recall
+        self.max_shrink = max_shrink
+        os.makedirs(root, exist_ok=True)
+    
+    def generations(self) -> List[str]:
+        return sorted(
+            name for name in os.listdir(self.root)
+            if name.startswith('gen-') and os.path.isdir(os.path.join(self.root, name))
+        )
+    
+    def status(self) -> Dict:
+        return {
+            'active': read_pointer(self.root, ACTIVE_FILE),
+            'previous': read_pointer(self.root, PREVIOUS_FILE),
+            'generations': self.generations()
+        }
+    
+    def _load_smoke_queries(self) -> List[Dict]:
+        if self.smoke_queries is None:
+            from demo_data import DemoDataCreator
+            self.smoke_queries = DemoDataCreator(data_dir=self.data_dir).create_sample_qa_pairs()
+        return self.smoke_queries
+    
+    def build_shadow(self) -> CUNY1969KnowledgeBase:
+        # Microseconds keep generations built within one second in build order
+        generation = f"gen-{datetime.now():%Y%m%d-%H%M%S-%f}-{uuid.uuid4().hex[:6]}"
+        kb = CUNY1969KnowledgeBase(
+            data_dir=self.data_dir, db_dir=os.path.join(self.root, generation), model=self.model,
+            chroma_url=''  # each generation is its own index, never the shared server's
+        )
+        self.model = kb.model
+        
+        start = time.perf_counter()
+        kb.build_knowledge_base()
+        logger.info(f"Built shadow generation {generation} in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return kb
+    
+    def validate(self, kb: CUNY1969KnowledgeBase) -> Dict:
+        """Smoke queries must return results and hit enough of their keywords; the index must not shrink much"""
+        problems = []
+        count = kb.collection.count()
+        if count == 0:
+            problems.append("shadow collection is empty")
+        
+        active = read_pointer(self.root, ACTIVE_FILE)
+        if active is not None and count:
+            active_kb = CUNY1969KnowledgeBase(db_dir=os.path.join(self.root, active), model=kb.model, chroma_url='')
+            active_count = active_kb.collection.count()
+            active_kb.close()
+            if active_count and count < active_count * (1 - self.max_shrink):
+                problems.append(f"shadow has {count} records, active has {active_count}")
+        
+        recalls = []
+        for pair in self._load_smoke_queries() if count else []:
+            texts = [result['content'] for result in kb.search(pair['question'])['results']]
+            if not texts:
+                problems.append(f"no results for '{pair['question']}'")
+            keywords = pair.get('keywords') or []
+            combined = ' '.join(texts).lower()
+            recalls.append(sum(keyword.lower() in combined for keyword in keywords) / len(keywords) if keywords else 1.0)
+        
+        recall = sum(recalls) / len(recalls) if recalls else 0.0
+        if recalls and recall < self.min_recall:
+            problems.append(f"smoke recall {recall:.2f} is below {self.min_recall:.2f}")
+        
+        return {'records': count, 'smoke_queries': len(recalls), 'recall': recall, 'problems': problems}
+    
+    def activate(self, generation: str):
+        active = read_pointer(self.root, ACTIVE_FILE)
+        if active == generation:
+            return
+        write_pointer(self.root, PREVIOUS_FILE, active)
+        write_pointer(self.root, ACTIVE_FILE, generation)
+        logger.info(f"Activated generation {generation} (previous: {active})")
+    
+    def rollback(self) -> str:
+        previous = read_pointer(self.root, PREVIOUS_FILE)
+        if previous is None or not os.path.isdir(os.path.join(self.root, previous)):
+            raise RuntimeError("No previous generation to roll back to")
+        
+        self.activate(previous)
+        return previous
+    
+    def collect_garbage(self) -> List[str]:
+        """Remove generations older than the active one, except the previous and those a reader still holds
+        open; newer ones may still be building"""
+        active = read_pointer(self.root, ACTIVE_FILE)
+        previous = read_pointer(self.root, PREVIOUS_FILE)
+        removed, in_use = [], []
+        for generation in self.generations():
+            if active is None or generation >= active or generation == previous:
+                continue
+            if live_readers(self.root, generation):
+                in_use.append(generation)
+                continue
+            shutil.rmtree(os.path.join(self.root, generation), ignore_errors=True)
+            shutil.rmtree(os.path.join(self.root, READERS_DIR, generation), ignore_errors=True)
+            removed.append(generation)
+        
+        if removed:
+            logger.info(f"Removed {len(removed)} retired generation(s): {removed}")
+        if in_use:
+            logger.info(f"Kept {len(in_use)} retired generation(s) still open in a reader: {in_use}")
+        return removed
+    
+    def reindex(self) -> Dict:
+        with telemetry.span('kb.reindex'):
+            kb = self.build_shadow()
+            generation = os.path.basename(kb.db_dir)
+            report = self.validate(kb)
+            report['generation'] = generation
+            
+            if report['problems']:
+                logger.error(f"Shadow generation {generation} failed validation: {report['problems']}")
+                kb.close()
+                shutil.rmtree(kb.db_dir, ignore_errors=True)
+                report['activated'] = False
+                return report
+            
+            # Readers open the generation themselves
+            kb.close()
+            self.activate(generation)
+            report['activated'] = True
+            report['removed'] = self.collect_garbage()
+            return report
+    
+    def reindex_in_background(self, on_done=None) -> threading.Thread:
+        def run():
+            try:
+                report = self.reindex()
+            except Exception as e:
+                logger.error(f"Background re-index failed: {e}")
+                report = {'activated': False, 'problems': [str(e)]}
+            if on_done is not None:
+                on_done(report)
+        
+        thread = threading.Thread(target=run, name='kb-reindex', daemon=True)
+        thread.start()
+        return thread
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Blue/green re-indexing of the CUNY 1969 knowledge base')
+    parser.add_argument('--data-dir', default='../data', help='Directory with scraped_content.json')
+    parser.add_argument('--root', default=DEFAULT_GENERATIONS_DIR, help='Directory holding the generations')
+    parser.add_argument('--min-recall', type=float, default=0.5, help='Smallest smoke-query keyword recall')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--rollback', action='store_true', help='Re-activate the previous generation')
+    group.add_argument('--gc', action='store_true', help='Remove retired generations older than the active one')
+    group.add_argument('--status', action='store_true', help='Show the active and previous generations')
+    
+    args = parser.parse_args()
+    
+    indexer = BlueGreenIndexer(root=args.root, data_dir=args.data_dir, min_recall=args.min_recall)
+    if args.status:
+        status = indexer.status()
+        print(f"Active:   {status['active']}\nPrevious: {status['previous']}")
+        print(f"On disk:  {', '.join(status['generations']) or '-'}")
+    elif args.rollback:
+        print(f"Rolled back to {indexer.rollback()}")
+    elif args.gc:
+        print(f"Removed: {', '.join(indexer.collect_garbage()) or 'nothing'}")
+    else:
+        report = indexer.reindex()
+        if not report['activated']:
+            print(f"Generation {report['generation']} rejected: {'; '.join(report['problems'])}")
+            sys.exit(1)
+        print(f"Activated {report['generation']} ({report['records']} records, "
+              f"smoke recall {report['recall']:.2f})")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
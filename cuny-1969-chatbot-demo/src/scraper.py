@@ -1,5 +1,4 @@
 import requests
-from bs4 import BeautifulSoup
 import json
 import time
 import os
@@ -7,6 +6,9 @@ from urllib.parse import urljoin, urlparse
 from typing import List, Dict
 import logging
 
+from loaders import parse_html
+from metrics import telemetry
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -33,30 +35,14 @@ class CUNY1969Scraper:
                 'User-Agent': 'Mozilla/5.0 (Educational Purpose) CUNY 1969 Research Bot'
             })
             response.raise_for_status()
+            telemetry.incr('scraper_bytes_downloaded', len(response.content), kind='page')
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            title = soup.find('title').text.strip() if soup.find('title') else ''
-            
-            main_content = soup.find('div', {'class': 'entry-content'}) or soup.find('main') or soup.find('article')
-            
-            if not main_content:
-                main_content = soup.find('body')
-            
-            text_content = []
+            title, text_content, image_tags = parse_html(response.content)
             images = []
             
-            for element in main_content.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li']):
-                text = element.get_text(strip=True)
-                if text:
-                    text_content.append({
-                        'type': element.name,
-                        'text': text
-                    })
-            
-            for img in main_content.find_all('img'):
-                img_url = urljoin(url, img.get('src', ''))
-                alt_text = img.get('alt', '')
+            for img in image_tags:
+                img_url = urljoin(url, img['src'])
+                alt_text = img['alt']
                 if img_url:
                     img_filename = self.download_image(img_url)
                     if img_filename:
@@ -76,6 +62,7 @@ class CUNY1969Scraper:
             
         except Exception as e:
             logger.error(f"Error scraping {url}: {e}")
+            telemetry.incr('scraper_errors', kind='page')
             return None
     
     def download_image(self, img_url: str) -> str:
@@ -89,22 +76,29 @@ class CUNY1969Scraper:
             
             filepath = os.path.join(self.assets_dir, filename)
             
+            downloaded = 0
             with open(filepath, 'wb') as f:
                 for chunk in response.iter_content(chunk_size=8192):
                     f.write(chunk)
+                    downloaded += len(chunk)
+            telemetry.incr('scraper_bytes_downloaded', downloaded, kind='image')
+            telemetry.incr('scraper_images_downloaded')
             
             logger.info(f"Downloaded image: {filename}")
             return filename
             
         except Exception as e:
             logger.error(f"Error downloading image {img_url}: {e}")
+            telemetry.incr('scraper_errors', kind='image')
             return None
     
     def scrape_all(self):
         for url in self.urls:
-            page_data = self.scrape_page(url)
+            with telemetry.span('scraper.scrape_page'):
+                page_data = self.scrape_page(url)
             if page_data:
                 self.scraped_data.append(page_data)
+                telemetry.incr('scraper_pages_scraped')
             
             time.sleep(2)
         
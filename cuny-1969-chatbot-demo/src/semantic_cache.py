@@ -0,0 +1,98 @@
+import threading
+from typing import Dict, Optional
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SemanticCache:
+    """Response cache keyed by query embedding, matched by cosine similarity (capacity 0 disables it)"""
+    
+    def __init__(self, threshold: float = 0.92, capacity: int = 256):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._clear()
+    
+    def _clear(self):
+        self._vectors = None
+        self._responses = [None] * self.capacity
+        self._tags = [None] * self.capacity
+        self._last_used = np.zeros(self.capacity, dtype=np.int64)
+        self._size = 0
+        self._clock = 0
+    
+    def _normalize(self, embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def lookup(self, query_embedding: np.ndarray, tag: Optional[str] = None) -> Optional[Dict]:
+        query = self._normalize(query_embedding)
+        
+        with self._lock:
+            if self._size == 0:
+                self.misses += 1
+                return None
+            
+            similarities = self._vectors[:self._size] @ query
+            for slot in range(self._size):
+                if self._tags[slot] != tag:
+                    similarities[slot] = -1.0
+            
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            
+            self._clock += 1
+            self._last_used[best] = self._clock
+            self.hits += 1
+            return dict(self._responses[best])
+    
+    def put(self, query_embedding: np.ndarray, response: Dict, tag: Optional[str] = None):
+        if self.capacity <= 0:
+            return
+        
+        query = self._normalize(query_embedding)
+        
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.capacity, len(query)), dtype=np.float32)
+            
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+            
+            self._clock += 1
+            self._vectors[slot] = query
+            self._responses[slot] = dict(response)
+            self._tags[slot] = tag
+            self._last_used[slot] = self._clock
+    
+    def invalidate(self):
+        with self._lock:
+            dropped = self._size
+            self._clear()
+        
+        logger.info(f"Semantic cache invalidated ({dropped} entries dropped)")
+    
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': self._size,
+            'capacity': self.capacity,
+            'threshold': self.threshold,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else None
+        }
\ No newline at end of file
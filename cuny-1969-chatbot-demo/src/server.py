@@ -0,0 +1,354 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import math
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+import logging
+
+from admission import PRIORITIES, AdmissionController, Rejected
+from encoder_tuning import add_tuning_arguments, configure_encoder
+from metrics import (Histogram, InMemorySink, PrometheusSink, LATENCY_BUCKETS_MS,
+                     BATCH_SIZE_BUCKETS, configure_from_env, telemetry)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class _PendingQuery:
+    def __init__(self, query: str):
+        self.query = query
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+        # Set when the caller stopped waiting; the batch worker then drops the query instead of answering it
+        self.cancelled = False
+
+class MicroBatcher:
+    """Collects concurrent queries into batches for one batched encode and index query"""
+    
+    def __init__(self, handler: Callable[[List[str]], List[Dict]],
+                 max_batch_size: int = 16, batch_window_ms: float = 5.0):
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.batch_window_ms = batch_window_ms
+        self.queue_wait = Histogram(
+            'chat_queue_wait_ms', LATENCY_BUCKETS_MS, 'Time a query waited before its batch ran'
+        )
+        self.batch_size = Histogram(
+            'chat_batch_size', BATCH_SIZE_BUCKETS, 'Number of queries per batched call'
+        )
+        self.batch_latency = Histogram(
+            'chat_batch_latency_ms', LATENCY_BUCKETS_MS, 'Time spent running one batch'
+        )
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._worker.start()
+    
+    def submit(self, query: str, timeout: Optional[float] = None) -> Dict:
+        pending = _PendingQuery(query)
+        self._queue.put(pending)
+        
+        if not pending.done.wait(timeout):
+            pending.cancelled = True
+            raise TimeoutError(f"Query not answered within {timeout}s")
+        
+        if pending.error is not None:
+            raise pending.error
+        
+        return pending.response
+    
+    def stop(self):
+        self._stopped.set()
+        self._queue.put(None)
+        self._worker.join()
+    
+    def _collect_batch(self) -> List[_PendingQuery]:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return []
+            if not first.cancelled:
+                break
+            telemetry.incr('chat_queries_cancelled')
+        
+        batch = [first]
+        deadline = first.enqueued_at + self.batch_window_ms / 1000.0
+        
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if pending is None:
+                self._stopped.set()
+                break
+            if pending.cancelled:
+                telemetry.incr('chat_queries_cancelled')
+                continue
+            batch.append(pending)
+        
+        return batch
+    
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            
+            started = time.perf_counter()
+            for pending in batch:
+                self.queue_wait.observe((started - pending.enqueued_at) * 1000)
+            self.batch_size.observe(len(batch))
+            
+            try:
+                responses = self.handler([pending.query for pending in batch])
+                for pending, response in zip(batch, responses):
+                    pending.response = response
+            except Exception as e:
+                logger.error(f"Batch of {len(batch)} queries failed: {e}")
+                for pending in batch:
+                    pending.error = e
+            
+            self.batch_latency.observe((time.perf_counter() - started) * 1000)
+            
+            for pending in batch:
+                pending.done.set()
+    
+    def stats(self) -> Dict:
+        return {
+            'max_batch_size': self.max_batch_size,
+            'batch_window_ms': self.batch_window_ms,
+            'queue_depth': self._queue.qsize(),
+            'queue_wait_ms': self.queue_wait.snapshot(),
+            'batch_size': self.batch_size.snapshot(),
+            'batch_latency_ms': self.batch_latency.snapshot()
+        }
+    
+    def render_prometheus(self) -> str:
+        lines = [
+            '# TYPE chat_queue_depth gauge',
+            f'chat_queue_depth {self._queue.qsize()}'
+        ]
+        for histogram in [self.queue_wait, self.batch_size, self.batch_latency]:
+            lines.append(f'# HELP {histogram.name} {histogram.help_text}')
+            lines.append(f'# TYPE {histogram.name} histogram')
+            lines.extend(histogram.render_prometheus())
+        return '\n'.join(lines) + '\n'
+
+class ChatRequestHandler(BaseHTTPRequestHandler):
+    batcher: MicroBatcher = None
+    chatbot = None
+    admission: Optional[AdmissionController] = None
+    request_timeout: float = 30.0
+    
+    def _send_text(self, status: int, text: str):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _answer(self, query: str, priority: str = 'interactive'):
+        if not query or not query.strip():
+            self._send_json(400, {'error': "Missing 'query'"})
+            return
+        if priority not in PRIORITIES:
+            self._send_json(400, {'error': f"Unknown priority '{priority}'; choose from {PRIORITIES}"})
+            return
+        
+        try:
+            if self.admission is None:
+                response = self.batcher.submit(query.strip(), timeout=self.request_timeout)
+            else:
+                with self.admission.admit(priority):
+                    response = self.batcher.submit(query.strip(), timeout=self.request_timeout)
+        except Rejected as e:
+            self._send_json(503, {'error': str(e), 'retry_after': e.retry_after},
+                            headers={'Retry-After': str(math.ceil(e.retry_after))})
+            return
+        except TimeoutError as e:
+            self._send_json(504, {'error': str(e)})
+            return
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+            return
+        
+        self._send_json(200, response)
+    
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        
+        if parsed.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        elif parsed.path == '/stats':
+            stats = self.batcher.stats()
+            if self.admission is not None:
+                stats['admission'] = self.admission.stats()
+            chatbot_stats = getattr(self.chatbot, 'stats', None)
+            if chatbot_stats is not None:
+                stats['chatbot'] = chatbot_stats()
+            sink = telemetry.find_sink(InMemorySink)
+            if sink is not None:
+                stats['telemetry'] = sink.snapshot()
+            self._send_json(200, stats)
+        elif parsed.path == '/metrics':
+            sink = telemetry.find_sink(InMemorySink)
+            text = self.batcher.render_prometheus()
+            if self.admission is not None:
+                text += self.admission.render_prometheus()
+            if sink is not None:
+                text += sink.render_prometheus()
+            self._send_text(200, text)
+        elif parsed.path == '/chat':
+            params = parse_qs(parsed.query)
+            self._answer(params.get('q', [''])[0], params.get('priority', ['interactive'])[0])
+        else:
+            self._send_json(404, {'error': f"Unknown path: {parsed.path}"})
+    
+    def do_POST(self):
+        if urlparse(self.path).path != '/chat':
+            self._send_json(404, {'error': f"Unknown path: {self.path}"})
+            return
+        
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except (ValueError, json.JSONDecodeError):
+            self._send_json(400, {'error': 'Request body must be JSON'})
+            return
+        
+        self._answer(payload.get('query', ''), payload.get('priority', 'interactive'))
+    
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+def default_concurrency(max_batch_size: int, workers: int = 1) -> int:
+    """Admission limit for one serving process: a full batch for each core it gets"""
+    return max((os.cpu_count() or 1) // workers, 1) * max_batch_size
+
+def bind_handler(chatbot, max_batch_size: int = 16, batch_window_ms: float = 5.0,
+                 admission: Optional[AdmissionController] = None):
+    """Handler class wired to a new MicroBatcher (start this after forking; threads do not survive fork)"""
+    batcher = MicroBatcher(
+        chatbot.chat_batch, max_batch_size=max_batch_size, batch_window_ms=batch_window_ms
+    )
+    return type('BoundChatRequestHandler', (ChatRequestHandler,),
+                {'batcher': batcher, 'chatbot': chatbot, 'admission': admission})
+
+def create_server(chatbot, host: str = "127.0.0.1", port: int = 8000,
+                  max_batch_size: int = 16, batch_window_ms: float = 5.0,
+                  admission: Optional[AdmissionController] = None) -> ThreadingHTTPServer:
+    handler = bind_handler(chatbot, max_batch_size=max_batch_size, batch_window_ms=batch_window_ms,
+                           admission=admission)
+    batcher = handler.batcher
+    
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.batcher = batcher
+    return server
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='CUNY 1969 Chatbot HTTP Server')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to bind')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on')
+    parser.add_argument('--db-dir', default='../data/chroma_db', help='Chroma database directory')
+    parser.add_argument('--chroma-url', default=None,
+                        help='Query a shared Chroma server (see chroma_server.py) instead of opening --db-dir '
+                             '(default: $CUNY1969_CHROMA_URL)')
+    parser.add_argument('--max-batch-size', type=int, default=16, help='Largest number of queries per batch')
+    parser.add_argument('--batch-window-ms', type=float, default=5.0,
+                        help='How long to wait for more queries after the first one arrives')
+    
+    parser.add_argument('--shards', type=int, default=0,
+                        help='Serve a sharded knowledge base with this many shards (0 = single collection)')
+    parser.add_argument('--shard-dir', default='../data/chroma_shards', help='Directory for the shard databases')
+    parser.add_argument('--generations-dir', default=None,
+                        help='Follow the active blue/green generation in this directory (see reindex.py)')
+    parser.add_argument('--budget-ms', type=float, default=0,
+                        help='Answer from the cache or keyword engine when vector retrieval takes longer (0 = no budget)')
+    parser.add_argument('--max-concurrency', type=int, default=0,
+                        help='Requests admitted at once (0 = one full batch per core)')
+    parser.add_argument('--max-queue', type=int, default=64,
+                        help='Requests that may wait for admission before new ones get 503 (0 = no admission control)')
+    parser.add_argument('--max-wait-ms', type=float, default=1000.0,
+                        help='How long a request may wait for admission before it gets 503')
+    parser.add_argument('--no-telemetry', action='store_true',
+                        help='Do not record pipeline spans and counters for /metrics')
+    add_tuning_arguments(parser)
+    
+    args = parser.parse_args()
+    if args.shards and args.chroma_url:
+        parser.error('--shards opens each shard database directly and cannot be combined with --chroma-url')
+    
+    configure_from_env()
+    if not args.no_telemetry and telemetry.find_sink(InMemorySink) is None:
+        telemetry.add_sink(PrometheusSink())
+    
+    from chatbot import CUNY1969Chatbot
+    
+    if args.shards:
+        from sharded_kb import ShardedKnowledgeBase
+        kb = ShardedKnowledgeBase(db_dir=args.shard_dir, num_shards=args.shards)
+        if kb.collection.count() == 0:
+            kb.build_knowledge_base()
+        chatbot = CUNY1969Chatbot(kb=kb)
+    elif args.generations_dir:
+        from reindex import LiveKnowledgeBase
+        chatbot = CUNY1969Chatbot(kb=LiveKnowledgeBase(args.generations_dir))
+    elif args.chroma_url:
+        from knowledge_base import CUNY1969KnowledgeBase
+        chatbot = CUNY1969Chatbot(kb=CUNY1969KnowledgeBase(db_dir=args.db_dir, chroma_url=args.chroma_url))
+    else:
+        chatbot = CUNY1969Chatbot(kb_path=args.db_dir)
+    configure_encoder(args, chatbot.kb)
+    if args.budget_ms > 0:
+        from fallback import BudgetedChatbot
+        chatbot = BudgetedChatbot(chatbot, budget_ms=args.budget_ms)
+    admission = None
+    if args.max_queue > 0:
+        admission = AdmissionController(
+            args.max_concurrency or default_concurrency(args.max_batch_size),
+            max_queue=args.max_queue, max_wait_ms=args.max_wait_ms
+        )
+    server = create_server(
+        chatbot, args.host, args.port,
+        max_batch_size=args.max_batch_size, batch_window_ms=args.batch_window_ms, admission=admission
+    )
+    
+    logger.info(f"Serving on http://{args.host}:{args.port} "
+                f"(max batch {args.max_batch_size}, window {args.batch_window_ms} ms"
+                + (f", {admission.max_concurrency} admitted at once)" if admission else ")"))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down")
+    finally:
+        server.server_close()
+        server.batcher.stop()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,261 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+import chromadb
+from chromadb.config import Settings
+import logging
+
+from chroma_server import COLLECTION_NAME
+from knowledge_base import CUNY1969KnowledgeBase
+from metrics import telemetry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SHARD_CONFIG_FILE = "shards.json"
+PARTITIONS = ['hash', 'source']
+
+def shard_for(record_id: str, metadata: Dict, num_shards: int, partition: str = 'hash') -> int:
+    """Stable shard number: by record id, or by source host so one site stays on one shard"""
+    if partition == 'source':
+        key = urlparse(metadata.get('source_url', '')).netloc or metadata.get('source_url', '')
+    else:
+        key = record_id
+    return zlib.crc32(key.encode('utf-8')) % num_shards
+
+class ShardedCollection:
+    """Chroma-collection stand-in that fans queries out to several collections and merges by distance"""
+    
+    def __init__(self, collections: List, partition: str = 'hash'):
+        self.collections = collections
+        self.partition = partition
+        self._shard_ids = None
+        self._executor = ThreadPoolExecutor(max_workers=len(collections), thread_name_prefix='kb-shard')
+    
+    def shard_for(self, record_id: str, metadata: Dict) -> int:
+        return shard_for(record_id, metadata, len(self.collections), self.partition)
+    
+    def map(self, fn, items: List) -> List:
+        """Apply fn to each item on the shard pool, preserving order"""
+        return list(self._executor.map(fn, items))
+    
+    def count(self) -> int:
+        return sum(self.map(lambda collection: collection.count(), self.collections))
+    
+    def counts(self) -> List[int]:
+        return self.map(lambda collection: collection.count(), self.collections)
+    
+    def shard_ids(self) -> List[set]:
+        """Ids held by each shard; Chroma rejects an id restriction naming ids it does not hold"""
+        if self._shard_ids is None:
+            self._shard_ids = self.map(
+                lambda collection: set(collection.get(include=[])['ids']), self.collections
+            )
+        return self._shard_ids
+    
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict], embeddings=None):
+        self._shard_ids = None
+        partitions = [[] for _ in self.collections]
+        for i, (record_id, metadata) in enumerate(zip(ids, metadatas)):
+            partitions[self.shard_for(record_id, metadata)].append(i)
+        
+        def add_shard(shard: int):
+            rows = partitions[shard]
+            if not rows:
+                return
+            self.collections[shard].add(
+                ids=[ids[i] for i in rows],
+                documents=[documents[i] for i in rows],
+                metadatas=[metadatas[i] for i in rows],
+                embeddings=[embeddings[i] for i in rows] if embeddings is not None else None
+            )
+        
+        self.map(add_shard, range(len(self.collections)))
+    
+    def get(self, include: Optional[List[str]] = None) -> Dict:
+        include = include or ['documents', 'metadatas']
+        parts = self.map(lambda collection: collection.get(include=include), self.collections)
+        
+        merged = {'ids': [record_id for part in parts for record_id in part['ids']]}
+        for key in include:
+            merged[key] = [item for part in parts for item in part[key]]
+        return merged
+    
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[Dict] = None,
+              include: Optional[List[str]] = None, ids: Optional[List[str]] = None) -> Dict:
+        include = include or ['documents', 'metadatas', 'distances']
+        shard_include = include if 'distances' in include else include + ['distances']
+        shard_ids = self.shard_ids() if ids is not None else None
+        
+        def query_shard(shard: int) -> Optional[Dict]:
+            kwargs = {}
+            if shard_ids is not None:
+                kwargs['ids'] = [record_id for record_id in ids if record_id in shard_ids[shard]]
+                available = len(kwargs['ids'])
+            else:
+                available = self.collections[shard].count()
+            if available == 0:
+                return None
+            return self.collections[shard].query(
+                query_embeddings=query_embeddings, n_results=min(n_results, available),
+                where=where, include=shard_include, **kwargs
+            )
+        
+        parts = [part for part in self.map(query_shard, range(len(self.collections))) if part is not None]
+        merged = {key: [] for key in ['ids'] + include}
+        
+        for row in range(len(query_embeddings)):
+            candidates = [
+                (part['distances'][row][i], shard, i)
+                for shard, part in enumerate(parts)
+                for i in range(len(part['ids'][row]))
+            ]
+            candidates.sort(key=lambda candidate: candidate[:2])
+            top = candidates[:n_results]
+            
+            for key in merged:
+                merged[key].append([parts[shard][key][row][i] for _, shard, i in top])
+        
+        return merged
+
+class ShardedKnowledgeBase(CUNY1969KnowledgeBase):
+    """Knowledge base split across shard directories that are built in parallel and searched scatter-gather.
+    Every shard is its own embedded database, so a shared Chroma server (CUNY1969_CHROMA_URL) is never used"""
+    
+    def __init__(self, data_dir: str = "../data", db_dir: str = "../data/chroma_shards",
+                 num_shards: int = 4, partition: str = 'hash', model=None,
+                 chunk_size: int = 300, chunk_overlap: int = 0, hnsw_config: Optional[Dict] = None,
+                 dedupe: bool = True, dedupe_threshold: float = 0.8, search_pages: int = 0,
+                 reduce_dim: Optional[int] = None, reduction: str = 'pca', encode_batch_size: int = 32):
+        if partition not in PARTITIONS:
+            raise ValueError(f"Unknown partition '{partition}'; choose from {PARTITIONS}")
+        
+        os.makedirs(db_dir, exist_ok=True)
+        config_path = os.path.join(db_dir, SHARD_CONFIG_FILE)
+        config = {'num_shards': num_shards, 'partition': partition}
+        if os.path.exists(config_path):
+            with open(config_path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            if stored != config:
+                raise ValueError(f"{db_dir} holds {stored['num_shards']} shards partitioned by "
+                                 f"'{stored['partition']}'; use a new directory for a different layout")
+        else:
+            with open(config_path, 'w', encoding='utf-8') as f:
+                json.dump(config, f)
+        
+        self.clients = []
+        collections = []
+        for shard in range(num_shards):
+            client = chromadb.PersistentClient(
+                path=os.path.join(db_dir, f"shard_{shard:02d}"),
+                settings=Settings(anonymized_telemetry=False)
+            )
+            self.clients.append(client)
+            collections.append(client.get_or_create_collection(
+                name=COLLECTION_NAME,
+                metadata={"hnsw:space": "cosine", **(hnsw_config or {})}
+            ))
+        
+        super().__init__(
+            data_dir=data_dir, db_dir=db_dir, model=model, chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap, collection=ShardedCollection(collections, partition),
+            dedupe=dedupe, dedupe_threshold=dedupe_threshold, search_pages=search_pages,
+            reduce_dim=reduce_dim, reduction=reduction, encode_batch_size=encode_batch_size
+        )
+        self.num_shards = num_shards
+        self.partition = partition
+    
+    def build_knowledge_base(self):
+        with telemetry.span('kb.build', shards=self.num_shards) as span:
+            scraped_data = self.load_scraped_data()
+            
+            if not scraped_data:
+                logger.warning("No scraped data found")
+                return
+            
+            all_chunks, all_metadatas, all_ids = self.prepare_records(scraped_data)
+            dedupe_report = None
+            if self.deduplicator is not None:
+                all_chunks, all_metadatas, all_ids, dedupe_report = self.deduplicate_records(
+                    all_chunks, all_metadatas, all_ids
+                )
+            span.set_attribute('pages', len(scraped_data))
+            span.set_attribute('chunks', len(all_chunks))
+            
+            partitions = [[] for _ in range(self.num_shards)]
+            for i, (record_id, metadata) in enumerate(zip(all_ids, all_metadatas)):
+                partitions[self.collection.shard_for(record_id, metadata)].append(i)
+            
+            # One encode over every chunk (the model batches it and uses all its threads), then each shard
+            # indexes its own records in parallel; HNSW inserts release the GIL.
+            # A projection has to be fitted on every shard's vectors anyway.
+            shard_ms = [0.0] * self.num_shards
+            
+            def add_shard(shard: int):
+                rows = partitions[shard]
+                if not rows:
+                    return
+                start = time.perf_counter()
+                self.collection.collections[shard].add(
+                    documents=[all_chunks[i] for i in rows],
+                    embeddings=embeddings_array[rows].tolist(),
+                    metadatas=[all_metadatas[i] for i in rows],
+                    ids=[all_ids[i] for i in rows]
+                )
+                shard_ms[shard] += (time.perf_counter() - start) * 1000
+            
+            start = time.perf_counter()
+            embeddings_array = self._fit_projection(self.encode(all_chunks)) if all_chunks else None
+            encode_ms = (time.perf_counter() - start) * 1000
+            self.collection.map(add_shard, range(self.num_shards))
+            index_ms = (time.perf_counter() - start) * 1000
+            
+            if all_chunks:
+                self.collection._shard_ids = None
+                self._save_facets(all_ids, all_metadatas)
+                self._save_pages(all_ids, all_metadatas, embeddings_array)
+                self._mark_rebuilt()
+                telemetry.incr('kb_chunks_indexed', len(all_chunks))
+                
+                sizes = ', '.join(f"{len(rows)} ({ms:.0f} ms)" for rows, ms in zip(partitions, shard_ms))
+                logger.info(f"Added {len(all_chunks)} chunks across {self.num_shards} shards "
+                            f"(encoded in {encode_ms:.0f} ms): {sizes}")
+                if dedupe_report is not None:
+                    self._report_dedupe(dedupe_report, index_ms, len(all_chunks))
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Build and query a sharded CUNY 1969 knowledge base')
+    parser.add_argument('--data-dir', default='../data', help='Directory with scraped_content.json')
+    parser.add_argument('--db-dir', default='../data/chroma_shards', help='Directory for the shard databases')
+    parser.add_argument('--shards', type=int, default=4, help='Number of shards')
+    parser.add_argument('--partition', choices=PARTITIONS, default='hash',
+                        help='Assign chunks to shards by record hash or by source site')
+    parser.add_argument('--query', default='What happened at CUNY in 1969?', help='Query to run after building')
+    
+    args = parser.parse_args()
+    
+    kb = ShardedKnowledgeBase(data_dir=args.data_dir, db_dir=args.db_dir,
+                              num_shards=args.shards, partition=args.partition)
+    if kb.collection.count() == 0:
+        start = time.perf_counter()
+        kb.build_knowledge_base()
+        print(f"Built in {(time.perf_counter() - start) * 1000:.0f} ms")
+    print(f"Records per shard: {kb.collection.counts()}")
+    
+    start = time.perf_counter()
+    results = kb.search(args.query)
+    print(f"\n{len(results['results'])} results in {(time.perf_counter() - start) * 1000:.1f} ms:")
+    for result in results['results']:
+        print(f"  {result['distance']:.3f}  {result['content'][:70]}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
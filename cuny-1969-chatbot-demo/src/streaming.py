@@ -0,0 +1,31 @@
+import re
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+FRAGMENT_PATTERN = re.compile(r'\S.*?(?:[.!?](?=\s|$)|\n|$)\s*', re.S)
+
+def split_fragments(text: str) -> List[str]:
+    """Split an answer into sentence-sized fragments that join back to the original text"""
+    return FRAGMENT_PATTERN.findall(text)
+
+class StreamTimer:
+    """Measures time to first answer fragment and total latency of a chat_stream"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_fragment_ms = None
+        self.total_ms = None
+    
+    def track(self, events: Iterable[Dict]) -> Iterator[Dict]:
+        for event in events:
+            if event['type'] == 'answer' and self.first_fragment_ms is None:
+                self.first_fragment_ms = (time.perf_counter() - self.started) * 1000
+            yield event
+        
+        self.total_ms = (time.perf_counter() - self.started) * 1000
+    
+    def as_dict(self) -> Dict[str, Optional[float]]:
+        return {
+            'ttfb_ms': self.first_fragment_ms,
+            'total_ms': self.total_ms
+        }
\ No newline at end of file
@@ -0,0 +1,76 @@
+import os
+import sys
+# Tests import project modules the way the scripts do, from src/ and demo/
+for directory in ['src', 'demo']:
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', directory))
+
+import json
+import re
+import zlib
+import numpy as np
+import pytest
+
+from knowledge_base import CUNY1969KnowledgeBase
+
+class HashingEncoder:
+    """Deterministic bag-of-words vectors, so the tests need no model download"""
+    
+    def __init__(self, dim: int = 64):
+        self.dim = dim
+    
+    def encode(self, texts, batch_size=32, normalize_embeddings=False, **kwargs):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r"[a-z0-9]+", text.lower()):
+                vectors[row, zlib.crc32(word.encode()) % self.dim] += 1.0
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+TOPICS = ['tuition fees budget', 'campus occupation protest', 'open admissions policy',
+          'library archive photographs', 'faculty senate vote', 'student newspaper editors']
+
+def topic_pages():
+    """One page per topic; only the last page mentions 1972, and every page names a person"""
+    pages = []
+    for i, topic in enumerate(TOPICS):
+        year = '1972' if i == len(TOPICS) - 1 else '1969'
+        pages.append({
+            'url': f'https://example.org/page{i}',
+            'title': topic.title(),
+            'content': [{'type': 'p', 'text': f"{topic} {topic} in {year}, said Buell Gallagher ({n}) {topic}"}
+                        for n in range(3)],
+            'images': []
+        })
+    return pages
+
+def write_pages(data_dir, pages):
+    os.makedirs(data_dir, exist_ok=True)
+    with open(os.path.join(data_dir, 'scraped_content.json'), 'w', encoding='utf-8') as f:
+        json.dump(pages, f)
+
+@pytest.fixture
+def encoder():
+    return HashingEncoder()
+
+@pytest.fixture
+def hashing_default_encoder(monkeypatch):
+    """Knowledge bases built without a model (e.g. inside the demo runners) get the hashing encoder"""
+    monkeypatch.setattr('knowledge_base.load_encoder', lambda *args, **kwargs: HashingEncoder())
+
+@pytest.fixture
+def make_kb(tmp_path, encoder):
+    """Build a knowledge base over `pages` (the topic pages by default) in its own temporary directories"""
+    built = []
+    
+    def make(pages=None, kb_class=CUNY1969KnowledgeBase, **options):
+        root = tmp_path / f"kb{len(built)}"
+        write_pages(str(root / 'data'), topic_pages() if pages is None else pages)
+        options.setdefault('chunk_size', 8)
+        options.setdefault('dedupe', False)
+        if kb_class is CUNY1969KnowledgeBase:
+            options.setdefault('chroma_url', '')
+        kb = kb_class(data_dir=str(root / 'data'), db_dir=str(root / 'db'), model=encoder, **options)
+        kb.build_knowledge_base()
+        built.append(kb)
+        return kb
+    
+    return make
\ No newline at end of file
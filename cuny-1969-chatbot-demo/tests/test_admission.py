@@ -0,0 +1,15 @@
+import pytest
+
+from admission import AdmissionController, Rejected
+
+def test_zero_queue_rejects_past_the_concurrency_limit():
+    admission = AdmissionController(max_concurrency=1, max_queue=0, max_wait_ms=10)
+    admission.acquire('batch')
+    
+    with pytest.raises(Rejected) as rejected:
+        admission.acquire('interactive')
+    assert rejected.value.reason == 'queue_full'
+    
+    admission.release()
+    admission.acquire('interactive')
+    assert admission.stats()['active'] == 1
\ No newline at end of file
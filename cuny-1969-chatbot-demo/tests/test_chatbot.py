@@ -0,0 +1,37 @@
+from chatbot import CUNY1969Chatbot
+
+class CountingCollection:
+    def __init__(self, collection):
+        self.collection = collection
+        self.counts = 0
+    
+    def count(self):
+        self.counts += 1
+        return self.collection.count()
+    
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+def test_empty_index_is_counted_once_per_generation(make_kb):
+    kb = make_kb(pages=[])
+    kb.collection = CountingCollection(kb.collection)
+    chatbot = CUNY1969Chatbot(kb=kb)
+    
+    for _ in range(3):
+        assert chatbot.chat('campus occupation protest')['answer'] == CUNY1969Chatbot.NO_RESULTS_ANSWER
+    assert kb.collection.counts == 1
+    
+    # A rebuild is a new generation, so warm-up is tried again
+    kb._mark_rebuilt()
+    chatbot.chat('campus occupation protest')
+    assert kb.collection.counts == 2
+
+def test_repeated_question_is_served_from_the_cache_until_a_rebuild(make_kb):
+    kb = make_kb()
+    chatbot = CUNY1969Chatbot(kb=kb, prewarm_cache=False)
+    
+    assert chatbot.chat('campus occupation protest')['tier'] == 'vector'
+    assert chatbot.chat('campus occupation protest')['tier'] == 'cache'
+    
+    kb.build_knowledge_base()
+    assert chatbot.chat('campus occupation protest')['tier'] == 'vector'
\ No newline at end of file
@@ -0,0 +1,26 @@
+import numpy as np
+
+from context_assembly import ContextAssembler, mmr_order, similarity_matrix
+
+def test_mmr_prefers_a_different_passage_over_a_near_copy_of_the_best_one():
+    query = np.array([1.0, 1.0, 0.0])
+    candidates = np.array([[1.0, 0.9, 0.0], [1.0, 0.85, 0.05], [0.6, 1.0, 0.8]])
+    
+    assert mmr_order(similarity_matrix(query, candidates), lambda_mult=0.5) == [0, 2, 1]
+    # Relevance alone keeps the near-copy second
+    assert mmr_order(similarity_matrix(query, candidates), lambda_mult=1.0) == [0, 1, 2]
+
+def test_assembled_context_skips_duplicates_and_fits_the_budget():
+    query = np.array([1.0, 0.0])
+    results = [
+        {'content': 'occupation of south campus ' * 6, 'embedding': np.array([1.0, 0.1])},
+        {'content': 'occupation of south campus, again ' * 6, 'embedding': np.array([1.0, 0.1])},
+        {'content': 'open admissions followed in 1970 ' * 6, 'embedding': np.array([0.7, 0.7])}
+    ]
+    assembler = ContextAssembler(char_budget=250, min_passage_chars=40)
+    
+    context, selected = assembler.assemble(results, query)
+    
+    assert selected == [results[0], results[2]]
+    assert len(context) <= 250
+    assert context.endswith('...')
\ No newline at end of file
@@ -0,0 +1,29 @@
+from conftest import topic_pages
+from dedupe import MinHashDeduplicator, StreamingDeduplicator
+
+TEXTS = [
+    'students occupied the south campus of city college for two weeks in april 1969',
+    'the faculty senate voted on the open admissions policy after a long debate',
+    'students occupied the south campus of city college for two weeks in april of 1969',
+    'tuition remained free at the city university until the fiscal crisis of 1976'
+]
+
+def test_near_duplicates_group_the_same_whether_batched_or_streamed():
+    deduplicator = MinHashDeduplicator(threshold=0.5)
+    streaming = StreamingDeduplicator(deduplicator)
+    
+    assert [streaming.add(text) for text in TEXTS] == [0, 1, 0, 3]
+    assert deduplicator.clusters(TEXTS) == streaming.clusters() == [[0, 2]]
+
+def test_mirrored_page_is_indexed_once_with_both_sources(make_kb):
+    pages = topic_pages()[:2]
+    mirror = dict(pages[0], url='https://mirror.example.org/page0')
+    kb = make_kb(pages + [mirror], dedupe=True)
+    
+    assert kb.collection.count() == make_kb(pages).collection.count()
+    assert kb.last_dedupe_report['removed'] > 0
+    metadatas = kb.collection.get(include=['metadatas'])['metadatas']
+    merged = [metadata for metadata in metadatas if metadata.get('duplicate_count')]
+    assert merged
+    assert all(set(metadata['source_urls']) == {'https://example.org/page0', 'https://mirror.example.org/page0'}
+               for metadata in merged)
\ No newline at end of file
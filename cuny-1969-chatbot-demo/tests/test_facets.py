@@ -0,0 +1,20 @@
+from facets import RunLengthBitmap
+
+def test_bitmap_runs_intersect_and_merge():
+    a = RunLengthBitmap.from_positions([0, 1, 2, 5, 6, 9])
+    b = RunLengthBitmap.from_positions([2, 3, 6, 7, 8, 9])
+    
+    assert a.to_list() == [0, 3, 5, 2, 9, 1]
+    assert (a & b).positions().tolist() == [2, 6, 9]
+    assert (a | b).positions().tolist() == [0, 1, 2, 3, 5, 6, 7, 8, 9]
+
+def test_search_is_restricted_to_records_matching_every_facet(make_kb):
+    kb = make_kb()
+    
+    results = kb.search('campus occupation protest', n_results=10, filters={'year': 1972})['results']
+    assert results
+    assert {result['metadata']['title'] for result in results} == {'Student Newspaper Editors'}
+    
+    either = kb.search('campus', n_results=50, filters={'year': [1969, 1972], 'person': 'gallagher'})['results']
+    assert len(either) == kb.collection.count()
+    assert kb.search('campus', filters={'year': 1972, 'person': 'nobody'})['results'] == []
\ No newline at end of file
@@ -0,0 +1,85 @@
+import threading
+import time
+import numpy as np
+
+from fallback import BudgetedChatbot
+from semantic_cache import SemanticCache
+
+class SlowChatbot:
+    """Vector-tier stand-in that takes `delay` seconds per call and notes how many calls overlap"""
+    
+    def __init__(self, delay: float, encode_delay: float = 0.0, encode_error: bool = False):
+        self.delay = delay
+        self.encode_delay = encode_delay
+        self.encode_error = encode_error
+        self.cache = SemanticCache(threshold=0.99, capacity=16)
+        self.kb = self
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+    
+    def encode(self, texts):
+        if self.encode_error:
+            raise RuntimeError('encoder unavailable')
+        time.sleep(self.encode_delay)
+        return np.array([[float(len(text)), 1.0] for text in texts], dtype=np.float32)
+    
+    def _cache_tag(self, user_input):
+        return 'text'
+    
+    def chat_batch(self, user_inputs):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        responses = []
+        for user_input, embedding in zip(user_inputs, self.encode(user_inputs)):
+            response = {'answer': f"vector answer to {user_input}", 'sources': [], 'images': [], 'tier': 'vector'}
+            self.cache.put(embedding, response, 'text')
+            responses.append(response)
+        with self._lock:
+            self.active -= 1
+            self.calls += 1
+        return responses
+
+def test_vector_calls_never_overlap():
+    chatbot = SlowChatbot(delay=0.05)
+    budgeted = BudgetedChatbot(chatbot, budget_ms=1000)
+    threads = [threading.Thread(target=budgeted.chat, args=(f"question {i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    budgeted.close()
+    
+    assert chatbot.calls == 4
+    assert chatbot.max_active == 1
+
+def test_timed_out_answer_is_served_from_the_semantic_cache():
+    chatbot = SlowChatbot(delay=0.2)
+    budgeted = BudgetedChatbot(chatbot, budget_ms=10)
+    
+    assert budgeted.chat('what happened')['tier'] == 'keyword'
+    deadline = time.time() + 5
+    while budgeted.stats()['pending'] and time.time() < deadline:
+        time.sleep(0.01)
+    response = budgeted.chat('what happened')
+    budgeted.close()
+    
+    assert response['tier'] == 'cache'
+    assert response['answer'] == 'vector answer to what happened'
+
+def test_slow_or_failing_encoder_still_answers_by_keyword_within_budget():
+    for chatbot in [SlowChatbot(delay=0.0, encode_delay=1.0), SlowChatbot(delay=1.0, encode_error=True)]:
+        # The cached entry matches 'what happened', so only a slow or failing encoder keeps it from being served
+        chatbot.cache.put(np.array([13.0, 1.0]), {'answer': 'cached', 'sources': [], 'images': []}, 'text')
+        budgeted = BudgetedChatbot(chatbot, budget_ms=50)
+        
+        start = time.perf_counter()
+        response = budgeted.chat('what happened')
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        budgeted.close()
+        
+        assert response['tier'] == 'keyword'
+        assert elapsed_ms < 50 + 100
\ No newline at end of file
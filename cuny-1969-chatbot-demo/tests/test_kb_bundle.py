@@ -0,0 +1,55 @@
+import os
+
+from conftest import topic_pages
+from kb_bundle import export_bundle, load_bundle, open_bundle_knowledge_base
+
+class CountingRows:
+    def __init__(self, rows):
+        self.rows = rows
+        self.reads = 0
+    
+    def __len__(self):
+        return len(self.rows)
+    
+    def __getitem__(self, row):
+        self.reads += 1
+        return self.rows[row]
+
+def test_bundle_from_the_current_build_and_data_loads(make_kb, encoder, tmp_path):
+    kb = make_kb()
+    export_bundle(kb, str(tmp_path / 'bundle'))
+    
+    loaded = open_bundle_knowledge_base(str(tmp_path / 'bundle'), model=encoder, db_dir=kb.db_dir, data_dir=kb.data_dir)
+    assert loaded is not None
+    assert loaded.collection.count() == kb.collection.count()
+
+def test_bundle_is_refused_after_a_rescrape(make_kb, encoder, tmp_path):
+    kb = make_kb()
+    export_bundle(kb, str(tmp_path / 'bundle'))
+    with open(os.path.join(kb.data_dir, 'scraped_content.json'), 'a', encoding='utf-8') as f:
+        f.write('\n')
+    
+    assert open_bundle_knowledge_base(str(tmp_path / 'bundle'), model=encoder,
+                                      db_dir=kb.db_dir, data_dir=kb.data_dir) is None
+
+def test_bundle_is_refused_after_a_rebuild(make_kb, encoder, tmp_path):
+    kb = make_kb()
+    export_bundle(kb, str(tmp_path / 'bundle'))
+    kb.build_knowledge_base()
+    
+    assert open_bundle_knowledge_base(str(tmp_path / 'bundle'), model=encoder, db_dir=kb.db_dir) is None
+
+def test_filtered_bundle_query_reads_only_the_returned_metadata(make_kb, encoder, tmp_path):
+    pages = topic_pages()
+    pages[1]['images'] = [{'url': f'https://example.org/photo{i}.jpg', 'local_path': f'photo{i}.jpg',
+                           'alt_text': f'students on the lawn {i}'} for i in range(3)]
+    kb = make_kb(pages)
+    export_bundle(kb, str(tmp_path / 'bundle'))
+    index, _ = load_bundle(str(tmp_path / 'bundle'))
+    index.metadatas = CountingRows(index.metadatas)
+    
+    results = index.query(encoder.encode(['students protest photos']), n_results=2, where={'content_type': 'image'})
+    
+    assert len(results['ids'][0]) == 2
+    assert all(metadata['content_type'] == 'image' for metadata in results['metadatas'][0])
+    assert index.metadatas.reads == 2
\ No newline at end of file
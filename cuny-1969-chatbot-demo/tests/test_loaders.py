@@ -0,0 +1,42 @@
+import os
+import pytest
+
+from loaders import TextLoader, iter_archive, load_file
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+@pytest.fixture
+def archive(tmp_path):
+    root = str(tmp_path / 'archive')
+    write(os.path.join(root, 'a.txt'), "Strike Committee Minutes\n\nThe committee met in 1969 with Buell Gallagher.\n\n"
+                                       "It voted to keep the south campus gates closed.")
+    write(os.path.join(root, 'letters', 'b.txt'), "Letter to the Trustees\n\nBuell Gallagher resigned in 1969.")
+    write(os.path.join(root, 'empty.txt'), "\n\n")
+    write(os.path.join(root, 'notes.xyz'), "not an archive format")
+    return root
+
+def test_text_file_becomes_a_titled_page_of_paragraphs(archive):
+    page = TextLoader().load(os.path.join(archive, 'a.txt'))
+    
+    assert page['title'] == 'Strike Committee Minutes'
+    assert [block['text'] for block in page['content']] == [
+        'Strike Committee Minutes', 'The committee met in 1969 with Buell Gallagher.',
+        'It voted to keep the south campus gates closed.'
+    ]
+    assert page['url'].startswith('file://')
+    assert load_file(os.path.join(archive, 'empty.txt')) is None
+
+def test_archive_pages_arrive_in_order_from_the_worker_pool(archive):
+    titles = [page['title'] for page in iter_archive(archive, workers=2, chunksize=1)]
+    
+    assert titles == ['Strike Committee Minutes', 'Letter to the Trustees']
+
+def test_ingested_archive_is_searchable(make_kb, archive):
+    kb = make_kb(pages=[])
+    
+    assert kb.ingest(iter_archive(archive, workers=1)) == kb.collection.count() > 0
+    results = kb.search('trustees resigned', n_results=1)['results']
+    assert results[0]['metadata']['title'] == 'Letter to the Trustees'
\ No newline at end of file
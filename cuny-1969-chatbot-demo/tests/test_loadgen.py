@@ -0,0 +1,16 @@
+import time
+
+from loadgen import _run_plan, level_stats
+
+def test_open_loop_backlog_is_not_sent_rather_than_failed():
+    plan = {'mode': 'open', 'rate': 200.0, 'duration': 0.1, 'mix': [('question', 1.0)], 'seed': 0,
+            'start_at': time.time()}
+    
+    samples = _run_plan(lambda query: time.sleep(0.03), plan)
+    stats = level_stats(samples, elapsed=plan['duration'])
+    
+    assert stats['not_sent'] > 0
+    assert stats['requests'] + stats['not_sent'] == len(samples)
+    assert stats['completed'] == stats['requests']
+    assert stats['errors'] == {}
+    assert stats['error_rate'] == 0.0
\ No newline at end of file
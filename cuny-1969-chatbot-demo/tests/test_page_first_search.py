@@ -0,0 +1,19 @@
+def test_filtered_page_first_search_matches_flat_search(make_kb):
+    kb = make_kb()
+    query = 'tuition fees budget'
+    filters = {'year': 1972}
+    
+    flat = kb.search_batch([query], n_results=3, filters=filters, n_pages=0)[0]['results']
+    paged = kb.search_batch([query], n_results=3, filters=filters, n_pages=1)[0]['results']
+    
+    assert flat
+    assert [result['id'] for result in paged] == [result['id'] for result in flat]
+    # Only the student newspaper page mentions 1972, and its topic is far from the query
+    assert all(result['metadata']['title'] == 'Student Newspaper Editors' for result in paged)
+
+def test_unfiltered_page_first_search_stays_on_best_page(make_kb):
+    kb = make_kb()
+    results = kb.search_batch(['tuition fees budget'], n_results=2, n_pages=1)[0]
+    
+    assert len(results['pages']) == 1
+    assert results['pages'][0]['title'] == 'Tuition Fees Budget'
\ No newline at end of file
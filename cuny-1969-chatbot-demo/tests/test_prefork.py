@@ -0,0 +1,39 @@
+import os
+import pytest
+
+from conftest import topic_pages, write_pages
+from kb_bundle import MANIFEST_FILE, current_version, export_bundle
+from prefork import load_chatbot
+
+def test_empty_chroma_directory_is_not_exported(hashing_default_encoder, tmp_path):
+    write_pages(str(tmp_path / 'data'), topic_pages())
+    
+    with pytest.raises(RuntimeError):
+        load_chatbot(str(tmp_path / 'db'), str(tmp_path / 'bundle'), data_dir=str(tmp_path / 'data'))
+    assert current_version(str(tmp_path / 'bundle')) is None
+
+def test_unreadable_manifest_exports_a_new_bundle(make_kb, hashing_default_encoder, tmp_path):
+    kb = make_kb()
+    bundle_dir = str(tmp_path / 'bundle')
+    version = export_bundle(kb, bundle_dir)
+    with open(os.path.join(bundle_dir, version, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        f.write('{not json')
+    
+    chatbot = load_chatbot(kb.db_dir, bundle_dir, data_dir=kb.data_dir)
+    
+    assert current_version(bundle_dir) != version
+    assert chatbot.kb.collection.count() == kb.collection.count()
+
+def test_rescraped_pages_are_rebuilt_before_export(make_kb, hashing_default_encoder, tmp_path):
+    kb = make_kb()
+    bundle_dir = str(tmp_path / 'bundle')
+    export_bundle(kb, bundle_dir)
+    pages = topic_pages()
+    pages[0]['content'] = [{'type': 'p', 'text': 'dormitory curfew abolished by the trustees in 1969, said Buell Gallagher'}]
+    write_pages(kb.data_dir, pages)
+    
+    chatbot = load_chatbot(kb.db_dir, bundle_dir, data_dir=kb.data_dir)
+    
+    documents = [result['content'] for result in chatbot.kb.search('dormitory curfew trustees', n_results=20)['results']]
+    assert any('dormitory curfew' in document for document in documents)
+    assert not any('tuition fees budget' in document for document in documents)
\ No newline at end of file
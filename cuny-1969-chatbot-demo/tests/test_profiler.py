@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+
+from conftest import topic_pages, write_pages
+from profiler import run_profile
+from run_demo import DemoRunner
+
+class RecordingRunner(DemoRunner):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.responses = []
+    
+    def run_scenario(self, scenario):
+        self.responses.append(super().run_scenario(scenario))
+        return self.responses[-1]
+
+def test_profiled_scenarios_run_retrieval_not_the_cache(tmp_path, hashing_default_encoder):
+    write_pages(str(tmp_path / 'data'), topic_pages())
+    runner = RecordingRunner(data_dir=str(tmp_path / 'data'), db_dir=str(tmp_path / 'db'),
+                             bundle_dir=str(tmp_path / 'bundle'))
+    args = SimpleNamespace(profile_mode='trace', profile_interval_ms=2.0, profile_dir=str(tmp_path / 'profiles'),
+                           profile_top=5)
+    
+    assert run_profile(args, runner) == 0
+    assert len(runner.responses) == len(runner.demo_scenarios)
+    assert all(response['tier'] == 'vector' for response in runner.responses)
+    assert (tmp_path / 'profiles' / 'profile_report.json').exists()
\ No newline at end of file
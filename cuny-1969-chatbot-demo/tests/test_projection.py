@@ -0,0 +1,23 @@
+import numpy as np
+
+from projection import Projection
+
+def test_pca_projection_keeps_cosine_similarity_within_the_data_subspace(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((50, 3)) @ rng.standard_normal((3, 16))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    
+    projection = Projection.fit(vectors, 3)
+    projection.save(str(tmp_path / 'projection.npz'))
+    projected = Projection.load(str(tmp_path / 'projection.npz')).transform(vectors)
+    
+    assert projected.shape == (50, 3)
+    np.testing.assert_allclose(projected @ projected.T, vectors @ vectors.T, atol=1e-4)
+
+def test_projected_index_stores_and_searches_reduced_vectors(make_kb):
+    kb = make_kb(reduce_dim=16)
+    
+    stored = kb.collection.get(include=['embeddings'])['embeddings']
+    assert np.asarray(stored).shape[1] == 16
+    results = kb.search('faculty senate vote', n_results=3)['results']
+    assert {result['metadata']['title'] for result in results} == {'Faculty Senate Vote'}
\ No newline at end of file
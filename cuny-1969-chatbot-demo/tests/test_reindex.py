@@ -0,0 +1,23 @@
+import os
+
+from conftest import topic_pages, write_pages
+from reindex import BlueGreenIndexer, LiveKnowledgeBase
+
+def test_generation_open_in_a_reader_survives_garbage_collection(tmp_path, encoder):
+    write_pages(str(tmp_path / 'data'), topic_pages())
+    root = str(tmp_path / 'generations')
+    indexer = BlueGreenIndexer(root=root, data_dir=str(tmp_path / 'data'), model=encoder,
+                               smoke_queries=[{'question': 'campus occupation protest', 'keywords': ['protest']}])
+    first = indexer.reindex()['generation']
+    reader = LiveKnowledgeBase(root, model=encoder, retire_grace_s=3600)
+    
+    indexer.reindex()
+    assert indexer.reindex()['removed'] == []
+    assert os.path.isdir(os.path.join(root, first))
+    
+    # Switching keeps the old generation for requests still running on it, until the grace period or close()
+    assert reader.generation != first
+    assert indexer.collect_garbage() == []
+    reader.close()
+    assert indexer.collect_garbage() == [first]
+    assert not os.path.exists(os.path.join(root, first))
@@ -0,0 +1,19 @@
+from conftest import topic_pages, write_pages
+from run_demo import DemoRunner
+
+def test_rescraped_pages_replace_the_indexed_text(tmp_path, hashing_default_encoder):
+    data_dir, db_dir, bundle_dir = str(tmp_path / 'data'), str(tmp_path / 'db'), str(tmp_path / 'bundle')
+    pages = topic_pages()
+    write_pages(data_dir, pages)
+    DemoRunner(data_dir=data_dir, db_dir=db_dir, bundle_dir=bundle_dir).setup_demo()
+    
+    pages[0]['content'] = [{'type': 'p', 'text': 'dormitory curfew abolished by the trustees in 1969, '
+                                                 'said Buell Gallagher'}]
+    write_pages(data_dir, pages)
+    runner = DemoRunner(data_dir=data_dir, db_dir=db_dir, bundle_dir=bundle_dir)
+    runner.setup_demo()
+    
+    results = runner.chatbot.kb.search('dormitory curfew trustees', n_results=20)['results']
+    documents = [result['content'] for result in results]
+    assert any('dormitory curfew' in document for document in documents)
+    assert not any('tuition fees budget' in document for document in documents)
\ No newline at end of file
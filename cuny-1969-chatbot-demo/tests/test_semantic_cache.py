@@ -0,0 +1,19 @@
+import numpy as np
+
+from semantic_cache import SemanticCache
+
+def test_similar_query_with_the_same_tag_hits_and_the_least_recent_entry_is_evicted():
+    cache = SemanticCache(threshold=0.9, capacity=2)
+    first, second, third = np.eye(3, dtype=np.float32)
+    cache.put(first, {'answer': 'first'}, 'text')
+    cache.put(second, {'answer': 'second'}, 'text')
+    
+    assert cache.lookup(first + 0.05 * second, 'text') == {'answer': 'first'}
+    assert cache.lookup(first, 'images') is None
+    assert cache.lookup(third, 'text') is None
+    
+    # 'second' was used least recently, so it makes room for 'third'
+    cache.put(third, {'answer': 'third'}, 'text')
+    assert cache.lookup(second, 'text') is None
+    assert cache.lookup(first, 'text') == {'answer': 'first'}
+    assert cache.stats()['evictions'] == 1
\ No newline at end of file
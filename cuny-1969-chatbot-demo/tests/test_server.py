@@ -0,0 +1,65 @@
+import threading
+import pytest
+
+from server import MicroBatcher
+
+def test_timed_out_queries_are_dropped_not_answered():
+    release = threading.Event()
+    batches = []
+    
+    def handler(queries):
+        batches.append(list(queries))
+        release.wait(5)
+        return [{'query': query} for query in queries]
+    
+    batcher = MicroBatcher(handler, max_batch_size=4, batch_window_ms=1.0)
+    try:
+        first = threading.Thread(target=batcher.submit, args=('first',))
+        first.start()
+        while not batches:
+            release.wait(0.001)
+        
+        # Queued behind the running batch until the caller gives up
+        with pytest.raises(TimeoutError):
+            batcher.submit('abandoned', timeout=0.05)
+        release.set()
+        first.join()
+        
+        assert batcher.submit('next', timeout=5) == {'query': 'next'}
+        assert batches == [['first'], ['next']]
+    finally:
+        batcher.stop()
+def test_concurrent_queries_share_one_batch_and_get_their_own_answers():
+    batches = []
+    
+    def handler(queries):
+        batches.append(list(queries))
+        return [{'answer': query.upper()} for query in queries]
+    
+    batcher = MicroBatcher(handler, max_batch_size=4, batch_window_ms=500.0)
+    answers = {}
+    try:
+        threads = [threading.Thread(target=lambda q=query: answers.update({q: batcher.submit(q, timeout=5)}))
+                   for query in ['a', 'b', 'c', 'd']]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        batcher.stop()
+    
+    # A full batch runs without waiting out the window
+    assert [sorted(batch) for batch in batches] == [['a', 'b', 'c', 'd']]
+    assert answers == {query: {'answer': query.upper()} for query in 'abcd'}
+    assert batcher.stats()['batch_size']['count'] == 1
+
+def test_a_failed_batch_fails_every_query_in_it():
+    def handler(queries):
+        raise RuntimeError('index unavailable')
+    
+    batcher = MicroBatcher(handler, max_batch_size=2, batch_window_ms=1.0)
+    try:
+        with pytest.raises(RuntimeError, match='index unavailable'):
+            batcher.submit('a', timeout=5)
+    finally:
+        batcher.stop()
\ No newline at end of file
@@ -0,0 +1,41 @@
+import pytest
+
+from conftest import HashingEncoder
+from sharded_kb import ShardedKnowledgeBase
+
+class CountingEncoder(HashingEncoder):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+    
+    def encode(self, texts, **kwargs):
+        self.calls += 1
+        return super().encode(texts, **kwargs)
+
+@pytest.fixture
+def encoder():
+    return CountingEncoder()
+
+def test_build_and_search_encode_once_for_every_shard(make_kb, encoder):
+    kb = make_kb(kb_class=ShardedKnowledgeBase, num_shards=3)
+    assert encoder.calls == 1
+    assert all(count > 0 for count in kb.collection.counts())
+    
+    kb.search_batch(['campus occupation protest', 'faculty senate vote'])
+    assert encoder.calls == 2
+def test_scatter_gather_matches_a_single_index(make_kb):
+    single = make_kb()
+    sharded = make_kb(kb_class=ShardedKnowledgeBase, num_shards=3)
+    assert sum(sharded.collection.counts()) == single.collection.count()
+    
+    for query in ['campus occupation protest', 'library archive photographs']:
+        expected = single.search(query, n_results=5)['results']
+        merged = sharded.search(query, n_results=5)['results']
+        # Chunks with identical text tie, so compare distances rather than ids
+        distances = [round(result['distance'], 4) for result in expected]
+        assert [round(result['distance'], 4) for result in merged] == distances
+        assert merged[0]['metadata']['title'] == expected[0]['metadata']['title']
+    
+    filtered = sharded.search('campus', n_results=10, filters={'year': 1972})['results']
+    assert filtered
+    assert {result['metadata']['title'] for result in filtered} == {'Student Newspaper Editors'}
\ No newline at end of file